@@ -0,0 +1,280 @@
+"""
+Unusual-charge detection for /v2/anomalies.
+
+Every purchase is scored against robust baselines of the user's own
+history, computed for all groups at once from the transaction columns
+(ingest.TransactionColumns or a stored UserTransactions):
+
+- amount vs merchant: robust z-score, 0.6745 * (x - median) / MAD, against
+  the merchant's median and median absolute deviation;
+- amount vs category, for merchants without enough history of their own;
+  once the history covers the same calendar month in two or more years,
+  the category baseline for that month (seasonal) replaces the pooled one;
+- duplicate charges: the same merchant and amount within a day, unless
+  that exact charge is a habit;
+- new high-value merchants: a merchant first seen after the warm-up period
+  charging above the user's 95th-percentile purchase.
+
+Group medians come from one lexsort per grouping (no Python loop over
+groups), so a year of transactions is scored in a few milliseconds.
+`check_transaction` scores one new purchase against a stored user's cached
+baselines, for streaming checks as transactions post.
+"""
+import os
+import weakref
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from categorize import merchant_of
+from dates import parse_date
+from ingest import purchase_amount
+from lru import LRUCache
+from merchant_normalize import normalize_merchant
+from money import cents_of, from_cents
+from spending import purchase_columns, transaction_category
+
+MIN_HISTORY = 4
+Z_THRESHOLD = 3.5
+# MAD floor, so a merchant that always charges the same amount still has a scale.
+MIN_MAD_CENTS = 100
+MIN_MAD_FRACTION = 0.05
+DUPLICATE_WINDOW_DAYS = 1
+HABIT_COUNT = 4
+NEW_MERCHANT_PERCENTILE = 95
+NEW_MERCHANT_MIN_CENTS = 5000
+WARMUP_DAYS = 30
+SEASONAL_MIN_YEARS = 2
+# A cached baseline is reused until the history grows by this many rows (or 5%).
+BASELINE_REFRESH_ROWS = 50
+RECENT_ROWS = 256
+# (merchant, cents) pairs pack into one int64 key; cents stay well below 2**40.
+PAIR_SHIFT = 40
+_EPOCH = date(1970, 1, 1).toordinal()
+
+
+def group_median(keys: np.ndarray, values: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Median of `values` per integer key in [0, size), and the group counts."""
+    order = np.lexsort((values, keys))
+    ordered = values[order]
+    counts = np.bincount(keys, minlength=size)
+    starts = np.cumsum(counts) - counts
+    median = np.zeros(size)
+    present = counts > 0
+    low = starts[present] + (counts[present] - 1) // 2
+    high = starts[present] + counts[present] // 2
+    median[present] = (ordered[low] + ordered[high]) / 2.0
+    return median, counts
+
+
+def robust_baseline(keys: np.ndarray, cents: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(median, floored MAD, count) of cents per key."""
+    median, counts = group_median(keys, cents, size)
+    mad, _ = group_median(keys, np.abs(cents - median[keys]), size)
+    return median, np.maximum(mad, np.maximum(MIN_MAD_CENTS, MIN_MAD_FRACTION * median)), counts
+
+
+def robust_z(cents, median, mad):
+    return 0.6745 * (cents - median) / mad
+
+
+def pair_key(merchant: np.ndarray, cents: np.ndarray) -> np.ndarray:
+    return (np.asarray(merchant, dtype=np.int64) << PAIR_SHIFT) + np.asarray(cents, dtype=np.int64)
+
+
+def calendar(days: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(month 0-11, year) of day ordinals."""
+    dates = (days - _EPOCH).astype('datetime64[D]')
+    months = dates.astype('datetime64[M]').astype(np.int64)
+    return months % 12, months // 12
+
+
+class Baselines:
+    """Per-merchant, per-category and seasonal baselines of one history."""
+
+    def __init__(self, columns: Dict[str, np.ndarray], n_merchants: int, n_categories: int):
+        purchases = columns["cents"] > 0
+        cents = columns["cents"][purchases].astype(np.float64)
+        merchant, category, day = (columns[name][purchases] for name in ("merchant", "category", "day"))
+        self.rows = len(columns["cents"])
+        self.merchant = robust_baseline(merchant, cents, n_merchants)
+        self.category = robust_baseline(category, cents, n_categories)
+        month, year = calendar(day)
+        self.seasonal = robust_baseline(category * 12 + month, cents, n_categories * 12)
+        # A seasonal group is trusted once it spans enough distinct years.
+        span = int(year.max() - year.min()) + 1 if len(year) else 1
+        groups = np.unique((category * 12 + month) * span + (year - (year.min() if len(year) else 0))) // span
+        self.seasonal_years = np.bincount(groups, minlength=n_categories * 12)
+        self.merchant_first_day = np.full(n_merchants, np.iinfo(np.int32).max, dtype=np.int64)
+        np.minimum.at(self.merchant_first_day, merchant, day)
+        self.first_day = int(day.min()) if len(day) else None
+        self.high_value = max(float(np.percentile(cents, NEW_MERCHANT_PERCENTILE)) if len(cents) else 0.0,
+                              NEW_MERCHANT_MIN_CENTS)
+        # How often each exact (merchant, amount) charge occurs, for telling habits from duplicates.
+        self.pairs, self.pair_counts = np.unique(pair_key(merchant, columns["cents"][purchases]), return_counts=True)
+
+    def repeats(self, merchant: np.ndarray, cents: np.ndarray) -> np.ndarray:
+        """Occurrences of each (merchant, cents) charge in the history the baselines were built from."""
+        keys = pair_key(merchant, cents)
+        if not len(self.pairs):
+            return np.zeros(keys.shape, dtype=np.int64)
+        i = np.minimum(np.searchsorted(self.pairs, keys), len(self.pairs) - 1)
+        return np.where(self.pairs[i] == keys, self.pair_counts[i], 0)
+
+    def category_baseline(self, category: np.ndarray, month: np.ndarray):
+        """(median, MAD, count, seasonal?) per row: seasonal where trusted, else pooled."""
+        seasonal_key = category * 12 + month
+        seasonal = self.seasonal_years[seasonal_key] >= SEASONAL_MIN_YEARS
+        median, mad, count = (np.where(seasonal, by_month[seasonal_key], pooled[category])
+                              for by_month, pooled in zip(self.seasonal, self.category))
+        return median, mad, count, seasonal
+
+
+def _amount_reason(kind: str, z: float, median: float, mad: float, **extra) -> Dict:
+    return {"type": kind, "z": round(float(z), 1), "median": from_cents(int(round(median))),
+            "mad": from_cents(int(round(mad))), **extra}
+
+
+def detect_anomalies(columns: Dict[str, np.ndarray], merchant_names: List[str], category_names: List[str],
+                     ids: Optional[List] = None, baselines: Optional[Baselines] = None) -> Dict:
+    """
+    Scores every purchase in `columns`. `ids[row]` labels a row in the
+    report (defaults to the row number).
+    """
+    baselines = baselines or Baselines(columns, len(merchant_names), len(category_names))
+    rows = np.flatnonzero(columns["cents"] > 0)
+    cents = columns["cents"][rows]
+    merchant, category, day = (columns[name][rows] for name in ("merchant", "category", "day"))
+    month, _ = calendar(day)
+
+    m_median, m_mad, m_count = (a[merchant] for a in baselines.merchant)
+    m_z = robust_z(cents, m_median, m_mad)
+    merchant_known = m_count >= MIN_HISTORY
+    merchant_flag = merchant_known & (m_z > Z_THRESHOLD)
+
+    c_median, c_mad, c_count, seasonal = baselines.category_baseline(category, month)
+    c_z = robust_z(cents, c_median, c_mad)
+    category_flag = ~merchant_known & (c_count >= MIN_HISTORY) & (c_z > Z_THRESHOLD)
+
+    # Duplicates: neighbours in (merchant, cents, day) order.
+    order = np.lexsort((day, cents, merchant))
+    same = (merchant[order][1:] == merchant[order][:-1]) & (cents[order][1:] == cents[order][:-1])
+    close = same & (day[order][1:] - day[order][:-1] <= DUPLICATE_WINDOW_DAYS)
+    habit = baselines.repeats(merchant, cents) >= HABIT_COUNT
+    duplicate_of = np.full(len(rows), -1)
+    later = order[1:][close]
+    duplicate_of[later] = order[:-1][close]
+    duplicate_flag = (duplicate_of >= 0) & ~habit
+
+    first_seen = baselines.merchant_first_day[merchant]
+    new_flag = ((first_seen == day) & (cents >= baselines.high_value) & (baselines.first_day is not None)
+                & (day - (baselines.first_day or 0) >= WARMUP_DAYS))
+
+    label = (lambda row: ids[row]) if ids is not None else (lambda row: int(row))
+    anomalies, counts = [], {"amount_vs_merchant": 0, "amount_vs_category": 0,
+                             "duplicate_charge": 0, "new_high_value_merchant": 0}
+    for i in np.flatnonzero(merchant_flag | category_flag | duplicate_flag | new_flag):
+        reasons, score = [], 0.0
+        if merchant_flag[i]:
+            reasons.append(_amount_reason("amount_vs_merchant", m_z[i], m_median[i], m_mad[i]))
+            score = max(score, m_z[i])
+        if category_flag[i]:
+            reasons.append(_amount_reason("amount_vs_category", c_z[i], c_median[i], c_mad[i], seasonal=bool(seasonal[i])))
+            score = max(score, c_z[i])
+        if duplicate_flag[i]:
+            reasons.append({"type": "duplicate_charge", "duplicate_of": label(rows[duplicate_of[i]])})
+            score = max(score, Z_THRESHOLD)
+        if new_flag[i]:
+            reasons.append({"type": "new_high_value_merchant", "threshold": from_cents(int(baselines.high_value))})
+            score = max(score, Z_THRESHOLD)
+        for reason in reasons:
+            counts[reason["type"]] += 1
+        anomalies.append({
+            "id": label(rows[i]),
+            "date": date.fromordinal(int(day[i])).isoformat(),
+            "merchant": merchant_names[merchant[i]],
+            "category": category_names[category[i]],
+            "amount": from_cents(int(cents[i])),
+            "score": round(float(score), 1),
+            "reasons": reasons,
+        })
+    anomalies.sort(key=lambda a: (-a["score"], a["date"]))
+    return {"checked": int(len(rows)), "counts": counts, "anomalies": anomalies}
+
+
+def anomaly_report(transactions: List[Dict]) -> Dict:
+    buffer, ids = purchase_columns(transactions)
+    return detect_anomalies(buffer.columns(), list(buffer.merchant_codes), list(buffer.category_codes), ids)
+
+
+baseline_cache = LRUCache(maxsize=int(os.getenv("ANOMALY_BASELINE_CACHE_SIZE", "5000")))
+
+
+def _cache_baselines(user_id: str, history) -> Baselines:
+    baselines = Baselines(history.columns(), len(history.merchant_codes), len(history.category_codes))
+    # Codes are only meaningful for this history object; a resync after eviction interns them afresh.
+    baseline_cache.put(user_id, (weakref.ref(history), baselines))
+    return baselines
+
+
+def user_baselines(user_id: str, history) -> Baselines:
+    """A stored user's baselines, recomputed once the history has grown enough to move them."""
+    cached = baseline_cache.get(user_id)
+    if cached is not None and cached[0]() is history:
+        baselines = cached[1]
+        if baselines.rows <= history.cursor < baselines.rows + max(BASELINE_REFRESH_ROWS, baselines.rows // 20):
+            return baselines
+    return _cache_baselines(user_id, history)
+
+
+def stored_report(user_id: str, history) -> Dict:
+    ids = [row if txn_id is None else txn_id for row, txn_id in enumerate(history.row_ids)]
+    baselines = _cache_baselines(user_id, history)
+    return detect_anomalies(history.columns(), history.merchant_names, history.category_names, ids, baselines)
+
+
+def check_transaction(user_id: str, history, txn: Dict) -> Dict:
+    """Scores one new purchase against a stored history it is not yet part of."""
+    amount, day = purchase_amount(txn), parse_date(txn.get('date'))
+    if amount is None or day is None:
+        raise ValueError("Transaction needs a positive amount and a date.")
+    baselines = user_baselines(user_id, history)
+    cents, day = cents_of(amount), day.toordinal()
+    category_name, merchant_name = transaction_category(txn), normalize_merchant(merchant_of(txn))
+    merchant = history.merchant_codes.get(merchant_name)
+    category = history.category_codes.get(category_name)
+    reasons = []
+
+    known = merchant is not None and merchant < len(baselines.merchant[2]) and baselines.merchant[2][merchant] >= MIN_HISTORY
+    if known:
+        median, mad = baselines.merchant[0][merchant], baselines.merchant[1][merchant]
+        z = robust_z(cents, median, mad)
+        if z > Z_THRESHOLD:
+            reasons.append(_amount_reason("amount_vs_merchant", z, median, mad))
+    elif category is not None and category < len(baselines.category[2]):
+        month, _ = calendar(np.array([day]))
+        median, mad, count, seasonal = (a[0] for a in baselines.category_baseline(np.array([category]), month))
+        z = robust_z(cents, median, mad)
+        if count >= MIN_HISTORY and z > Z_THRESHOLD:
+            reasons.append(_amount_reason("amount_vs_category", z, median, mad, seasonal=bool(seasonal)))
+
+    if merchant is not None:
+        # Counted as detect_anomalies would once this charge is stored: the
+        # baselines' history, the rows since, and the charge itself.
+        since = slice(baselines.rows, history.cursor)
+        repeats = (int(baselines.repeats(np.array([merchant]), np.array([cents]))[0]) + 1
+                   + int(((history.merchant[since] == merchant) & (history.cents[since] == cents)).sum()))
+        # Duplicates of a posting charge are among the latest rows.
+        start = max(history.cursor - RECENT_ROWS, 0)
+        same = (history.merchant[start:history.cursor] == merchant) & (history.cents[start:history.cursor] == cents)
+        match = same & (np.abs(history.day[start:history.cursor] - day) <= DUPLICATE_WINDOW_DAYS)
+        if match.any() and repeats < HABIT_COUNT:
+            row = start + int(np.flatnonzero(match)[-1])
+            duplicate_of = history.row_ids[row]
+            reasons.append({"type": "duplicate_charge", "duplicate_of": row if duplicate_of is None else duplicate_of})
+    elif (cents >= baselines.high_value and baselines.first_day is not None
+          and day - baselines.first_day >= WARMUP_DAYS):
+        reasons.append({"type": "new_high_value_merchant", "threshold": from_cents(int(baselines.high_value))})
+    return {"anomalous": bool(reasons), "merchant": merchant_name, "category": category_name,
+            "amount": from_cents(cents), "reasons": reasons}
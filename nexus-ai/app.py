@@ -1,8 +1,8 @@
 import logging
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 import json
@@ -17,6 +17,14 @@ def sanitize_ai_json(raw: str) -> str:
     sanitized = sanitized.replace('```json', '').replace('```', '')
     return sanitized.strip()
 import math
+from datetime import date, timedelta
+
+from money import to_cents, from_cents, minimum_payments_cents
+from strategies import STRATEGIES, build_feature_table, evaluate_strategies
+from merchant_normalize import normalization_stats
+from plan_cache import plan_cache, portfolio_fingerprint, get_cached_plan, store_plan
+from balance_transfer import evaluate_balance_transfers
+from utilization_timing import optimize_payment_timing, expand_paycheck_schedule
 
 # --- 1. Load Environment & Basic Config ---
 load_dotenv()
@@ -35,15 +43,23 @@ async def lifespan(app: FastAPI):
     else:
         print("[AI] Gemini model initialization FAILED.")
     app.state.gemini_model = model
+    from merchant_index import get_merchant_index
+    print(f"[AI] Merchant index loaded with {len(get_merchant_index())} patterns.")
+    from geo_index import get_geo_index
+    print(f"[AI] Geo index mapped with {len(get_geo_index())} places.")
+    from card_catalog import get_card_catalog
+    print(f"[AI] Card catalog loaded with {len(get_card_catalog())} products.")
     yield
     print("INFO: FastAPI shutdown event triggered.")
 
 app = FastAPI(title="Nexus Cortex AI - Strategist Engine", version="10.0.0-final", lifespan=lifespan)
 
 # --- 3. Import AI Communication Service ---
-from services import interestkiller_ai_hybrid, interestkiller_ai_re_explain, spending_insights_ai
+from services import (interestkiller_ai_hybrid, interestkiller_ai_re_explain, spending_insights_ai, categorize_merchants_ai,
+                      cash_flow_prediction_ai)
+from categorize import RequestStreamingResponse, ai_category_cache, categorize_stream, iter_list, iter_ndjson
 class SpendingInsightsRequest(BaseModel):
-    transactions: list
+    transactions: list = []
     previous_transactions: Optional[list] = None
 
 
@@ -52,34 +68,36 @@ def precompute_payment_plans_sophisticated(accounts: list, payment_amount: float
     """
     A sophisticated, multi-phase algorithm that makes strategic decisions about
     which cards to pay, including paying some off entirely and skipping others.
+    All allocation runs on integer cents (see money.py), so every split sums
+    exactly to `payment_amount`.
     """
     # --- Phase 1: Triage & Intel Gathering ---
-    for acc in accounts:
-        balance = acc.get('balance', 0)
+    balances = to_cents([acc.get('balance', 0) for acc in accounts])
+    minimums = minimum_payments_cents(balances)
+    for acc, balance_cents, minimum_cents in zip(accounts, balances, minimums):
         limit = acc.get('creditLimit', 0)
-        acc['minimum_payment'] = max(25, balance * 0.01) if balance > 25 else balance
-        acc['utilization_percent'] = (balance / limit) * 100 if limit > 0 else 0
+        acc['balance_cents'] = int(balance_cents)
+        acc['minimum_payment_cents'] = int(minimum_cents)
+        acc['minimum_payment'] = from_cents(minimum_cents)
+        acc['utilization_percent'] = (acc.get('balance', 0) / limit) * 100 if limit > 0 else 0
 
-    discretionary_payment = payment_amount
+    discretionary_cents = int(to_cents(payment_amount))
     paid_off_cards = []
     skipped_cards = []
     processed_card_ids = set()
-    avalanche_split = []
-    score_booster_split = []
+    shared_split = []
 
     # --- Phase 2: Emergency & Opportunity Scan ---
     # 2a: Debt Elimination Opportunity (Pay off small balances first)
-    sorted_by_balance = sorted(accounts, key=lambda x: x['balance'])
+    sorted_by_balance = sorted(accounts, key=lambda x: x['balance_cents'])
     for acc in sorted_by_balance:
-        if acc['balance'] > 0 and discretionary_payment >= acc['balance']:
-            payment = acc['balance']
-            avalanche_split.append({"card_id": acc['id'], "card_name": acc['name'], "amount": round(payment, 2), "type": "Payoff"})
-            # The same payoff applies to both plans as it's a priority move
-            discretionary_payment -= payment
+        if acc['balance_cents'] > 0 and discretionary_cents >= acc['balance_cents']:
+            payment_cents = acc['balance_cents']
+            # The same payoff applies to every plan as it's a priority move
+            shared_split.append({"card_id": acc['id'], "card_name": acc['name'], "amount": from_cents(payment_cents), "type": "Payoff"})
+            discretionary_cents -= payment_cents
             paid_off_cards.append(acc)
             processed_card_ids.add(acc['id'])
-    # Create a unified score booster split after payoffs
-    score_booster_split.extend(avalanche_split)
 
     remaining_cards = [acc for acc in accounts if acc['id'] not in processed_card_ids]
 
@@ -90,31 +108,29 @@ def precompute_payment_plans_sophisticated(accounts: list, payment_amount: float
             cards_requiring_minimums.append(acc)
         else:
             skipped_cards.append(acc)
-            avalanche_split.append({"card_id": acc['id'], "card_name": acc['name'], "amount": 0.00, "type": "Strategic Skip"})
-            score_booster_split.append({"card_id": acc['id'], "card_name": acc['name'], "amount": 0.00, "type": "Strategic Skip"})
+            shared_split.append({"card_id": acc['id'], "card_name": acc['name'], "amount": 0.00, "type": "Strategic Skip"})
 
     # --- Phase 3: Core Strategic Allocation ---
-    if cards_requiring_minimums and discretionary_payment > 0:
-        total_remaining_minimums = sum(acc['minimum_payment'] for acc in cards_requiring_minimums)
-
-        # Avalanche Logic
-        avalanche_target = max(cards_requiring_minimums, key=lambda x: (x['apr'], x['balance'], x['id']))
-        power_payment_avalanche = discretionary_payment - (total_remaining_minimums - avalanche_target['minimum_payment'])
-        for acc in cards_requiring_minimums:
-            amount = power_payment_avalanche if acc['id'] == avalanche_target['id'] else acc['minimum_payment']
-            avalanche_split.append({"card_id": acc['id'], "card_name": acc['name'], "amount": round(amount, 2), "type": "Power Payment" if acc['id'] == avalanche_target['id'] else "Minimum Payment"})
-
-        # Score Booster Logic
-        score_booster_target = max(cards_requiring_minimums, key=lambda x: (x['utilization_percent'], x['balance'], x['id']))
-        power_payment_score = discretionary_payment - (total_remaining_minimums - score_booster_target['minimum_payment'])
-        for acc in cards_requiring_minimums:
-            amount = power_payment_score if acc['id'] == score_booster_target['id'] else acc['minimum_payment']
-            score_booster_split.append({"card_id": acc['id'], "card_name": acc['name'], "amount": round(amount, 2), "type": "Power Payment" if acc['id'] == score_booster_target['id'] else "Minimum Payment"})
+    # Every registered strategy (see strategies.py) is evaluated in one pass
+    # over a shared feature table; payoffs and skips above are common to all.
+    plans = {name: list(shared_split) for name in STRATEGIES}
+    if cards_requiring_minimums and discretionary_cents > 0:
+        features = build_feature_table(cards_requiring_minimums)
+        for name, result in evaluate_strategies(features, discretionary_cents).items():
+            for i, acc in enumerate(cards_requiring_minimums):
+                if result['target'] is None:
+                    split_type = "Allocated Payment"
+                else:
+                    split_type = "Power Payment" if i == result['target'] else "Minimum Payment"
+                plans[name].append({"card_id": acc['id'], "card_name": acc['name'], "amount": from_cents(result['amounts'][i]), "type": split_type})
+    avalanche_split = plans.pop('avalanche')
+    score_booster_split = plans.pop('score_booster')
 
     # --- Phase 4: Construct Final Data Dossier for AI ---
     return {
         "avalanche_plan": {"split": avalanche_split},
         "score_booster_plan": {"split": score_booster_split},
+        "alternative_plans": {name: {"name": STRATEGIES[name]['label'], "split": split} for name, split in plans.items()},
         "context": {
             "paid_off_cards": [c['name'] for c in paid_off_cards],
             "skipped_cards": [c['name'] for c in skipped_cards]
@@ -129,6 +145,11 @@ class Account(BaseModel):
     apr: float
     creditLimit: float
     promo_apr_expiry_date: Optional[str] = None
+    promo_apr: Optional[float] = None
+    balance_transfer_fee_percent: Optional[float] = None
+    statement_close_day: Optional[int] = None
+    statement_close_date: Optional[str] = None
+    due_date: Optional[str] = None
 
 class UserFinancialContext(BaseModel):
     primary_goal: str
@@ -136,9 +157,12 @@ class UserFinancialContext(BaseModel):
     last_plan_chosen: Optional[str] = None
 
 class V2InterestKillerRequest(BaseModel):
-    accounts: List[Account]
-    payment_amount: float
-    user_context: UserFinancialContext
+    # When nothing changed since the last call, clients may send only the
+    # `fingerprint` returned by that call instead of the full portfolio.
+    accounts: Optional[List[Account]] = None
+    payment_amount: Optional[float] = None
+    user_context: Optional[UserFinancialContext] = None
+    fingerprint: Optional[str] = None
 
 # --- NEW Pydantic models for the re-explain endpoint (if not already present) ---
 class CustomSplitItem(BaseModel):
@@ -153,7 +177,81 @@ class V2ReExplainRequest(BaseModel):
     custom_split: List[CustomSplitItem]
     user_context: Any
 
-from cardrank import advanced_card_recommendation
+from cardrank import advanced_card_recommendation, enrich_merchant_category, explain_ranked_card, ranking_cache
+from reward_table import reward_tables, swipe_recommendation
+from geo_index import resolve_country
+from card_catalog import enrich_cards
+from wallet_export import wallet_export, wallet_exports
+from reward_caps import resolve_card_rewards, spend_counters
+from bonus_routing import bonus_planner, DEFAULT_HORIZON_WEEKS
+
+
+def capped_portfolio(user_id: Optional[str], user_cards: list):
+    """
+    Catalog-enriched cards with this quarter's rotating categories, plus the
+    user's live cap headroom.
+    """
+    cards = resolve_card_rewards(enrich_cards(user_cards))
+    return cards, (spend_counters.remaining(user_id, cards) if user_id else None)
+from missed_rewards import missed_rewards_report
+from spending import (PERIODS as SPENDING_PERIODS, DEFAULT_PERIOD_DAYS, SpendingAccumulator, budget_health,
+                      month_to_date_spend, purchase_columns, purchase_velocity, rolling_aggregates,
+                      spending_velocity, stored_aggregates)
+from rolling import WINDOWS as ROLLING_WINDOWS
+from ingest import IngestError, iter_json_records
+from transaction_store import StaleCursor, transaction_store
+from anomalies import anomaly_report, baseline_cache, check_transaction, stored_report
+from recurring import DEFAULT_HORIZON_DAYS, public, recurring_cache, recurring_charges, upcoming_bills, user_recurring
+from income import expected_paydays, income_cache, income_streams, user_income
+from simulation import simulate_policies, DEFAULT_SIMULATIONS, DEFAULT_DAYS
+
+# Rows handed to the store per lock acquisition while a body is streamed in.
+STORE_INGEST_BATCH = 1000
+
+
+async def iter_transactions(request: Request, fields=('transactions',)):
+    """`(field, txn)` from a streamed JSON or NDJSON body (NDJSON rows are all in the first field)."""
+    content_type = request.headers.get('content-type', '')
+    if 'ndjson' in content_type or 'jsonlines' in content_type:
+        async for txn in iter_ndjson(request.stream()):
+            yield fields[0], txn
+    else:
+        async for field, txn in iter_json_records(request.stream(), fields):
+            yield field or fields[0], txn
+
+
+async def ingest_stream(user_id: str, records) -> Dict:
+    """Feeds streamed transactions into the store in batches; returns the store's counters."""
+    totals = {"cursor": 0, "added": 0, "duplicates": 0, "invalid": 0}
+    batch = []
+
+    def flush():
+        applied = transaction_store.ingest(user_id, batch)
+        for key in ("added", "duplicates", "invalid"):
+            totals[key] += applied[key]
+        totals["cursor"] = applied["cursor"]
+        batch.clear()
+
+    async for _, txn in records:
+        batch.append(txn)
+        if len(batch) >= STORE_INGEST_BATCH:
+            flush()
+    flush()
+    return totals
+
+
+def stored_history(user_id: str, cursor: Optional[int] = None, transactions: Optional[list] = None):
+    """The user's stored history after appending `transactions` (the rows since `cursor`)."""
+    if cursor is not None:
+        transaction_store.get(user_id, cursor)
+    if transactions:
+        return transaction_store.append(user_id, transactions)[0]
+    return transaction_store.get(user_id)
+
+
+def stale_cursor_response(e: StaleCursor) -> JSONResponse:
+    return JSONResponse(status_code=409, content={"error": {"type": "stale_cursor", "detail": str(e)}})
+
 
 # --- 6. API Endpoints ---
 from pydantic import BaseModel
@@ -163,34 +261,66 @@ class CardRankRequest(BaseModel):
     user_cards: list
     transaction_context: dict
     user_context: dict
+    # With a user id, reward caps tracked via /v2/cardrank/spend-events apply.
+    user_id: Optional[str] = None
+    top_k: Optional[int] = None
+    detail_level: str = "standard"
 
 
 # --- Spending Insights Endpoint ---
-@app.post('/v2/spending-insights')
-async def spending_insights_v2(req: SpendingInsightsRequest):
+@app.post('/v2/spending-insights', openapi_extra={"requestBody": {
+    "required": True, "content": {"application/json": {"schema": SpendingInsightsRequest.model_json_schema()}}}})
+async def spending_insights_v2(request: Request, user_id: Optional[str] = None, cursor: Optional[int] = None,
+                               period_days: int = DEFAULT_PERIOD_DAYS):
+    """
+    Accepts JSON `{"transactions": [...], "previous_transactions": [...]}` or
+    NDJSON (current-period transactions, one per line). The body is parsed
+    and aggregated as it arrives (ingest.py, spending.py), never held whole.
+
+    With `?user_id=` the body carries only the rows since `cursor` (possibly
+    none: `[]`); they are appended to the user's stored history and the two
+    periods are the last `period_days` of it and the window before.
+    """
+    if period_days < 1:
+        raise HTTPException(status_code=400, detail="period_days must be at least 1.")
+    accumulator = SpendingAccumulator()
+    try:
+        if user_id is not None:
+            if cursor is not None:
+                transaction_store.get(user_id, cursor)
+            applied = await ingest_stream(user_id, iter_transactions(request, SPENDING_PERIODS))
+        else:
+            async for field, txn in iter_transactions(request, SPENDING_PERIODS):
+                accumulator.add(txn, field)
+    except IngestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except StaleCursor as e:
+        return stale_cursor_response(e)
     try:
         gemini_model = getattr(app.state, 'gemini_model', None)
-        print(f"[AI] /v2/spending-insights called. Model is {'set' if gemini_model else 'NOT set'}.")
-        print(f"[AI] Transactions: {json.dumps(req.transactions)}")
-        if req.previous_transactions:
-            print(f"[AI] Previous Transactions: {json.dumps(req.previous_transactions)}")
-        previous_transactions = req.previous_transactions if req.previous_transactions is not None else []
-        result = spending_insights_ai(
-            gemini_model,
-            req.transactions,
-            previous_transactions
-        )
-        print(f"[AI] Gemini raw result: {result}")
-        # Sanitize and parse AI response
-        if not result or not result.strip():
-            logger.error("AI returned empty response for spending insights.")
-            return {"error": "AI returned empty response.", "category_totals": {}, "top_increases": [], "insight": "No insight available."}
+        # Totals and increases are exact local group-bys; the AI only phrases the insight.
+        if user_id is not None:
+            history = transaction_store.get(user_id)
+            # The default 30-day period is maintained incrementally; other lengths scan the columns.
+            stored = rolling_aggregates(history) if period_days == DEFAULT_PERIOD_DAYS else stored_aggregates(history, period_days)
+            aggregates = {**stored, "cursor": applied["cursor"]}
+            count = applied["cursor"]
+        else:
+            aggregates = accumulator.result()
+            count = accumulator.seen[SPENDING_PERIODS[0]]
+        logger.info(f"[AI] /v2/spending-insights: {count} transactions, "
+                    f"{len(aggregates['category_totals'])} categories. Model is {'set' if gemini_model else 'NOT set'}.")
+        result = spending_insights_ai(gemini_model, aggregates["category_totals"], aggregates["top_increases"])
         try:
-            sanitized = sanitize_ai_json(result)
-            return json.loads(sanitized)
+            parsed = json.loads(sanitize_ai_json(result))
         except Exception as parse_err:
             logger.error(f"Failed to parse AI response: {parse_err}. Raw: {result}")
-            return {"error": "AI returned invalid JSON.", "category_totals": {}, "top_increases": [], "insight": "No insight available."}
+            parsed = {"error": "AI returned invalid JSON."}
+        insight = parsed.get("insight") if isinstance(parsed, dict) else None
+        if not isinstance(insight, str) or not insight.strip():
+            error = parsed.get("error") if isinstance(parsed, dict) else None
+            return {**aggregates, "error": error or "AI returned no insight.", "insight": "No insight available."}
+        return {**aggregates, "insight": insight}
     except Exception as e:
         logger.error(f"Error in /v2/spending-insights: {e}", exc_info=True)
         return {"error": str(e), "category_totals": {}, "top_increases": [], "insight": "No insight available."}
@@ -199,16 +329,179 @@ async def spending_insights_v2(req: SpendingInsightsRequest):
 async def cardrank_v2(req: CardRankRequest):
     try:
         gemini_model = getattr(app.state, 'gemini_model', None)
+        user_cards, reward_caps = capped_portfolio(req.user_id, req.user_cards)
         result = advanced_card_recommendation(
             gemini_model,
-            req.user_cards,
+            user_cards,
             req.transaction_context,
-            req.user_context
+            req.user_context,
+            reward_caps,
+            req.top_k,
+            req.detail_level
         )
         return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error in /v2/cardrank: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+
+class WhyNotRequest(BaseModel):
+    ranking_id: str
+    card_id: str
+
+@app.post('/v2/cardrank/why-not')
+async def cardrank_why_not_v2(req: WhyNotRequest):
+    """Factor breakdown for one card of a previous /v2/cardrank ranking."""
+    try:
+        return explain_ranked_card(req.ranking_id, req.card_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+class CardRankSwipeRequest(BaseModel):
+    user_id: str
+    user_cards: list
+    transaction_context: dict
+    user_context: dict = {}
+
+@app.post('/v2/cardrank/swipe')
+async def cardrank_swipe_v2(req: CardRankSwipeRequest):
+    """Checkout-time ranking from the user's compiled reward table; no LLM call."""
+    try:
+        category = enrich_merchant_category(req.transaction_context)
+        amount = float(req.transaction_context.get('amount') or 0)
+        goal = req.user_context.get('primaryGoal', 'MINIMIZE_INTEREST_COST')
+        country = resolve_country(req.transaction_context.get('location'))
+        user_cards, reward_caps = capped_portfolio(req.user_id, req.user_cards)
+        return swipe_recommendation(req.user_id, user_cards, category, amount, goal, reward_caps,
+                                    country, req.user_context.get('home_country'))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in /v2/cardrank/swipe: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+class WalletExportRequest(BaseModel):
+    user_id: str
+    user_cards: list
+    since_version: Optional[str] = None
+
+@app.post('/v2/cardrank/wallet')
+async def cardrank_wallet_v2(req: WalletExportRequest):
+    """Best-card-per-category table for on-device ranking; deltas via `since_version`."""
+    try:
+        user_cards, reward_caps = capped_portfolio(req.user_id, req.user_cards)
+        return wallet_export(req.user_id, user_cards, req.since_version, reward_caps)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in /v2/cardrank/wallet: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+class SpendEventsRequest(BaseModel):
+    user_id: str
+    user_cards: list
+    transactions: list
+
+@app.post('/v2/cardrank/spend-events')
+async def cardrank_spend_events_v2(req: SpendEventsRequest):
+    """Feeds purchases into the per-user reward-cap counters; returns current cap headroom."""
+    try:
+        applied = spend_counters.record(req.user_id, req.user_cards, req.transactions)
+        user_cards, reward_caps = capped_portfolio(req.user_id, req.user_cards)
+        caps = [{"card_id": user_cards[i].get('id'), "category": category, "remaining": round(left, 2), "multiplier_after": after}
+                for i, by_category in reward_caps.items() for category, (left, after) in by_category.items()]
+        return {"applied": applied, "caps": caps}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in /v2/cardrank/spend-events: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+class BonusPlanRequest(BaseModel):
+    user_id: str
+    user_cards: list
+    # Only new transactions need to be sent; history accumulates per user.
+    transactions: list = []
+    horizon_weeks: int = DEFAULT_HORIZON_WEEKS
+
+@app.post('/v2/cardrank/bonus-plan')
+async def cardrank_bonus_plan_v2(req: BonusPlanRequest):
+    """Routes expected category spend across cards to capture signup bonuses."""
+    try:
+        if not 1 <= req.horizon_weeks <= 52:
+            raise ValueError("horizon_weeks must be between 1 and 52.")
+        return bonus_planner.plan(req.user_id, enrich_cards(req.user_cards), req.transactions, req.horizon_weeks)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in /v2/cardrank/bonus-plan: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+class MissedRewardsRequest(BaseModel):
+    user_cards: list
+    transactions: list
+
+@app.post('/v2/cardrank/missed-rewards')
+async def missed_rewards_v2(req: MissedRewardsRequest):
+    try:
+        return missed_rewards_report(enrich_cards(req.user_cards), req.transactions)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in /v2/cardrank/missed-rewards: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+class SimulationRequest(BaseModel):
+    user_cards: list
+    transactions: list
+    user_context: dict = {}
+    n_simulations: int = DEFAULT_SIMULATIONS
+    days: int = DEFAULT_DAYS
+    seed: Optional[int] = None
+
+@app.post('/v2/cardrank/simulate')
+async def cardrank_simulate_v2(req: SimulationRequest):
+    """Monte Carlo rewards, interest and utilization per card-selection policy."""
+    try:
+        user_cards, _ = capped_portfolio(None, req.user_cards)
+        return simulate_policies(user_cards, req.transactions, req.user_context, req.n_simulations, req.days, req.seed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in /v2/cardrank/simulate: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post('/v2/categorize')
+async def categorize_v2(request: Request):
+    """
+    Accepts `application/x-ndjson` (one transaction per line) or JSON
+    `{"transactions": [...]}` and streams one NDJSON result per transaction.
+    """
+    content_type = request.headers.get('content-type', '')
+    streaming_input = 'ndjson' in content_type or 'jsonlines' in content_type
+    if streaming_input:
+        transactions = iter_ndjson(request.stream())
+    else:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be JSON or NDJSON.")
+        items = body.get('transactions') if isinstance(body, dict) else body
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Expected a 'transactions' list.")
+        transactions = iter_list(items)
+
+    gemini_model = getattr(app.state, 'gemini_model', None)
+    ask_ai = (lambda merchants, categories: categorize_merchants_ai(gemini_model, merchants, categories)) if gemini_model else None
+
+    async def body_lines():
+        async for result in categorize_stream(transactions, ask_ai):
+            yield json.dumps(result) + '\n'
+
+    # NDJSON input is read while the response streams, so the body must have one reader only.
+    response_class = RequestStreamingResponse if streaming_input else StreamingResponse
+    return response_class(body_lines(), media_type='application/x-ndjson')
+
 @app.get("/", summary="Health Check")
 def root():
     return {"status": "ok", "ai_model_status": "loaded" if hasattr(app.state, 'gemini_model') and app.state.gemini_model else "initialization_failed"}
@@ -231,15 +524,35 @@ def health():
 async def interestkiller_v2(req: V2InterestKillerRequest):
     raw_ai_result = None
     try:
+        # 0. Memoized plans: an unchanged portfolio skips the algorithm and the AI
+        missing = [field for field in ('accounts', 'payment_amount', 'user_context') if getattr(req, field) is None]
+        if req.fingerprint and len(missing) == 3:
+            cached = get_cached_plan(req.fingerprint)
+            if cached is None:
+                return JSONResponse(status_code=409, content={"error": {"type": "fingerprint_not_found", "detail": "Unknown or expired fingerprint; send accounts, payment_amount and user_context."}})
+            return cached
+        if missing:
+            return JSONResponse(status_code=422, content={"error": {"type": "invalid_input", "detail": f"Missing required fields: {', '.join(missing)}."}})
+        fingerprint = portfolio_fingerprint(
+            [acc.model_dump() for acc in req.accounts],
+            req.payment_amount,
+            req.user_context.model_dump()
+        )
+        cached = get_cached_plan(fingerprint)
+        if cached is not None:
+            return cached
+
         # 1. Algorithm runs and produces perfect math
+        accounts = [acc.model_dump() for acc in req.accounts]
         plan_data = precompute_payment_plans_sophisticated(
-            [acc.model_dump() for acc in req.accounts], 
+            accounts, 
             req.payment_amount
         )
-        # 2. AI is called with its simplified task
+        balance_transfers = evaluate_balance_transfers(accounts)
+        # 2. AI is called with its simplified task (it only explains the two core plans)
         raw_ai_result = interestkiller_ai_hybrid(
             app.state.gemini_model,
-            plan_data,
+            {key: value for key, value in plan_data.items() if key != 'alternative_plans'},
             req.user_context.model_dump()
         )
         sanitized_ai_result = sanitize_ai_json(raw_ai_result)
@@ -270,8 +583,12 @@ async def interestkiller_v2(req: V2InterestKillerRequest):
                 "split": plan_data['score_booster_plan']['split'], # Math from algorithm
                 "explanation": ai_text_fields['maximize_score_explanation'], # Text from AI
                 "projected_outcome": ai_text_fields['maximize_score_projection'] # Text from AI
-            }
+            },
+            "alternative_plans": plan_data['alternative_plans'], # Math from algorithm
+            "balance_transfer_opportunities": balance_transfers, # Math from algorithm
+            "fingerprint": fingerprint
         }
+        store_plan(fingerprint, final_response)
         return final_response
     except (json.JSONDecodeError, ValueError) as e:
         logger.error(f"AI response failed validation: {e}. Raw response: {raw_ai_result}")
@@ -280,6 +597,66 @@ async def interestkiller_v2(req: V2InterestKillerRequest):
         logger.error(f"An unexpected error occurred in interestkiller_v2: {e}", exc_info=True)
         return JSONResponse(status_code=500, content={"error": {"type": "internal_server_error", "detail": str(e)}}) 
 
+@app.post('/v2/transactions/ingest')
+async def transactions_ingest_v2(request: Request, user_id: str):
+    """
+    Appends a user's transactions to the service-side store. The body is
+    JSON (`{"transactions": [...]}` or a bare array) or NDJSON and is
+    streamed into the store; rows already stored (by transaction id) are
+    skipped. The returned `cursor` is what later requests send back.
+    """
+    try:
+        applied = await ingest_stream(user_id, iter_transactions(request))
+    except IngestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"user_id": user_id, **applied}
+
+class TransactionEventRequest(BaseModel):
+    user_id: str
+    # One or a few new transactions, as they post.
+    transactions: list
+
+
+def rolling_stats(windows, key: str) -> Dict:
+    code = windows.codes.get(key)
+    return {name: windows.stats(code if code is not None else len(windows.totals), name) for name, _ in ROLLING_WINDOWS}
+
+@app.post('/v2/transactions/events')
+def transaction_events_v2(req: TransactionEventRequest):
+    """
+    Records new transactions as they happen. Each one is appended to the
+    store and folded into the rolling windows in constant time; the
+    response carries the updated day/week/month aggregates of the touched
+    categories and merchants.
+    """
+    history, applied = transaction_store.append(req.user_id, req.transactions)
+    touched = {"categories": set(), "merchants": set()}
+    for row in applied.pop("rows"):
+        if history.cents[row] > 0:
+            touched["categories"].add(history.category_names[history.category[row]])
+            touched["merchants"].add(history.merchant_names[history.merchant[row]])
+    return {"user_id": req.user_id, **applied, "aggregates": {
+        "categories": {key: rolling_stats(history.categories, key) for key in sorted(touched["categories"])},
+        "merchants": {key: rolling_stats(history.merchants, key) for key in sorted(touched["merchants"])},
+    }}
+
+@app.get('/v2/cache/stats', summary="Cache Metrics")
+def cache_stats():
+    return {
+        "interestkiller_plans": plan_cache.stats(),
+        "merchant_normalization": normalization_stats(),
+        "ai_merchant_categories": ai_category_cache.stats(),
+        "reward_tables": reward_tables.stats(),
+        "wallet_exports": wallet_exports.stats(),
+        "spend_counters": spend_counters.stats(),
+        "bonus_plans": bonus_planner.plans.stats(),
+        "cardrank_rankings": ranking_cache.stats(),
+        "transactions": transaction_store.stats(),
+        "anomaly_baselines": baseline_cache.stats(),
+        "recurring_series": recurring_cache.stats(),
+        "income_streams": income_cache.stats()
+    }
+
 @app.post('/v2/interestkiller/re-explain')
 async def interestkiller_re_explain_v2(req: V2ReExplainRequest):
     try:
@@ -307,26 +684,178 @@ async def interestkiller_re_explain_v2(req: V2ReExplainRequest):
         logger.error(f"An unexpected error occurred in re-explain endpoint: {e}", exc_info=True)
         return JSONResponse(status_code=500, content={"error": {"type": "internal_server_error", "detail": str(e)}}) 
     
+# --- NEW ENDPOINT: /v2/interestkiller/timing ---
+class Paycheck(BaseModel):
+    date: str
+    amount: float
+
+class PaycheckSchedule(BaseModel):
+    next_date: str
+    cadence: str = "biweekly"
+    amount: float
+
+class V2PaymentTimingRequest(BaseModel):
+    accounts: List[Account]
+    paychecks: List[Paycheck] = []
+    paycheck_schedule: Optional[PaycheckSchedule] = None
+    starting_cash: float = 0.0
+    start_date: Optional[str] = None
+    # Without paychecks, a stored user's detected paydays are used, with
+    # `income_share` of each deposit earmarked for card payments.
+    user_id: Optional[str] = None
+    income_share: float = 1.0
+
+@app.post('/v2/interestkiller/timing')
+async def interestkiller_timing_v2(req: V2PaymentTimingRequest):
+    try:
+        start = date.fromisoformat(req.start_date) if req.start_date else date.today()
+        paychecks = [p.model_dump() for p in req.paychecks]
+        if req.paycheck_schedule:
+            # One cycle is at most ~2 months out (next close + grace period).
+            paychecks += expand_paycheck_schedule(req.paycheck_schedule.model_dump(), start, start + timedelta(days=62))
+        if not paychecks and req.user_id is not None:
+            if not 0.0 <= req.income_share <= 1.0:
+                raise ValueError("income_share must be between 0 and 1.")
+            streams = user_income(req.user_id, stored_history(req.user_id))
+            paychecks = [{"date": date.fromisoformat(p["date"]), "amount": round(p["amount"] * req.income_share, 2)}
+                         for p in expected_paydays(streams, start, 62)]
+        return optimize_payment_timing(
+            [acc.model_dump() for acc in req.accounts],
+            paychecks,
+            start,
+            req.starting_cash
+        )
+    except StaleCursor as e:
+        return stale_cursor_response(e)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": {"type": "invalid_input", "detail": str(e)}})
+    except Exception as e:
+        logger.error(f"An unexpected error occurred in interestkiller_timing_v2: {e}", exc_info=True)
+        return JSONResponse(status_code=500, content={"error": {"type": "internal_server_error", "detail": str(e)}})
+
+# --- Anomaly Endpoints ---
+class AnomalyRequest(BaseModel):
+    transactions: list = []
+    # With a user id, `transactions` are only the rows since `cursor`.
+    user_id: Optional[str] = None
+    cursor: Optional[int] = None
+
+class AnomalyCheckRequest(BaseModel):
+    user_id: str
+    transaction: dict
+
+@app.post('/v2/anomalies')
+def anomalies_v2(req: AnomalyRequest):
+    """Flags unusual charges across a transaction history (see anomalies.py)."""
+    try:
+        if req.user_id is not None:
+            history = stored_history(req.user_id, req.cursor, req.transactions)
+            return {**stored_report(req.user_id, history), "cursor": history.cursor}
+        return anomaly_report(req.transactions)
+    except StaleCursor as e:
+        return stale_cursor_response(e)
+    except Exception as e:
+        logger.error(f"Error in /v2/anomalies: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post('/v2/anomalies/check')
+def anomalies_check_v2(req: AnomalyCheckRequest):
+    """
+    Scores one new transaction against the stored user's baselines, then
+    appends it to the store.
+    """
+    try:
+        history = transaction_store.get(req.user_id)
+        result = check_transaction(req.user_id, history, req.transaction)
+        applied = transaction_store.ingest(req.user_id, [req.transaction])
+        return {**result, "cursor": applied["cursor"]}
+    except StaleCursor as e:
+        return stale_cursor_response(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in /v2/anomalies/check: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- Recurring Charges Endpoint ---
+class RecurringRequest(BaseModel):
+    transactions: list = []
+    # With a user id, `transactions` are only the rows since `cursor`.
+    user_id: Optional[str] = None
+    cursor: Optional[int] = None
+    horizon_days: int = DEFAULT_HORIZON_DAYS
+
+@app.post('/v2/recurring')
+def recurring_v2(req: RecurringRequest):
+    """Subscriptions and other recurring charges, with their next predicted dates and amounts."""
+    try:
+        if req.user_id is not None:
+            history = stored_history(req.user_id, req.cursor, req.transactions)
+            series, extra = user_recurring(req.user_id, history), {"cursor": history.cursor}
+        else:
+            series, extra = recurring_charges(req.transactions), {}
+        return {"recurring": public(series), "upcoming_bills": upcoming_bills(series, date.today(), req.horizon_days), **extra}
+    except StaleCursor as e:
+        return stale_cursor_response(e)
+    except Exception as e:
+        logger.error(f"Error in /v2/recurring: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- Income Endpoint ---
+class IncomeRequest(BaseModel):
+    transactions: list = []
+    # With a user id, `transactions` are only the rows since `cursor`.
+    user_id: Optional[str] = None
+    cursor: Optional[int] = None
+    horizon_days: int = DEFAULT_HORIZON_DAYS
+
+@app.post('/v2/income')
+def income_v2(req: IncomeRequest):
+    """Paycheck streams (weekly, biweekly, semimonthly, monthly) and the next expected paydays."""
+    try:
+        if req.user_id is not None:
+            history = stored_history(req.user_id, req.cursor, req.transactions)
+            streams, extra = user_income(req.user_id, history), {"cursor": history.cursor}
+        else:
+            streams, extra = income_streams(req.transactions), {}
+        return {"income_streams": public(streams),
+                "next_paydays": expected_paydays(streams, date.today(), req.horizon_days), **extra}
+    except StaleCursor as e:
+        return stale_cursor_response(e)
+    except Exception as e:
+        logger.error(f"Error in /v2/income: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
 # --- NEW ENDPOINT: /v2/budget-health ---
 from fastapi import Body
 
 class BudgetHealthRequest(BaseModel):
     user_budget: dict
-    transactions: list
+    transactions: list = []
+    # With a user id, `transactions` are only the rows since `cursor`.
+    user_id: Optional[str] = None
+    cursor: Optional[int] = None
 
 @app.post('/v2/budget-health')
 async def budget_health_v2(req: BudgetHealthRequest):
     try:
-        # Placeholder logic: Replace with real AI/model call
-        # For now, just echo the input and return a dummy result
-        # You can wire up your AI logic here
-        result = {
-            "score": 85,
-            "insights": "Your budget health is strong. Keep tracking expenses.",
-            "user_budget": req.user_budget,
-            "transactions": req.transactions
-        }
+        if req.user_id is not None:
+            history = stored_history(req.user_id, req.cursor, req.transactions)
+            # Stored history spans many months; budgets are monthly.
+            spent = month_to_date_spend(history)
+            cursor = history.cursor
+        else:
+            accumulator = SpendingAccumulator()
+            for txn in req.transactions:
+                accumulator.add(txn)
+            spent = accumulator.result()["category_totals"]
+            cursor = None
+        result = budget_health(req.user_budget, spent)
+        if cursor is not None:
+            result["cursor"] = cursor
         return {"result": result}
+    except StaleCursor as e:
+        return stale_cursor_response(e)
     except Exception as e:
         logger.error(f"Error in /v2/budget-health: {e}", exc_info=True)
         return {"error": str(e)}
@@ -334,23 +863,41 @@ async def budget_health_v2(req: BudgetHealthRequest):
 # --- NEW ENDPOINT: /v2/cash-flow-prediction ---
 class CashFlowPredictionRequest(BaseModel):
     accounts: list
-    upcoming_bills: list
-    transactions: list
+    # Derived from recurring charges in the transactions when omitted.
+    upcoming_bills: Optional[list] = None
+    transactions: list = []
+    # With a user id, `transactions` are only the rows since `cursor`.
+    user_id: Optional[str] = None
+    cursor: Optional[int] = None
 
 @app.post('/v2/cash-flow-prediction')
 async def cash_flow_prediction_v2(req: CashFlowPredictionRequest):
     try:
-        # Placeholder logic: Replace with real AI/model call
-        # For now, just echo the input and return a dummy result
-        # You can wire up your AI logic here
-        result = {
-            "predicted_balance": 1200.50,
-            "risk": "Low",
-            "accounts": req.accounts,
-            "upcoming_bills": req.upcoming_bills,
-            "transactions": req.transactions
-        }
+        if req.user_id is not None:
+            history = stored_history(req.user_id, req.cursor, req.transactions)
+            velocity = spending_velocity(history)
+            series = user_recurring(req.user_id, history) if req.upcoming_bills is None else None
+            streams = user_income(req.user_id, history)
+        else:
+            history = None
+            velocity = purchase_velocity(purchase_columns(req.transactions)[0].columns())
+            series = recurring_charges(req.transactions) if req.upcoming_bills is None else None
+            streams = income_streams(req.transactions)
+        bills = req.upcoming_bills if series is None else upcoming_bills(series, date.today())
+        raw = cash_flow_prediction_ai(getattr(app.state, 'gemini_model', None), req.accounts, bills, velocity)
+        try:
+            parsed = json.loads(sanitize_ai_json(raw))
+        except Exception as parse_err:
+            logger.error(f"Failed to parse AI response: {parse_err}. Raw: {raw}")
+            parsed = {"error": "AI returned invalid JSON."}
+        result = parsed if isinstance(parsed, dict) else {"error": "AI returned invalid JSON."}
+        result.update({"upcoming_bills": bills, "recent_spending_velocity": velocity,
+                       "expected_income": expected_paydays(streams, date.today())})
+        if history is not None:
+            result["cursor"] = history.cursor
         return {"result": result}
+    except StaleCursor as e:
+        return stale_cursor_response(e)
     except Exception as e:
         logger.error(f"Error in /v2/cash-flow-prediction: {e}", exc_info=True)
         return {"error": str(e)}
@@ -0,0 +1,119 @@
+"""
+Balance-transfer opportunity evaluator.
+
+Every (source, destination) card pair is scored at a grid of transfer amounts
+in one vectorized pass. Each candidate is projected month by month with the
+shared accrual math in money.py: the baseline leaves the debt on the source
+card, the alternative moves it (plus the transfer fee) onto the destination's
+promo rate, which reverts to the destination's regular APR when the promo
+ends. A source card's own promo is honoured the same way. Both scenarios get the same monthly payment, so the difference in
+interest minus the fee is the net saving.
+"""
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from dates import parse_date
+from money import to_cents, to_bps, from_cents, div_round, project_balances_cents, BPS_PER_UNIT
+
+DEFAULT_TRANSFER_FEE_PERCENT = 3.0
+MIN_TRANSFER_FEE_CENTS = 500
+DEFAULT_HORIZON_MONTHS = 12
+AMOUNT_STEPS = 8
+
+
+# Unparseable expiries read as None, which callers treat as "no promo".
+parse_promo_expiry = parse_date
+
+
+def _promo_months(card: Dict, today: date) -> int:
+    end = parse_promo_expiry(card.get('promo_apr_expiry_date'))
+    if end is None:
+        return 0
+    return max((end.year - today.year) * 12 + end.month - today.month, 0)
+
+
+def evaluate_balance_transfers(accounts: List[Dict], today: Optional[date] = None,
+                               horizon_months: int = DEFAULT_HORIZON_MONTHS,
+                               max_results: int = 3) -> List[Dict]:
+    """
+    Returns the best non-conflicting transfers (each source and destination
+    used at most once) with positive net savings, best first.
+    """
+    today = today or date.today()
+    n = len(accounts)
+    if n < 2:
+        return []
+    balances = to_cents([a.get('balance', 0) for a in accounts])
+    limits = to_cents([a.get('creditLimit', 0) for a in accounts])
+    aprs = to_bps([a.get('apr', 0) for a in accounts])
+    promo_months = np.array([_promo_months(a, today) for a in accounts], dtype=np.int64)
+    promo_aprs = to_bps([a.get('promo_apr') or 0 for a in accounts])
+    fee_bps = to_bps([a.get('balance_transfer_fee_percent', DEFAULT_TRANSFER_FEE_PERCENT)
+                      if a.get('balance_transfer_fee_percent') is not None else DEFAULT_TRANSFER_FEE_PERCENT
+                      for a in accounts])
+
+    # --- Candidate pairs: promo destinations that are cheaper than the source ---
+    src, dst = np.meshgrid(np.arange(n), np.arange(n), indexing='ij')
+    src, dst = src.ravel(), dst.ravel()
+    valid = (src != dst) & (promo_months[dst] > 0) & (balances[src] > 0) & (aprs[src] > promo_aprs[dst])
+    src, dst = src[valid], dst[valid]
+    if src.size == 0:
+        return []
+
+    # Headroom must cover the transfer plus its fee, whether the percentage or the floor applies.
+    headroom = np.maximum(limits[dst] - np.maximum(balances[dst], 0), 0)
+    max_amount = np.minimum.reduce([balances[src],
+                                    (headroom * BPS_PER_UNIT) // (BPS_PER_UNIT + fee_bps[dst]),
+                                    np.maximum(headroom - MIN_TRANSFER_FEE_CENTS, 0)])
+    steps = np.arange(1, AMOUNT_STEPS + 1, dtype=np.int64)
+    amounts = (max_amount[:, None] * steps[None, :]) // AMOUNT_STEPS  # pairs x amounts
+    fees = np.maximum(div_round(amounts * fee_bps[dst][:, None], BPS_PER_UNIT), MIN_TRANSFER_FEE_CENTS)
+    # Fee rounding can still tip a grid point over the limit; drop those.
+    amounts = np.where(amounts + fees <= headroom[:, None], amounts, 0)
+    fees = np.where(amounts > 0, fees, 0)
+
+    # --- Same payment in both scenarios: clear the transfer by promo end ---
+    months = int(max(horizon_months, promo_months[dst].max()))
+    payoff_months = np.maximum(promo_months[dst], 1)[:, None]
+    payments = -(-amounts // payoff_months)  # ceiling division
+
+    month_index = np.arange(months)[:, None, None]
+    source_apr = np.where(month_index < promo_months[src][None, :, None], promo_aprs[src][None, :, None], aprs[src][None, :, None])
+    source_apr = np.broadcast_to(source_apr, (months,) + amounts.shape)
+    _, baseline_interest = project_balances_cents(amounts, source_apr, payments, months)
+    transfer_apr = np.where(month_index < promo_months[dst][None, :, None], promo_aprs[dst][None, :, None], aprs[dst][None, :, None])
+    transfer_apr = np.broadcast_to(transfer_apr, (months,) + amounts.shape)
+    _, transfer_interest = project_balances_cents(amounts + fees, transfer_apr, payments, months)
+
+    net_savings = baseline_interest.sum(axis=0) - transfer_interest.sum(axis=0) - fees
+    best_step = net_savings.argmax(axis=1)
+    rows = np.arange(src.size)
+    best_savings = net_savings[rows, best_step]
+
+    # --- Greedy pick: one transfer per source and per destination ---
+    results = []
+    used_src, used_dst = set(), set()
+    for i in np.argsort(-best_savings, kind='stable'):
+        if best_savings[i] <= 0 or len(results) >= max_results:
+            break
+        s, d, k = int(src[i]), int(dst[i]), int(best_step[i])
+        if s in used_src or d in used_dst:
+            continue
+        used_src.add(s)
+        used_dst.add(d)
+        results.append({
+            "from_card_id": accounts[s]['id'],
+            "from_card_name": accounts[s].get('name'),
+            "to_card_id": accounts[d]['id'],
+            "to_card_name": accounts[d].get('name'),
+            "amount": from_cents(amounts[i, k]),
+            "transfer_fee": from_cents(fees[i, k]),
+            "promo_months": int(promo_months[d]),
+            "monthly_payment": from_cents(payments[i, k]),
+            "interest_avoided": from_cents(baseline_interest[:, i, k].sum() - transfer_interest[:, i, k].sum()),
+            "net_savings": from_cents(best_savings[i]),
+            "horizon_months": months,
+        })
+    return results
@@ -0,0 +1,214 @@
+"""
+Signup-bonus spend routing.
+
+A bonus is earned by reaching `spend_needed` on a card before its deadline,
+which single purchases almost never do on their own. Expected spending per
+category is projected from the user's history (a per-day rate times the
+horizon), the horizon is cut into windows at each bonus deadline, and the
+routing of category spend to cards in each window is a small LP:
+
+    maximize   sum(reward_rate[card, category] * x[card, category, window])
+    subject to sum over cards of x[., category, window] == expected spend
+               spend on bonus card b before its deadline >= spend_needed[b]
+                   (for each bonus in the chosen subset)
+
+One LP is solved per subset of bonuses, largest subsets first, and the
+subset with the highest rewards plus bonus value wins. A subset that is
+infeasible makes every superset infeasible too, so those are skipped.
+
+Per-user category totals are kept as running sums, so new transactions
+update them in O(1) each; the plan is re-solved only when those totals or
+the portfolio change.
+"""
+import hashlib
+import itertools
+import json
+import os
+import threading
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from scipy.optimize import linprog
+
+from cardrank import enrich_merchant_category
+from cardrank_engine import compile_portfolio, category_indices
+from dates import parse_date
+from lru import LRUCache
+from money import to_cents
+
+DEFAULT_HORIZON_WEEKS = 12
+MAX_BONUS_CARDS = 8  # 2^8 LPs at most
+# Shorter histories are spread over this many days, so one purchase is not
+# projected as a daily habit.
+MIN_HISTORY_DAYS = 14
+SEEN_IDS_PER_USER = int(os.getenv("BONUS_SEEN_IDS_PER_USER", "10000"))
+
+
+class SpendHistory:
+    """Running per-category spend totals and the date span they cover (at least MIN_HISTORY_DAYS)."""
+
+    def __init__(self):
+        self.totals_cents: Dict[str, int] = {}
+        self.first: Optional[date] = None
+        self.last: Optional[date] = None
+        # The most recent transaction ids, so a resent batch is not counted twice.
+        self.seen_ids = LRUCache(maxsize=SEEN_IDS_PER_USER)
+        self.epoch = 0
+
+    def add(self, transactions: List[Dict]) -> int:
+        applied = 0
+        for txn in transactions:
+            txn_id = txn.get('id') or txn.get('transaction_id')
+            if txn_id is not None and txn_id in self.seen_ids:
+                continue
+            day = parse_date(txn.get('date'))
+            try:
+                amount = float(txn.get('amount'))
+            except (TypeError, ValueError):
+                continue
+            if day is None or not amount > 0:
+                continue
+            if txn_id is not None:
+                self.seen_ids.put(txn_id, True)
+            category = enrich_merchant_category(txn)
+            self.totals_cents[category] = self.totals_cents.get(category, 0) + int(to_cents(amount))
+            self.first = day if self.first is None else min(self.first, day)
+            self.last = day if self.last is None else max(self.last, day)
+            applied += 1
+        if applied:
+            self.epoch += 1
+        return applied
+
+    def daily_rates(self) -> Dict[str, float]:
+        if self.first is None:
+            return {}
+        days = max((self.last - self.first).days + 1, MIN_HISTORY_DAYS)
+        return {category: cents / 100.0 / days for category, cents in self.totals_cents.items()}
+
+
+def _bonus_cards(user_cards: List[Dict], start: date, horizon_days: int) -> List[Dict]:
+    bonuses = []
+    for i, card in enumerate(user_cards):
+        progress = card.get('signup_bonus_progress') or {}
+        try:
+            needed = float(progress.get('spend_needed') or 0)
+            value = float(progress.get('bonus_value') or 0)
+        except (TypeError, ValueError):
+            continue
+        deadline = parse_date(progress.get('deadline'))
+        days_left = horizon_days if deadline is None else min((deadline - start).days, horizon_days)
+        if needed > 0 and value > 0 and days_left > 0:
+            bonuses.append({"index": i, "needed": needed, "value": value, "days": days_left})
+    bonuses.sort(key=lambda b: -b["value"])
+    return bonuses[:MAX_BONUS_CARDS]
+
+
+def _solve(rates: np.ndarray, supply: np.ndarray, window_ends: np.ndarray, bonuses: List[Dict]):
+    """LP for one bonus subset. Returns (rewards, x[card, category, window]) or None if infeasible."""
+    n_cards, n_categories = rates.shape
+    n_windows = supply.shape[1]
+    objective = -np.repeat(rates.ravel(), n_windows)
+    # Every (category, window) supply is routed in full.
+    a_eq = np.zeros((n_categories * n_windows, n_cards * n_categories * n_windows))
+    for k in range(n_categories):
+        for w in range(n_windows):
+            a_eq[k * n_windows + w, [(c * n_categories + k) * n_windows + w for c in range(n_cards)]] = 1.0
+    a_ub, b_ub = None, None
+    if bonuses:
+        a_ub = np.zeros((len(bonuses), a_eq.shape[1]))
+        for row, bonus in enumerate(bonuses):
+            before = np.flatnonzero(window_ends <= bonus["days"])
+            for k in range(n_categories):
+                a_ub[row, (bonus["index"] * n_categories + k) * n_windows + before] = -1.0
+        b_ub = np.array([-b["needed"] for b in bonuses])
+    result = linprog(objective, A_ub=a_ub, b_ub=b_ub, A_eq=a_eq, b_eq=supply.ravel(), bounds=(0, None), method='highs')
+    if result.status != 0:
+        return None
+    return -result.fun, result.x.reshape(n_cards, n_categories, n_windows)
+
+
+def plan_bonus_routing(user_cards: List[Dict], daily_rates: Dict[str, float], start: date,
+                       horizon_weeks: int = DEFAULT_HORIZON_WEEKS) -> Dict:
+    horizon_days = horizon_weeks * 7
+    categories = sorted(c for c, rate in daily_rates.items() if rate > 0)
+    if not user_cards:
+        raise ValueError("No cards provided.")
+    portfolio = compile_portfolio(user_cards)
+    bonuses = _bonus_cards(user_cards, start, horizon_days)
+    plan = {"horizon_weeks": horizon_weeks, "expected_spend": {c: round(daily_rates[c] * horizon_days, 2) for c in categories},
+            "captured_bonuses": [], "routing": [], "expected_rewards": 0.0, "bonus_value": 0.0,
+            "total_value": 0.0, "baseline_value": 0.0}
+    if not categories:
+        return plan
+
+    cols = category_indices(portfolio, categories)
+    rates = portfolio["multipliers"][:, cols] * portfolio["point_value"][:, None]  # $ reward per $ spent
+    window_ends = np.unique(np.array([b["days"] for b in bonuses] + [horizon_days]))
+    lengths = np.diff(np.concatenate(([0], window_ends)))
+    supply = np.array([daily_rates[c] for c in categories])[:, None] * lengths[None, :]
+
+    baseline_rewards, best_x = _solve(rates, supply, window_ends, [])
+    best_value, best_subset = baseline_rewards, ()
+    infeasible = []
+    for size in range(len(bonuses), 0, -1):
+        for subset in itertools.combinations(range(len(bonuses)), size):
+            if any(set(bad) <= set(subset) for bad in infeasible):
+                continue
+            chosen = [bonuses[i] for i in subset]
+            upper = supply.sum() * rates.max() + sum(b["value"] for b in chosen)
+            if upper <= best_value:
+                continue
+            solved = _solve(rates, supply, window_ends, chosen)
+            if solved is None:
+                infeasible.append(subset)
+                continue
+            value = solved[0] + sum(b["value"] for b in chosen)
+            if value > best_value:
+                best_value, best_subset, best_x = value, subset, solved[1]
+
+    chosen = [bonuses[i] for i in best_subset]
+    routed = best_x.sum(axis=2)
+    plan["routing"] = [{"category": categories[k], "card_id": portfolio["ids"][c], "amount": round(float(routed[c, k]), 2)}
+                       for c in range(len(user_cards)) for k in range(len(categories)) if routed[c, k] >= 0.005]
+    plan["captured_bonuses"] = [{"card_id": portfolio["ids"][b["index"]], "bonus_value": b["value"],
+                                 "spend_needed": b["needed"], "deadline": (start + timedelta(days=int(b["days"]))).isoformat()}
+                                for b in chosen]
+    bonus_value = sum(b["value"] for b in chosen)
+    plan.update({"expected_rewards": round(float(best_value - bonus_value), 2), "bonus_value": round(bonus_value, 2),
+                 "total_value": round(float(best_value), 2), "baseline_value": round(float(baseline_rewards), 2)})
+    return plan
+
+
+class BonusPlanner:
+    """Per-user spend history and the last plan solved from it."""
+
+    def __init__(self, maxsize: int = 10000):
+        self._histories = LRUCache(maxsize=maxsize)
+        self.plans = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def record(self, user_id: str, transactions: List[Dict]) -> SpendHistory:
+        with self._lock:
+            history = self._histories.get(user_id)
+            if history is None:
+                history = SpendHistory()
+                self._histories.put(user_id, history)
+            history.add(transactions)
+            return history
+
+    def plan(self, user_id: str, user_cards: List[Dict], transactions: Optional[List[Dict]] = None,
+             horizon_weeks: int = DEFAULT_HORIZON_WEEKS, today: Optional[date] = None) -> Dict:
+        today = today or date.today()
+        history = self.record(user_id, transactions or [])
+        cards_key = hashlib.sha256(json.dumps(user_cards, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        key = (user_id, cards_key, history.epoch, horizon_weeks, today.isoformat())
+        cached = self.plans.get(key)
+        if cached is not None:
+            return cached
+        plan = plan_bonus_routing(user_cards, history.daily_rates(), today, horizon_weeks)
+        self.plans.put(key, plan)
+        return plan
+
+
+bonus_planner = BonusPlanner(maxsize=int(os.getenv("BONUS_PLANNER_USERS", "10000")))
@@ -0,0 +1,78 @@
+"""
+Builds the compact card catalog loaded by card_catalog.py.
+
+    python build_card_catalog.py [source.tsv] [output.json.gz]
+
+Every product is indexed under its name with and without the issuer and
+under each alias; the trigram postings for those keys are stored too, so
+loading is a single JSON parse. Keys claimed by two products are errors.
+"""
+import gzip
+import json
+import os
+import sys
+
+from card_catalog import DATA_DIR, DEFAULT_CATALOG_PATH, catalog_key, trigrams
+
+DEFAULT_SOURCE_PATH = os.path.join(DATA_DIR, 'card_products.tsv')
+
+
+def _rewards(spec: str, where: str) -> dict:
+    rewards = {}
+    for item in spec.split(','):
+        category, _, multiplier = item.partition('=')
+        if not category or not multiplier:
+            raise ValueError(f"{where}: bad reward '{item}'")
+        rewards[category.strip()] = float(multiplier)
+    if 'default' not in rewards:
+        raise ValueError(f"{where}: rewards need a default rate")
+    return rewards
+
+
+def build(source_path: str, output_path: str) -> dict:
+    products, keys = [], {}
+    with open(source_path, encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            where = f"{source_path}:{line_no}"
+            product_id, issuer, name, aliases, annual_fee, point_value, fx_fee, rewards = line.split('\t')
+            index = len(products)
+            products.append({
+                "id": product_id,
+                "issuer": issuer,
+                "name": name,
+                "annual_fee": float(annual_fee),
+                "point_value_cents": float(point_value),
+                "foreign_transaction_fee_percent": float(fx_fee),
+                "rewards": _rewards(rewards, where),
+            })
+            issuer_key = catalog_key(issuer)
+            for alias in [name] + [a for a in aliases.split('|') if a]:
+                alias_key = catalog_key(alias)
+                for key in {alias_key, catalog_key(f"{issuer} {alias}")} - {issuer_key, ''}:
+                    if keys.get(key, index) != index:
+                        raise ValueError(f"{where}: '{key}' already names {products[keys[key]]['id']}")
+                    keys[key] = index
+    ordered = sorted(keys.items())
+    postings = {}
+    for key_id, (key, _) in enumerate(ordered):
+        for gram in trigrams(key):
+            postings.setdefault(gram, []).append(key_id)
+    catalog = {
+        "version": 1,
+        "products": products,
+        "keys": [[key, index] for key, index in ordered],
+        "trigrams": postings,
+    }
+    with gzip.open(output_path, 'wt', encoding='utf-8') as f:
+        json.dump(catalog, f, separators=(',', ':'))
+    return catalog
+
+
+if __name__ == '__main__':
+    source = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SOURCE_PATH
+    output = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_CATALOG_PATH
+    catalog = build(source, output)
+    print(f"Wrote {len(catalog['products'])} products, {len(catalog['keys'])} names to {output}")
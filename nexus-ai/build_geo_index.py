@@ -0,0 +1,45 @@
+"""
+Builds the memory-mapped geo index loaded by geo_index.py.
+
+    python build_geo_index.py [source.tsv] [output.bin]
+
+Names are folded to ASCII keys, checked against the fixed record width and
+sorted by (name, rank, kind), so the first record of a name is the place
+most purchases mean.
+"""
+import os
+import sys
+
+from geo_index import (DATA_DIR, DEFAULT_GEO_INDEX_PATH, HEADER, KINDS, MAGIC, NAME_WIDTH, RECORD,
+                       place_key)
+
+DEFAULT_SOURCE_PATH = os.path.join(DATA_DIR, 'geo_places.tsv')
+
+
+def build(source_path: str, output_path: str) -> int:
+    records = set()
+    with open(source_path, encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            name, kind, country, rank = line.split('\t')
+            key = place_key(name)
+            if not key or len(key) > NAME_WIDTH:
+                raise ValueError(f"{source_path}:{line_no}: name must fold to 1-{NAME_WIDTH} characters")
+            if kind not in KINDS or len(country) != 2:
+                raise ValueError(f"{source_path}:{line_no}: bad kind or country code")
+            records.add((key, int(rank), KINDS.index(kind), country.upper()))
+    ordered = sorted(records)
+    with open(output_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(ordered)))
+        for key, rank, kind, country in ordered:
+            f.write(RECORD.pack(key.encode('ascii'), kind, rank, country.encode('ascii')))
+    return len(ordered)
+
+
+if __name__ == '__main__':
+    source = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SOURCE_PATH
+    output = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_GEO_INDEX_PATH
+    count = build(source, output)
+    print(f"Wrote {count} places to {output}")
@@ -0,0 +1,58 @@
+"""
+Builds the compact merchant index loaded by merchant_index.py.
+
+    python build_merchant_index.py [source.tsv] [output.json.gz]
+
+Patterns are normalized and de-duplicated, categories are stored once and
+referenced by code, and MCC ranges are checked for overlaps.
+"""
+import gzip
+import json
+import os
+import sys
+
+from merchant_index import DATA_DIR, DEFAULT_INDEX_PATH
+from merchant_normalize import normalize_text
+
+DEFAULT_SOURCE_PATH = os.path.join(DATA_DIR, 'merchant_patterns.tsv')
+
+
+def build(source_path: str, output_path: str) -> dict:
+    categories, patterns, mcc = {}, {}, []
+    with open(source_path, encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            key, category = line.split('\t')
+            code = categories.setdefault(category.strip(), len(categories))
+            if key.startswith('mcc:'):
+                low, high = (int(part) for part in key[4:].split('-'))
+                mcc.append([low, high, code])
+                continue
+            pattern = normalize_text(key)
+            if not pattern:
+                raise ValueError(f"{source_path}:{line_no}: pattern normalizes to nothing")
+            if pattern in patterns and patterns[pattern] != code:
+                raise ValueError(f"{source_path}:{line_no}: '{pattern}' already mapped to another category")
+            patterns[pattern] = code
+    mcc.sort()
+    for previous, current in zip(mcc, mcc[1:]):
+        if current[0] <= previous[1]:
+            raise ValueError(f"MCC ranges overlap: {previous[:2]} and {current[:2]}")
+    index = {
+        "version": 1,
+        "categories": list(categories),
+        "patterns": sorted([pattern, code] for pattern, code in patterns.items()),
+        "mcc": mcc,
+    }
+    with gzip.open(output_path, 'wt', encoding='utf-8') as f:
+        json.dump(index, f, separators=(',', ':'))
+    return index
+
+
+if __name__ == '__main__':
+    source = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SOURCE_PATH
+    output = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_INDEX_PATH
+    index = build(source, output)
+    print(f"Wrote {len(index['patterns'])} patterns, {len(index['mcc'])} MCC ranges to {output}")
@@ -0,0 +1,133 @@
+"""
+Bundled card product catalog.
+
+Backend cards often arrive with only a name ("Chase Sapphire Preferred®
+Card"). The catalog maps issuer and product names to the product's reward
+structure, point value, annual fee and foreign transaction fee, and
+`enrich_card` fills in whichever of those the card is missing before the
+portfolio is compiled.
+
+The catalog is loaded once per process from the prebuilt
+`data/card_catalog.json.gz` (generated from `data/card_products.tsv` by
+`build_card_catalog.py`) and never mutated; enriched cards get their own
+copies. Names are matched by an exact hash lookup on the normalized name,
+then by trigram similarity (Dice coefficient over an inverted index) for
+misspellings and marketing suffixes. Matches are memoized per name, so
+enriching a card is a dict lookup and a merge.
+"""
+import gzip
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from merchant_normalize import normalize_text
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+DEFAULT_CATALOG_PATH = os.path.join(DATA_DIR, 'card_catalog.json.gz')
+
+# Catalog fields copied onto a card when it has no value of its own.
+ENRICHED_FIELDS = ('rewards', 'point_value_cents', 'annual_fee', 'foreign_transaction_fee_percent')
+FUZZY_THRESHOLD = 0.6
+_FILLER_WORDS = re.compile(r'\b(?:card|credit|the|visa|mastercard|signature|infinite|world|elite|r|tm|sm|by|from)\b')
+_SPACES = re.compile(r'\s+')
+ISSUER_ALIASES = {
+    'amex': 'american express',
+    'bofa': 'bank of america',
+    'boa': 'bank of america',
+    'citibank': 'citi',
+    'capitalone': 'capital one',
+    'us bank': 'u s bank',
+    'usbank': 'u s bank',
+}
+_ISSUER_ALIAS = re.compile(r'^(?:' + '|'.join(sorted(map(re.escape, ISSUER_ALIASES), key=len, reverse=True)) + r')\b')
+
+
+def catalog_key(name: str) -> str:
+    """Normalized name without filler words ("Amex Gold Card®" -> "american express gold")."""
+    key = _FILLER_WORDS.sub(' ', normalize_text(name))
+    key = _SPACES.sub(' ', key).strip()
+    return _ISSUER_ALIAS.sub(lambda m: ISSUER_ALIASES[m.group(0)], key)
+
+
+def trigrams(key: str) -> set:
+    padded = f'  {key} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CardCatalog:
+    def __init__(self, products: List[Dict], keys: List[Tuple[str, int]], postings: Dict[str, List[int]]):
+        self.products = products
+        self._keys = keys
+        self._exact = {key: product for key, product in keys}
+        self._postings = postings
+        self._sizes = [len(trigrams(key)) for key, _ in keys]
+
+    def _fuzzy(self, key: str) -> Optional[int]:
+        grams = trigrams(key)
+        shared: Dict[int, int] = {}
+        for gram in grams:
+            for key_id in self._postings.get(gram, ()):
+                shared[key_id] = shared.get(key_id, 0) + 1
+        best, best_score = None, FUZZY_THRESHOLD
+        for key_id, count in shared.items():
+            score = 2.0 * count / (len(grams) + self._sizes[key_id])
+            if score >= best_score:
+                best, best_score = key_id, score
+        return None if best is None else self._keys[best][1]
+
+    def match_key(self, key: str) -> Optional[int]:
+        if not key:
+            return None
+        product = self._exact.get(key)
+        return self._fuzzy(key) if product is None else product
+
+    def match(self, name: str, issuer: Optional[str] = None) -> Optional[Dict]:
+        """The catalog product for a card name (and optional issuer), or None."""
+        return _match_cached(self, name or '', issuer or '')
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+
+@lru_cache(maxsize=int(os.getenv('CARD_CATALOG_MATCH_CACHE_SIZE', '16384')))
+def _match_cached(catalog: CardCatalog, name: str, issuer: str) -> Optional[Dict]:
+    key, issuer_key = catalog_key(name), catalog_key(issuer)
+    product = None
+    if issuer_key and not key.startswith(issuer_key):
+        product = catalog.match_key(f'{issuer_key} {key}'.strip())
+    if product is None:
+        product = catalog.match_key(key)
+    return None if product is None else catalog.products[product]
+
+
+def load_card_catalog(path: str = DEFAULT_CATALOG_PATH) -> CardCatalog:
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        data = json.load(f)
+    return CardCatalog(data['products'], [(key, product) for key, product in data['keys']], data['trigrams'])
+
+
+@lru_cache(maxsize=None)
+def get_card_catalog() -> CardCatalog:
+    """Process-wide catalog, loaded on first use (the app warms it at startup)."""
+    return load_card_catalog(os.getenv('CARD_CATALOG_PATH', DEFAULT_CATALOG_PATH))
+
+
+def enrich_card(card: Dict) -> Dict:
+    """A copy of `card` with missing reward fields taken from its catalog product."""
+    missing = [field for field in ENRICHED_FIELDS if card.get(field) is None]
+    if not missing:
+        return card
+    product = get_card_catalog().match(card.get('name'), card.get('issuer'))
+    if product is None:
+        return card
+    enriched = dict(card, catalog_product_id=product['id'])
+    for field in missing:
+        value = product.get(field)
+        enriched[field] = dict(value) if isinstance(value, dict) else value
+    return enriched
+
+
+def enrich_cards(user_cards: List[Dict]) -> List[Dict]:
+    return [enrich_card(card) for card in user_cards]
@@ -1,136 +1,142 @@
 
-from typing import List, Dict
+from typing import List, Dict, Optional
 import json
+import os
+import uuid
+
+import numpy as np
+
+from geo_index import is_foreign, resolve_country
+from merchant_index import get_merchant_index
+from lru import LRUCache
+from cardrank_engine import apply_reward_caps, compile_portfolio, category_indices, score_transactions, explain_card
+
+DETAIL_LEVELS = ("summary", "standard", "full")
+DEFAULT_TOP_K = 3
+
+# ranking_id -> what is needed to explain any card of that ranking later
+ranking_cache = LRUCache(maxsize=int(os.getenv("RANKING_CACHE_SIZE", "4096")))
 
 def enrich_merchant_category(transaction_context: Dict) -> str:
-    # Stub for merchant/category enrichment (future: Google Places API)
-    # For now, just return the provided category or guess from merchant name
-    merchant = transaction_context.get('merchantName', '').lower()
-    if 'airlines' in merchant or 'delta' in merchant:
-        return 'travel'
-    if 'grocery' in merchant or 'market' in merchant:
-        return 'groceries'
-    if 'amazon' in merchant:
-        return 'shopping'
+    # Local merchant/MCC index first (see merchant_index.py), then the
+    # caller-provided category. Future: Google Places API for misses.
+    category = get_merchant_index().classify(transaction_context.get('merchantName') or '', transaction_context.get('mcc'))
+    if category:
+        return category
     return transaction_context.get('category', 'General')
 
-def advanced_card_recommendation(gemini_model, user_cards: List[Dict], transaction_context: Dict, user_context: Dict) -> Dict:
+def _why_not_reason(scores, idx: int, best_idx: int, best_card: Dict) -> str:
+    return f"Not chosen because: scored {scores[idx]:.2f} vs {scores[best_idx]:.2f} for {best_card.get('name')}"
+
+def advanced_card_recommendation(gemini_model, user_cards: List[Dict], transaction_context: Dict, user_context: Dict,
+                                 reward_caps: Optional[Dict] = None, top_k: Optional[int] = None,
+                                 detail_level: str = "standard") -> Dict:
+    """
+    `detail_level`: "summary" returns only the top-k `ranking`; "standard"
+    also keeps the legacy `why_not` list; "full" adds factor strings to
+    every ranked card. Other cards can be explained later through
+    `explain_ranked_card(ranking_id, card_id)`.
+    """
+    if detail_level not in DETAIL_LEVELS:
+        raise ValueError(f"detail_level must be one of: {', '.join(DETAIL_LEVELS)}.")
     # Enrich category
     primary_category = enrich_merchant_category(transaction_context)
     merchant = transaction_context.get('merchantName', '')
     amount = transaction_context.get('amount', 0)
     location = transaction_context.get('location', '')
+    # Resolved from the bundled geo index, so FX fees and location bonuses apply without any API call
+    country = resolve_country(location)
+    home_country = user_context.get('home_country')
+    foreign = is_foreign(country, home_country)
     goal = user_context.get('primaryGoal', 'MINIMIZE_INTEREST_COST')
     season = transaction_context.get('season', None)  # For future: holiday/seasonal bonuses
 
-    scored_cards = []
-    why_not_cards = []
-    for card in user_cards:
-        score = 0
-        details = []
-        rewards_map = card.get('rewards', {})
-        # Multi-category and merchant bonus support
-        reward_multiplier = 1.0
-        if isinstance(rewards_map, dict):
-            if primary_category in rewards_map:
-                reward_multiplier = rewards_map[primary_category]
-                details.append(f"Category match: {primary_category} x{reward_multiplier}")
-            elif 'categories' in card and isinstance(card['categories'], list) and primary_category in card['categories']:
-                reward_multiplier = rewards_map.get('category_bonus', 1.0)
-                details.append(f"Category bonus: {primary_category} x{reward_multiplier}")
-            else:
-                reward_multiplier = rewards_map.get('default', 1.0)
-                details.append(f"Default reward x{reward_multiplier}")
-        point_value = card.get('point_value_cents', 1.0) / 100.0
-        reward_score = amount * reward_multiplier * point_value
-        details.append(f"Reward value: ${reward_score:.2f}")
-
-        # Multi-objective scoring
-        annual_fee = card.get('annual_fee', 0)
-        apr = card.get('apr', 0)
-        utilization = card.get('utilization', 0)
-        promo_apr_expiry = card.get('promo_apr_expiry_date')
-        bonus = card.get('signup_bonus_progress', {})
-
-        # Weighted scoring by goal
-        if goal == "MAXIMIZE_CASHBACK":
-            score += 10 * reward_score
-            details.append("Goal: Maximize cashback")
-        elif goal == "PAY_DOWN_DEBT":
-            score += reward_score - (apr * 0.3) - (utilization * 2.0)
-            details.append("Goal: Pay down debt (APR/utilization penalty)")
-        elif goal == "EARN_TRAVEL_POINTS":
-            travel_bonus = 2.0 if 'travel' in card.get('categories', []) or primary_category == 'travel' else 1.0
-            score += 8 * reward_score * travel_bonus
-            details.append("Goal: Earn travel points")
-        else:
-            score += reward_score - (apr * 0.1) - (utilization * 0.5)
-            details.append("Goal: Balanced")
-
-        # Penalty for annual fee (unless offset by rewards)
-        if annual_fee > 0:
-            score -= annual_fee * 0.5
-            details.append(f"Annual fee penalty: -${annual_fee * 0.5:.2f}")
-
-        # Bonus for 0% promo APR
-        if promo_apr_expiry:
-            score += 5
-            details.append("Promo APR bonus")
-
-        # Signup bonus logic
-        if bonus and bonus.get('spend_needed', 0) > 0 and amount >= bonus.get('spend_needed', float('inf')):
-            score += bonus.get('bonus_value', 0) * 100
-            details.append("Signup bonus achieved!")
-
-        # Penalty for high utilization
-        if utilization > 0.8:
-            score -= 5
-            details.append("High utilization penalty")
-
-        # Scenario simulation: what if this card is used?
-        projected_utilization = (card.get('balance', 0) + amount) / card.get('creditLimit', 1)
-        if projected_utilization > 0.9:
-            score -= 10
-            details.append("Projected utilization >90% penalty")
-
-        # Real-time offers/affiliate stub
-        if card.get('has_real_time_offer'):
-            score += 3
-            details.append("Real-time offer bonus")
-
-        scored_cards.append({"card": card, "score": score, "base_reward_value": reward_score, "details": details})
-
-    if not scored_cards:
+    if not user_cards:
         raise ValueError("No cards provided.")
-    best_scored_card = max(scored_cards, key=lambda x: x['score'])
-    best_card = best_scored_card['card']
-
-    # Why not explanations for other cards
-    for c in scored_cards:
-        if c['card']['id'] != best_card['id']:
-            why_not_cards.append({
-                "card": c['card'],
-                "score": c['score'],
-                "reason": f"Not chosen because: {', '.join(c['details'])}"
-            })
+    # Score every card in one vectorized pass (see cardrank_engine.py)
+    portfolio = compile_portfolio(user_cards)
+    if reward_caps:
+        # Live cap headroom from reward_caps.py
+        portfolio = apply_reward_caps(portfolio, reward_caps)
+    scored = score_transactions(portfolio, category_indices(portfolio, [primary_category]), [amount], goal,
+                                [country], home_country)
+    scores = scored['score'][0]
+    best_idx = int(scored['best'][0])
+    best_card = user_cards[best_idx]
+    best_reward_value = float(scored['reward'][0, best_idx])
+    # Factor strings are only built for the winner
+    best_details = explain_card(portfolio, best_idx, primary_category, amount, goal, country, home_country)
+
+    # Top-k ranking with margins behind the winner; per-card detail only on request
+    order = np.argsort(-scores, kind='stable')
+    order = order[order != best_idx]
+    top = [best_idx] + order[:max((top_k or DEFAULT_TOP_K) - 1, 0)].tolist()
+    ranking = []
+    for rank, idx in enumerate(top, 1):
+        entry = {"rank": rank, "card_id": user_cards[idx].get('id'), "card_name": user_cards[idx].get('name'),
+                 "score": round(float(scores[idx]), 4), "margin": round(float(scores[best_idx] - scores[idx]), 4)}
+        if detail_level == "full":
+            entry["details"] = best_details if idx == best_idx else explain_card(
+                portfolio, idx, primary_category, amount, goal, country, home_country)
+        ranking.append(entry)
+    ranking_id = uuid.uuid4().hex
+    ranking_cache.put(ranking_id, {"portfolio": portfolio, "category": primary_category, "amount": amount,
+                                   "goal": goal, "country": country, "home_country": home_country,
+                                   "scores": scores, "best": best_idx})
+
+    # Why not explanations for other cards (legacy shape)
+    why_not_cards = []
+    if detail_level != "summary":
+        for idx, card in enumerate(user_cards):
+            if idx != best_idx:
+                why_not_cards.append({
+                    "card": card,
+                    "score": float(scores[idx]),
+                    "reason": _why_not_reason(scores, idx, best_idx, best_card)
+                })
 
     # --- Enhanced AI-Powered Explanation ---
     from services import call_gemini
     prompt = f"""
     You are Nexus AI, a world-class financial assistant. Explain to the user why the recommended card is the best choice for this transaction, in a friendly, human, and transparent way.
     - User's goal: {goal}
-    - Transaction: {merchant} for ${amount:.2f} in {location} (category: {primary_category})
+    - Transaction: {merchant} for ${amount:.2f} in {location} (country: {country or 'unknown'}{', foreign' if foreign else ''}; category: {primary_category})
     - Card: {best_card.get('name')} (APR: {best_card.get('apr')}, Utilization: {best_card.get('utilization', 0):.2f}, Annual Fee: {best_card.get('annual_fee', 0)})
-    - Reward value: ${best_scored_card['base_reward_value']:.2f}
-    - Key factors: {', '.join(best_scored_card['details'])}
+    - Reward value: ${best_reward_value:.2f}
+    - Key factors: {', '.join(best_details)}
     In <thinking>, analyze the match between the user's goal, the card's rewards, and the transaction, referencing any trade-offs or bonuses.
     In <answer>, give a clear, friendly, one-sentence explanation for the user.
     """
     explanation = call_gemini(gemini_model, prompt)
 
-    return {
+    result = {
         "recommended_card": best_card,
         "reason": explanation,
-        "reward_value_usd": round(best_scored_card['base_reward_value'], 2),
-        "why_not": why_not_cards
+        "reward_value_usd": round(best_reward_value, 2),
+        "ranking": ranking,
+        "ranking_id": ranking_id,
+        "location": {"country": country, "foreign": foreign}
+    }
+    if detail_level != "summary":
+        result["why_not"] = why_not_cards
+    return result
+
+def explain_ranked_card(ranking_id: str, card_id: str) -> Dict:
+    """Lazily built breakdown for one card of an earlier ranking."""
+    ranking = ranking_cache.get(ranking_id)
+    if ranking is None:
+        raise KeyError("Unknown or expired ranking_id.")
+    portfolio = ranking["portfolio"]
+    ids = [str(i) for i in portfolio["ids"]]
+    if str(card_id) not in ids:
+        raise KeyError(f"Card '{card_id}' is not part of this ranking.")
+    idx, best_idx, scores = ids.index(str(card_id)), ranking["best"], ranking["scores"]
+    best_card = portfolio["cards"][best_idx]
+    return {
+        "card_id": card_id,
+        "score": round(float(scores[idx]), 4),
+        "margin": round(float(scores[best_idx] - scores[idx]), 4),
+        "details": explain_card(portfolio, idx, ranking["category"], ranking["amount"], ranking["goal"],
+                                ranking["country"], ranking["home_country"]),
+        "reason": None if idx == best_idx else _why_not_reason(scores, idx, best_idx, best_card)
     }
\ No newline at end of file
@@ -0,0 +1,306 @@
+"""
+Vectorized CardRank scoring.
+
+A portfolio is compiled once into NumPy arrays (a card x category multiplier
+matrix plus per-card point values, APR, utilization, fees, limits and flags).
+Any number of transactions is then scored against every card as a single
+matrix expression, with the goal weights applied as array arithmetic.
+Human-readable factor strings are only produced for the cards a caller asks
+about (normally just the winner).
+
+Purchases made abroad (country resolved locally by geo_index.py) pay each
+card's `foreign_transaction_fee_percent` out of the reward, and may earn a
+card's `location_rewards` multiplier instead (keyed by ISO country code,
+or "foreign" for any country other than home) when that is higher.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from geo_index import is_foreign
+
+RESERVED_REWARD_KEYS = ('default', 'category_bonus')
+
+# Multiplier provenance codes, used only to phrase explanations.
+NO_REWARD_MAP, DEFAULT_MATCH, CATEGORY_MATCH, CATEGORY_BONUS, CAP_REACHED = -1, 0, 1, 2, 3
+
+# goal -> (reward weight, APR weight, utilization weight, travel boost)
+GOAL_WEIGHTS = {
+    "MAXIMIZE_CASHBACK": (10.0, 0.0, 0.0, False),
+    "PAY_DOWN_DEBT": (1.0, 0.3, 2.0, False),
+    "EARN_TRAVEL_POINTS": (8.0, 0.0, 0.0, True),
+}
+BALANCED_WEIGHTS = (1.0, 0.1, 0.5, False)
+GOAL_LABELS = {
+    "MAXIMIZE_CASHBACK": "Goal: Maximize cashback",
+    "PAY_DOWN_DEBT": "Goal: Pay down debt (APR/utilization penalty)",
+    "EARN_TRAVEL_POINTS": "Goal: Earn travel points",
+}
+
+ANNUAL_FEE_WEIGHT = 0.5
+PROMO_APR_BONUS = 5.0
+HIGH_UTILIZATION = 0.8
+HIGH_UTILIZATION_PENALTY = 5.0
+PROJECTED_UTILIZATION_LIMIT = 0.9
+PROJECTED_UTILIZATION_PENALTY = 10.0
+REAL_TIME_OFFER_BONUS = 3.0
+TRAVEL_CATEGORY = 'travel'
+
+
+def _as_number(value, default: Optional[float] = None) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _card_categories(card: Dict) -> list:
+    categories = card.get('categories')
+    return categories if isinstance(categories, list) else []
+
+
+def _location_rewards(card: Dict) -> Dict[str, float]:
+    rewards = card.get('location_rewards')
+    if not isinstance(rewards, dict):
+        return {}
+    parsed = {str(key).upper(): _as_number(value) for key, value in rewards.items()}
+    return {key: value for key, value in parsed.items() if value is not None}
+
+
+def compile_portfolio(user_cards: List[Dict]) -> Dict:
+    """
+    Compiles cards into scoring arrays. Column `K` (one past the known
+    categories) holds each card's default multiplier, so transactions in a
+    category no card mentions still score correctly.
+    """
+    # Travel always gets its own column so the travel goal can spot it.
+    vocab = {TRAVEL_CATEGORY: 0}
+    for card in user_cards:
+        rewards_map = card.get('rewards')
+        if isinstance(rewards_map, dict):
+            for key in rewards_map:
+                if key not in RESERVED_REWARD_KEYS:
+                    vocab.setdefault(key, len(vocab))
+        for category in _card_categories(card):
+            vocab.setdefault(category, len(vocab))
+
+    n_cards, n_categories = len(user_cards), len(vocab)
+    multipliers = np.ones((n_cards, n_categories + 1), dtype=np.float64)
+    provenance = np.full((n_cards, n_categories + 1), NO_REWARD_MAP, dtype=np.int8)
+    for c, card in enumerate(user_cards):
+        rewards_map = card.get('rewards')
+        if not isinstance(rewards_map, dict):
+            continue
+        default = _as_number(rewards_map.get('default', 1.0), 1.0)
+        category_bonus = _as_number(rewards_map.get('category_bonus', 1.0), 1.0)
+        multipliers[c, :] = default
+        provenance[c, :] = DEFAULT_MATCH
+        for category in _card_categories(card):
+            multipliers[c, vocab[category]] = category_bonus
+            provenance[c, vocab[category]] = CATEGORY_BONUS
+        for key, value in rewards_map.items():
+            if key in RESERVED_REWARD_KEYS:
+                continue
+            multiplier = _as_number(value)
+            if multiplier is not None:
+                multipliers[c, vocab[key]] = multiplier
+                provenance[c, vocab[key]] = CATEGORY_MATCH
+
+    def column(key, default=0.0):
+        return np.array([_as_number(card.get(key), default) if card.get(key) is not None else default
+                         for card in user_cards], dtype=np.float64)
+
+    bonus = [card.get('signup_bonus_progress') or {} for card in user_cards]
+    return {
+        "cards": user_cards,
+        "ids": [card.get('id') for card in user_cards],
+        "category_index": vocab,
+        "multipliers": multipliers,
+        "provenance": provenance,
+        "point_value": column('point_value_cents', 1.0) / 100.0,
+        "annual_fee": column('annual_fee'),
+        "fx_fee": column('foreign_transaction_fee_percent') / 100.0,
+        "location_rewards": [_location_rewards(card) for card in user_cards],
+        "apr": column('apr'),
+        "utilization": column('utilization'),
+        "balance": column('balance'),
+        "credit_limit": column('creditLimit', 1.0),
+        "has_promo": np.array([bool(card.get('promo_apr_expiry_date')) for card in user_cards]),
+        "has_offer": np.array([bool(card.get('has_real_time_offer')) for card in user_cards]),
+        "travel_card": np.array([TRAVEL_CATEGORY in _card_categories(card) for card in user_cards]),
+        "bonus_spend_needed": np.array([_as_number(b.get('spend_needed'), 0.0) for b in bonus], dtype=np.float64),
+        "bonus_value": np.array([_as_number(b.get('bonus_value'), 0.0) for b in bonus], dtype=np.float64),
+    }
+
+
+def apply_reward_caps(portfolio: Dict, caps: Dict[int, Dict[str, Tuple[float, float]]]) -> Dict:
+    """
+    Applies live cap headroom (`{card_index: {category: (remaining dollars,
+    multiplier after the cap)}}`, see reward_caps.py). Exhausted caps simply
+    swap in the after-cap multiplier; partly used ones keep their multiplier
+    up to the remaining amount, which score_transactions blends per purchase.
+    """
+    multipliers = portfolio["multipliers"].copy()
+    provenance = portfolio["provenance"].copy()
+    remaining = np.full(multipliers.shape, np.inf)
+    after = multipliers.copy()
+    for card_idx, by_category in caps.items():
+        for category, (left, multiplier_after) in by_category.items():
+            col = portfolio["category_index"].get(category)
+            if col is None:
+                continue
+            if left <= 0:
+                multipliers[card_idx, col] = multiplier_after
+                provenance[card_idx, col] = CAP_REACHED
+            else:
+                remaining[card_idx, col] = left
+                after[card_idx, col] = multiplier_after
+    return dict(portfolio, multipliers=multipliers, provenance=provenance,
+                cap_remaining=remaining, multipliers_after=after)
+
+
+def category_indices(portfolio: Dict, categories: Sequence[str]) -> np.ndarray:
+    """Maps category names to multiplier columns (unknown -> default column)."""
+    index, fallback = portfolio["category_index"], len(portfolio["category_index"])
+    return np.fromiter((index.get(c, fallback) for c in categories), dtype=np.int64, count=len(categories))
+
+
+def static_scores(portfolio: Dict, goal: str) -> np.ndarray:
+    """Per-card score terms that do not depend on the transaction."""
+    _, apr_weight, util_weight, _ = GOAL_WEIGHTS.get(goal, BALANCED_WEIGHTS)
+    return (- apr_weight * portfolio["apr"]
+            - util_weight * portfolio["utilization"]
+            - ANNUAL_FEE_WEIGHT * portfolio["annual_fee"]
+            + PROMO_APR_BONUS * portfolio["has_promo"]
+            - HIGH_UTILIZATION_PENALTY * (portfolio["utilization"] > HIGH_UTILIZATION)
+            + REAL_TIME_OFFER_BONUS * portfolio["has_offer"])
+
+
+def reward_slopes(portfolio: Dict, goal: str) -> np.ndarray:
+    """
+    Card x column matrix of d(score)/d(amount): below the signup-bonus and
+    projected-utilization thresholds a card's score is
+    `amount * slope + static_scores(...)`.
+    """
+    reward_weight, _, _, travel_boost = GOAL_WEIGHTS.get(goal, BALANCED_WEIGHTS)
+    slopes = reward_weight * portfolio["multipliers"] * portfolio["point_value"][:, None]
+    if travel_boost:
+        travel_col = portfolio["category_index"][TRAVEL_CATEGORY]
+        boost = np.where(portfolio["travel_card"], 2.0, 1.0)
+        slopes = slopes * boost[:, None]
+        slopes[:, travel_col] = reward_weight * portfolio["multipliers"][:, travel_col] * portfolio["point_value"] * 2.0
+    return slopes
+
+
+def projected_over_limit(portfolio: Dict, card_idx: int, amount: float) -> bool:
+    """Whether `amount` would push one card past the projected-utilization limit."""
+    limit = portfolio["credit_limit"][card_idx]
+    return bool(limit == 0 or (portfolio["balance"][card_idx] + amount) / limit > PROJECTED_UTILIZATION_LIMIT)
+
+
+def location_terms(portfolio: Dict, countries: Sequence[Optional[str]],
+                   home_country: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per transaction: whether it is foreign (N) and each card's location
+    multiplier for it (N x C, NaN where the card has none).
+    """
+    by_country = {}
+    for country in set(countries):
+        foreign = is_foreign(country, home_country)
+        by_country[country] = (foreign, [rewards.get(country, rewards.get('FOREIGN') if foreign else None)
+                                         for rewards in portfolio["location_rewards"]])
+    foreign = np.array([by_country[country][0] for country in countries], dtype=bool)
+    bonus = np.array([by_country[country][1] for country in countries], dtype=np.float64)
+    return foreign, bonus.reshape(len(countries), len(portfolio["ids"]))
+
+
+def score_transactions(portfolio: Dict, category_idx: np.ndarray, amounts: np.ndarray, goal: str,
+                       countries: Optional[Sequence[Optional[str]]] = None,
+                       home_country: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Scores N transactions against C cards. Returns `score` and `reward`
+    (N x C, net of foreign transaction fees) plus the `best` card index per
+    transaction. `countries` holds each purchase's ISO country code (None
+    when unknown, which counts as domestic).
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    category_idx = np.asarray(category_idx, dtype=np.int64)
+    base = portfolio["multipliers"].T[category_idx]
+    multiplier, fee = base, 0.0
+    if countries is not None:
+        foreign, bonus = location_terms(portfolio, countries, home_country)
+        multiplier = np.fmax(base, bonus)
+        fee = amounts[:, None] * portfolio["fx_fee"][None, :] * foreign[:, None]
+    reward = amounts[:, None] * multiplier * portfolio["point_value"][None, :]
+    if "cap_remaining" in portfolio:
+        # The part of a purchase beyond a cap's remaining room earns the after-cap rate.
+        over = np.maximum(amounts[:, None] - portfolio["cap_remaining"].T[category_idx], 0)
+        drop = np.where(multiplier > base, 0.0, base - portfolio["multipliers_after"].T[category_idx])
+        reward = reward - over * drop * portfolio["point_value"][None, :]
+    reward = reward - fee
+
+    reward_weight, _, _, travel_boost = GOAL_WEIGHTS.get(goal, BALANCED_WEIGHTS)
+    weighted_reward = reward_weight * reward
+    if travel_boost:
+        travel_txn = category_idx == portfolio["category_index"][TRAVEL_CATEGORY]
+        boost = np.where(portfolio["travel_card"][None, :] | travel_txn[:, None], 2.0, 1.0)
+        weighted_reward = weighted_reward * boost
+    static = static_scores(portfolio, goal)
+
+    needed = portfolio["bonus_spend_needed"]
+    bonus_hit = (needed[None, :] > 0) & (amounts[:, None] >= needed[None, :])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        projected = (portfolio["balance"][None, :] + amounts[:, None]) / portfolio["credit_limit"][None, :]
+    projected = np.where(portfolio["credit_limit"][None, :] == 0, np.inf, projected)
+
+    score = (weighted_reward + static[None, :]
+             + bonus_hit * portfolio["bonus_value"][None, :] * 100
+             - PROJECTED_UTILIZATION_PENALTY * (projected > PROJECTED_UTILIZATION_LIMIT))
+    return {"score": score, "reward": reward, "best": score.argmax(axis=1)}
+
+
+def explain_card(portfolio: Dict, card_idx: int, category: str, amount: float, goal: str,
+                 country: Optional[str] = None, home_country: Optional[str] = None) -> List[str]:
+    """The factor strings behind one card's score for one transaction."""
+    col = int(category_indices(portfolio, [category])[0])
+    multiplier = portfolio["multipliers"][card_idx, col]
+    provenance = portfolio["provenance"][card_idx, col]
+    foreign = is_foreign(country, home_country)
+    rewards = portfolio["location_rewards"][card_idx]
+    location_multiplier = rewards.get(country, rewards.get('FOREIGN') if foreign else None)
+    details = []
+    if provenance == CATEGORY_MATCH:
+        details.append(f"Category match: {category} x{multiplier}")
+    elif provenance == CATEGORY_BONUS:
+        details.append(f"Category bonus: {category} x{multiplier}")
+    elif provenance == DEFAULT_MATCH:
+        details.append(f"Default reward x{multiplier}")
+    elif provenance == CAP_REACHED:
+        details.append(f"Reward cap reached: {category} x{multiplier}")
+    if location_multiplier is not None and location_multiplier > multiplier:
+        details.append(f"Location bonus: {country} x{location_multiplier}")
+    elif "cap_remaining" in portfolio:
+        left = portfolio["cap_remaining"][card_idx, col]
+        if amount > left:
+            details.append(f"Reward cap: ${left:.2f} left at x{multiplier}")
+    reward = float(score_transactions(portfolio, [col], [amount], goal, [country], home_country)["reward"][0, card_idx])
+    fx_fee = portfolio["fx_fee"][card_idx]
+    if foreign and fx_fee > 0:
+        details.append(f"Foreign transaction fee: -${amount * fx_fee:.2f} ({fx_fee * 100:g}%)")
+    details.append(f"Reward value: ${reward:.2f}")
+    details.append(GOAL_LABELS.get(goal, "Goal: Balanced"))
+    annual_fee = portfolio["annual_fee"][card_idx]
+    if annual_fee > 0:
+        details.append(f"Annual fee penalty: -${annual_fee * ANNUAL_FEE_WEIGHT:.2f}")
+    if portfolio["has_promo"][card_idx]:
+        details.append("Promo APR bonus")
+    needed = portfolio["bonus_spend_needed"][card_idx]
+    if needed > 0 and amount >= needed:
+        details.append("Signup bonus achieved!")
+    if portfolio["utilization"][card_idx] > HIGH_UTILIZATION:
+        details.append("High utilization penalty")
+    if projected_over_limit(portfolio, card_idx, amount):
+        details.append("Projected utilization >90% penalty")
+    if portfolio["has_offer"][card_idx]:
+        details.append("Real-time offer bonus")
+    return details
@@ -0,0 +1,165 @@
+"""
+Bulk transaction categorization.
+
+Transactions arrive as a stream (NDJSON lines or a parsed JSON list). Each
+merchant is normalized and classified against the local merchant index;
+those it cannot place are held back, keyed by normalized merchant, and sent
+to the LLM in deduplicated batches, so a backfill of thousands of rows costs
+one model call per batch of distinct unknown merchants rather than one per
+transaction. Results are yielded as soon as they are known, tagged with the
+input position so clients can reassemble the original order.
+"""
+import json
+import os
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, Iterable, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+
+from lru import LRUCache
+from merchant_index import get_merchant_index
+from merchant_normalize import normalize_merchant
+
+DEFAULT_CATEGORY = 'General'
+AI_BATCH_SIZE = int(os.getenv("CATEGORIZE_AI_BATCH_SIZE", "50"))
+
+# normalized merchant -> category, as answered by the LLM
+ai_category_cache = LRUCache(maxsize=int(os.getenv("CATEGORIZE_AI_CACHE_SIZE", "10000")))
+
+
+def merchant_of(txn: Dict) -> str:
+    return txn.get('merchantName') or txn.get('merchant_name') or txn.get('merchant') or txn.get('name') or ''
+
+
+async def iter_ndjson(chunks: AsyncIterable[bytes]) -> AsyncIterator[Dict]:
+    """Parses an NDJSON byte stream line by line without buffering the body."""
+    buffer = b''
+    line_no = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield _parse_line(line, line_no)
+    if buffer.strip():
+        yield _parse_line(buffer, line_no + 1)
+
+
+def _parse_line(line: bytes, line_no: int) -> Dict:
+    try:
+        value = json.loads(line)
+    except ValueError:
+        return {"_error": f"Invalid JSON on line {line_no}"}
+    return value if isinstance(value, dict) else {"_error": f"Line {line_no} is not a JSON object"}
+
+
+class RequestStreamingResponse(StreamingResponse):
+    """
+    A StreamingResponse whose body iterator is itself reading the request.
+
+    Below ASGI 2.4 Starlette listens for `http.disconnect` in parallel with
+    streaming, and that listener would swallow the request body messages the
+    iterator is waiting on. Here the iterator is the only reader; a client
+    disconnect still surfaces through `request.stream()` as ClientDisconnect.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_list(items: Iterable[Dict]) -> AsyncIterator[Dict]:
+    for item in items:
+        yield item if isinstance(item, dict) else {"_error": "Transaction is not a JSON object"}
+
+
+def parse_ai_categories(raw: str, allowed: Iterable[str]) -> Dict[str, str]:
+    """Reads `{"categories": {merchant: category}}`, dropping unknown labels."""
+    try:
+        data = json.loads(raw.replace('```json', '').replace('```', '').strip())
+    except (ValueError, AttributeError):
+        return {}
+    mapping = data.get('categories') if isinstance(data, dict) else None
+    if not isinstance(mapping, dict):
+        return {}
+    allowed = set(allowed)
+    return {str(m): c for m, c in mapping.items() if c in allowed}
+
+
+async def categorize_stream(transactions: AsyncIterable[Dict],
+                            ask_ai: Optional[Callable[[List[str], List[str]], str]] = None,
+                            batch_size: int = AI_BATCH_SIZE) -> AsyncIterator[Dict]:
+    """
+    Yields one result per transaction: `index`, `id`, `merchant`,
+    `normalized_merchant`, `category` and its `source` ("index", "ai",
+    "plaid" or "default"). `ask_ai(merchants, categories)` returns the raw
+    LLM JSON; without it unresolved merchants fall back immediately.
+    """
+    index = get_merchant_index()
+    allowed = list(index.categories) + [DEFAULT_CATEGORY]
+    pending: Dict[str, List[Dict]] = {}
+
+    async def flush():
+        merchants = list(pending)
+        answers = {}
+        if ask_ai is not None and merchants:
+            raw = await run_in_threadpool(ask_ai, merchants, allowed)
+            answers = parse_ai_categories(raw, allowed)
+        for merchant in merchants:
+            category = answers.get(merchant)
+            if category is not None:
+                ai_category_cache.put(merchant, category)
+            for result in pending.pop(merchant):
+                yield _resolve_fallback(result, category)
+
+    position = 0
+    async for txn in transactions:
+        i, position = position, position + 1
+        if '_error' in txn:
+            yield {"index": i, "error": txn['_error']}
+            continue
+        merchant = merchant_of(txn)
+        normalized = normalize_merchant(merchant)
+        result = {"index": i, "id": txn.get('id') or txn.get('transaction_id'), "merchant": merchant,
+                  "normalized_merchant": normalized, "category": None, "source": None,
+                  "_plaid": txn.get('category')}
+        category = index.classify(merchant, txn.get('mcc'))
+        if category is not None:
+            yield _finish(result, category, "index")
+            continue
+        category = ai_category_cache.get(normalized) if normalized else None
+        if category is not None:
+            yield _finish(result, category, "ai")
+            continue
+        if not normalized or ask_ai is None:
+            yield _resolve_fallback(result, None)
+            continue
+        pending.setdefault(normalized, []).append(result)
+        if len(pending) >= batch_size:
+            async for out in flush():
+                yield out
+    async for out in flush():
+        yield out
+
+
+def _finish(result: Dict, category: str, source: str) -> Dict:
+    result.pop('_plaid', None)
+    result['category'], result['source'] = category, source
+    return result
+
+
+def _resolve_fallback(result: Dict, ai_category: Optional[str]) -> Dict:
+    if ai_category is not None:
+        return _finish(result, ai_category, "ai")
+    plaid = result.get('_plaid')
+    if isinstance(plaid, list):
+        plaid = plaid[0] if plaid else None
+    if plaid:
+        return _finish(result, str(plaid), "plaid")
+    return _finish(result, DEFAULT_CATEGORY, "default")
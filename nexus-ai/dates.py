@@ -0,0 +1,29 @@
+"""Lenient date parsing for request payloads (transaction dates, deadlines, promo expiries)."""
+from datetime import date, datetime
+from typing import Optional
+
+DATE_FORMATS = ('%m/%d/%Y', '%m/%d/%y', '%Y/%m/%d')
+
+
+def parse_date(value) -> Optional[date]:
+    """
+    Reads a free-form date ("2027-09-01", "2027-09-01T00:00:00Z",
+    "09/01/2027"). Returns None for anything unparseable.
+    """
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not value:
+        return None
+    text = str(value).strip()
+    try:
+        return date.fromisoformat(text[:10])
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
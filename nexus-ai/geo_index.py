@@ -0,0 +1,196 @@
+"""
+Local place-name to country index.
+
+`build_geo_index.py` compiles `data/geo_places.tsv` into `data/geo_index.bin`:
+a 16-byte header followed by fixed-width 32-byte records sorted by name.
+The file is memory-mapped read-only, so worker processes share the same
+pages and nothing is parsed at load time; exact and prefix lookups are a
+bisect over the mapped records.
+
+`resolve_country` accepts what Plaid and the clients send, either a
+location dict (`{"city", "region", "country"}`) or free text such as
+"Paris, France", "Austin, TX" or "TORONTO ON", and returns an ISO 3166-1
+alpha-2 code, or None when nothing matches.
+"""
+import bisect
+import mmap
+import os
+import struct
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Union
+
+from merchant_normalize import normalize_text
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+DEFAULT_GEO_INDEX_PATH = os.path.join(DATA_DIR, 'geo_index.bin')
+
+MAGIC = b'NXGEO1\0\0'
+HEADER = struct.Struct('<8sI4x')
+RECORD = struct.Struct('<28sBB2s')  # name, kind, rank, country
+NAME_WIDTH = 28
+KINDS = ('country', 'region', 'city')
+COUNTRY, REGION, CITY = 0, 1, 2
+MIN_PREFIX = 4
+MAX_SUFFIX_WORDS = 4
+HOME_COUNTRY = os.getenv('DEFAULT_HOME_COUNTRY', 'US')
+
+
+class Place(NamedTuple):
+    name: str
+    kind: int
+    rank: int
+    country: str
+
+
+def place_key(text: str) -> str:
+    """Accents folded to ASCII, then lowercase words ("Zürich" -> "zurich")."""
+    folded = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii')
+    return normalize_text(folded)
+
+
+class _Names:
+    """Sequence view of the record names, for bisect."""
+
+    def __init__(self, index: 'GeoIndex'):
+        self._index = index
+
+    def __len__(self) -> int:
+        return self._index.count
+
+    def __getitem__(self, i: int) -> bytes:
+        offset = HEADER.size + i * RECORD.size
+        return self._index.data[offset:offset + NAME_WIDTH].rstrip(b'\0')
+
+
+class GeoIndex:
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or len(self.data) != HEADER.size + self.count * RECORD.size:
+            raise ValueError(f"{path} is not a geo index; rebuild it with build_geo_index.py")
+        self._names = _Names(self)
+
+    def _place(self, i: int) -> Place:
+        name, kind, rank, country = RECORD.unpack_from(self.data, HEADER.size + i * RECORD.size)
+        return Place(name.rstrip(b'\0').decode('ascii'), kind, rank, country.decode('ascii'))
+
+    def lookup(self, key: str) -> List[Place]:
+        """Places named exactly `key` (already a place_key), best ranked first."""
+        encoded = key.encode('ascii')
+        lo = bisect.bisect_left(self._names, encoded)
+        hi = bisect.bisect_right(self._names, encoded, lo)
+        return [self._place(i) for i in range(lo, hi)]
+
+    def prefix(self, key: str, limit: int = 10) -> List[Place]:
+        """Places whose name starts with `key`, in name order."""
+        encoded = key.encode('ascii')
+        lo = bisect.bisect_left(self._names, encoded)
+        places = []
+        for i in range(lo, min(lo + limit, self.count)):
+            place = self._place(i)
+            if not place.name.startswith(key):
+                break
+            places.append(place)
+        return places
+
+    def _cities(self, key: str) -> List[Place]:
+        cities = [p for p in self.lookup(key) if p.kind == CITY]
+        if not cities and len(key) >= MIN_PREFIX:
+            # Plaid truncates long city names ("SAN FRANCISC"); trust a prefix only if it is unambiguous.
+            candidates = [p for p in self.prefix(key) if p.kind == CITY]
+            if len({p.country for p in candidates}) == 1:
+                cities = candidates[:1]
+        return sorted(cities, key=lambda p: p.rank)
+
+    def resolve_text(self, text: str) -> Optional[str]:
+        key = place_key(text)
+        if not key:
+            return None
+        whole = self.lookup(key)
+        if whole:
+            return min(whole, key=lambda p: (p.rank, p.kind)).country
+        words = key.split()
+        # A trailing country or region ("..., France", "... TX"), longest first.
+        for n in range(min(MAX_SUFFIX_WORDS, len(words) - 1), 0, -1):
+            suffix = [p for p in self.lookup(' '.join(words[-n:])) if p.kind != CITY]
+            if not suffix:
+                continue
+            cities = self._cities(' '.join(words[:-n]))
+            suffix_countries = {p.country for p in suffix}
+            for city in cities:
+                if city.country in suffix_countries:  # "Berlin DE" is Germany, not Delaware
+                    return city.country
+            # Otherwise a US state code beats a country code, as in Plaid's "City, ST".
+            for kind, country in ((REGION, HOME_COUNTRY), (COUNTRY, None), (REGION, None)):
+                for place in suffix:
+                    if place.kind == kind and (country is None or place.country == country):
+                        return place.country
+        # No country or region named: the longest leading run of words that is a city.
+        head = (place_key(text.split(',')[0]) if ',' in text else key).split()
+        for n in range(len(head), 0, -1):
+            cities = self._cities(' '.join(head[:n]))
+            if cities:
+                return cities[0].country
+        return None
+
+    def resolve(self, location: Union[str, Dict, None]) -> Optional[str]:
+        if isinstance(location, dict):
+            country = location.get('country') or location.get('country_code')
+            if country:
+                places = [p for p in self.lookup(place_key(str(country))) if p.kind == COUNTRY]
+                if places:
+                    return places[0].country
+            return self._resolve_fields(location.get('city'), location.get('region') or location.get('state'))
+        if not isinstance(location, str):
+            return None
+        return self.resolve_text(location)
+
+    def _resolve_fields(self, city, region) -> Optional[str]:
+        """
+        A location dict without a country. `region` only ever names a
+        subdivision: Plaid's {"region": "CA"} is California, not Canada.
+        """
+        regions = [p for p in self.lookup(place_key(str(region))) if p.kind == REGION] if region else []
+        if city:
+            cities = self._cities(place_key(str(city)))
+            for place in cities:
+                if place.country in {p.country for p in regions}:  # "London", "ON" is Canada
+                    return place.country
+            if not regions:
+                return cities[0].country if cities else self.resolve_text(str(city))
+        # A home-country subdivision first, as in resolve_text.
+        if not regions:
+            return None
+        return min(regions, key=lambda p: (p.country != HOME_COUNTRY, p.rank)).country
+
+    def __len__(self) -> int:
+        return self.count
+
+
+def load_geo_index(path: str = DEFAULT_GEO_INDEX_PATH) -> GeoIndex:
+    return GeoIndex(path)
+
+
+@lru_cache(maxsize=None)
+def get_geo_index() -> GeoIndex:
+    """Process-wide index, mapped on first use (the app warms it at startup)."""
+    return load_geo_index(os.getenv('GEO_INDEX_PATH', DEFAULT_GEO_INDEX_PATH))
+
+
+@lru_cache(maxsize=int(os.getenv('GEO_RESOLVE_CACHE_SIZE', '16384')))
+def _resolve_cached(text: str) -> Optional[str]:
+    return get_geo_index().resolve_text(text)
+
+
+def resolve_country(location: Union[str, Dict, None]) -> Optional[str]:
+    """ISO country code for a location string or dict, or None if unknown."""
+    if isinstance(location, str):
+        return _resolve_cached(location)
+    return get_geo_index().resolve(location)
+
+
+def is_foreign(country: Optional[str], home_country: Optional[str] = None) -> bool:
+    """Unknown locations are treated as domestic, so no fee is ever guessed."""
+    return country is not None and country != (home_country or HOME_COUNTRY).upper()
@@ -0,0 +1,184 @@
+"""
+Income and paycheck cadence detection.
+
+Deposits are the negative-amount rows (money in) of at least
+MIN_PAYCHECK_CENTS, grouped by normalized payer; same-day deposits from one
+payer are merged. All payers' deposit days are sorted at once (one
+np.unique over payer/day keys) and each payer's intervals are clustered
+against the pay cadences:
+
+- weekly / biweekly: the median interval is 7 / 14 days, most intervals are
+  within a day of it, and most deposits land on the same weekday;
+- semimonthly: intervals of about half a month (the 1st and 15th, or the
+  15th and the last day);
+- monthly: intervals of about a month.
+
+Semimonthly and monthly paydays are anchored on the usual day of the month
+in each half of the cycle (recurring.month_anchor) and move to the
+preceding Friday when they fall on a weekend. Weekly and biweekly paydays
+repeat the last deposit's weekday. Confidence is the share of
+intervals that fit the cadence, discounted for short histories.
+
+Results for stored users are memoized per user and refreshed incrementally
+(recurring.SeriesCache): new rows only re-detect the payers they touch.
+"""
+import os
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from anomalies import group_median
+from ingest import deposit_amount, purchase_amount
+from money import from_cents
+from recurring import SeriesCache, month_anchor, public
+from spending import purchase_columns
+from utilization_timing import next_day_of_month
+
+# (cadence, period in days, tolerance in days, same weekday required);
+# checked in order, so half-month intervals on a fixed weekday are biweekly.
+PAY_CADENCES = (('weekly', 7.0, 1.0, True), ('biweekly', 14.0, 1.0, True),
+                ('semimonthly', 15.22, 3.0, False), ('monthly', 30.44, 4.0, False))
+MIN_PAYCHECK_CENTS = 10000
+MIN_DEPOSITS = 3
+MIN_REGULARITY = 0.75
+# A stream is still active until it is this many periods past its last deposit.
+ACTIVE_PERIODS = 1.5
+DEFAULT_HORIZON_DAYS = 30
+
+
+def _business_day(day: date) -> date:
+    """Weekend paydays move to the Friday before."""
+    return day - timedelta(days=max(day.weekday() - 4, 0))
+
+
+def detect_income(columns: Dict[str, np.ndarray], merchant_names: List[str], category_names: List[str],
+                  merchants: Optional[np.ndarray] = None) -> Dict[int, List[Dict]]:
+    """Pay streams per payer code from the deposits in `columns` (only those of `merchants`, if given)."""
+    keep = columns["cents"] <= -MIN_PAYCHECK_CENTS
+    if merchants is not None:
+        keep &= np.isin(columns["merchant"], merchants)
+    rows = np.flatnonzero(keep)
+    result: Dict[int, List[Dict]] = {int(m): [] for m in (merchants if merchants is not None else ())}
+    if not len(rows):
+        return result
+    payer, day = columns["merchant"][rows].astype(np.int64), columns["day"][rows].astype(np.int64)
+    n_payers = int(payer.max()) + 1
+
+    # One deposit per payer and day, in date order.
+    keys, inverse = np.unique(payer * (int(day.max()) + 1) + day, return_inverse=True)
+    amount = np.bincount(inverse, weights=-columns["cents"][rows], minlength=len(keys))
+    payer_sorted, day_sorted = keys // (int(day.max()) + 1), keys % (int(day.max()) + 1)
+    deposits = np.bincount(payer_sorted, minlength=n_payers)
+    follows = payer_sorted[1:] == payer_sorted[:-1]
+    gaps = (day_sorted[1:] - day_sorted[:-1])[follows].astype(np.float64)
+    gap_payer = payer_sorted[1:][follows]
+    intervals = np.bincount(gap_payer, minlength=n_payers)
+    median_gap, _ = group_median(gap_payer, gaps, n_payers)
+    # Share of each payer's deposits on its most common weekday (ordinal 1 is a Monday).
+    weekdays = np.bincount(payer_sorted * 7 + (day_sorted - 1) % 7, minlength=n_payers * 7).reshape(n_payers, 7)
+    same_weekday = np.divide(weekdays.max(axis=1), deposits, out=np.zeros(n_payers), where=deposits > 0)
+    median_amount, _ = group_median(payer_sorted, amount, n_payers)
+
+    cadence = np.full(n_payers, -1)
+    regularity = np.zeros(n_payers)
+    for k, (_, period, tolerance, weekly) in enumerate(PAY_CADENCES):
+        regular = np.bincount(gap_payer, weights=np.abs(gaps - period) <= tolerance, minlength=n_payers)
+        share = np.divide(regular, intervals, out=np.zeros(n_payers), where=intervals > 0)
+        match = ((cadence < 0) & (deposits >= MIN_DEPOSITS) & (np.abs(median_gap - period) <= tolerance)
+                 & (share >= MIN_REGULARITY) & ((same_weekday >= MIN_REGULARITY) | (not weekly)))
+        cadence[match] = k
+        regularity[match] = share[match]
+
+    starts = np.cumsum(deposits) - deposits
+    for p in np.flatnonzero(cadence >= 0):
+        name, period, _, _ = PAY_CADENCES[cadence[p]]
+        stream_days = [date.fromordinal(int(d)) for d in day_sorted[starts[p]:starts[p] + deposits[p]]]
+        # Day-of-month anchors for each half of the cycle, counted back from the last deposit.
+        anchors = []
+        if name in ('semimonthly', 'monthly'):
+            phases = 2 if name == 'semimonthly' else 1
+            anchors = [month_anchor([d.day for d in stream_days[len(stream_days) - 1 - i::-phases]]) for i in range(phases)]
+        result.setdefault(int(p), []).append({
+            "payer": merchant_names[p],
+            "cadence": name,
+            "interval_days": round(float(median_gap[p]), 1),
+            "amount": round(from_cents(int(round(median_amount[p]))), 2),
+            "last_amount": from_cents(int(amount[starts[p] + deposits[p] - 1])),
+            "deposits": int(deposits[p]),
+            "last_date": stream_days[-1].isoformat(),
+            "confidence": round(float(regularity[p] * min(1.0, intervals[p] / 4)), 2),
+            "_period": period,
+            "_anchors": anchors,
+        })
+    return result
+
+
+def _nominal(stream: Dict, day: date) -> date:
+    """The scheduled payday behind a deposit that may have been moved to the Friday before."""
+    if not stream["_anchors"]:
+        return day
+    return min(next_day_of_month(day, anchor) for anchor in stream["_anchors"])
+
+
+def following_payday(stream: Dict, nominal: date) -> date:
+    """The scheduled payday after `nominal` (before weekend adjustment)."""
+    if not stream["_anchors"]:
+        return nominal + timedelta(days=int(stream["_period"]))
+    return min(next_day_of_month(nominal + timedelta(days=1), anchor) for anchor in stream["_anchors"])
+
+
+def active_streams(streams_by_payer: Dict[int, List[Dict]], as_of: Optional[int]) -> List[Dict]:
+    """Streams still paying on day ordinal `as_of`, with the next expected payday."""
+    active = []
+    for streams in streams_by_payer.values():
+        for stream in streams:
+            last = date.fromisoformat(stream["last_date"])
+            if as_of is not None and as_of - last.toordinal() > stream["_period"] * ACTIVE_PERIODS:
+                continue
+            nominal = following_payday(stream, _nominal(stream, last))
+            active.append(dict(stream, next_date=_business_day(nominal).isoformat()))
+    active.sort(key=lambda stream: (-stream["amount"], stream["payer"]))
+    return active
+
+
+def expected_paydays(streams: List[Dict], start: date, days: int = DEFAULT_HORIZON_DAYS) -> List[Dict]:
+    """Expected deposits of active streams in [start, start + days], in date order."""
+    end = start + timedelta(days=days)
+    paydays = []
+    for stream in streams:
+        nominal = _nominal(stream, date.fromisoformat(stream["last_date"]))
+        while True:
+            nominal = following_payday(stream, nominal)
+            payday = _business_day(nominal)
+            if payday > end:
+                break
+            if payday >= start:
+                paydays.append({"date": payday.isoformat(), "amount": stream["amount"], "payer": stream["payer"],
+                                "cadence": stream["cadence"], "confidence": stream["confidence"]})
+    paydays.sort(key=lambda payday: (payday["date"], payday["payer"]))
+    return paydays
+
+
+def latest_day(columns: Dict[str, np.ndarray]) -> Optional[int]:
+    return int(columns["day"].max()) if len(columns["day"]) else None
+
+
+def _any_amount(txn: Dict) -> Optional[float]:
+    # Purchases are kept too: they date the end of the history for `active_streams`.
+    return deposit_amount(txn) or purchase_amount(txn)
+
+
+def income_streams(transactions: List[Dict]) -> List[Dict]:
+    buffer, _ = purchase_columns(transactions, _any_amount)
+    columns = buffer.columns()
+    streams = detect_income(columns, list(buffer.merchant_codes), list(buffer.category_codes))
+    return active_streams(streams, latest_day(columns))
+
+
+income_cache = SeriesCache(detect_income, maxsize=int(os.getenv("INCOME_CACHE_SIZE", "5000")))
+
+
+def user_income(user_id: str, history) -> List[Dict]:
+    """A stored user's active pay streams; only payers with new rows are re-detected."""
+    return active_streams(income_cache.series(user_id, history), latest_day(history.columns()))
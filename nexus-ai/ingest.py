@@ -0,0 +1,219 @@
+"""
+Incremental ingestion of large transaction payloads.
+
+`iter_json_records` parses a JSON request body as its bytes arrive and
+yields the elements of the selected top-level arrays one at a time
+(`{"transactions": [...], "previous_transactions": [...]}` or a bare
+`[...]`), so only the record being decoded is ever buffered; other
+top-level values are collected into a small dict. NDJSON bodies go through
+categorize.iter_ndjson.
+
+Records are then packed into `TransactionColumns`: preallocated NumPy
+columns (int64 cents, int32 category/merchant codes, int32 day ordinals)
+with strings interned once, about 20 bytes per row instead of a Python
+dict. Callers that only need aggregates flush a column batch into running
+totals and clear it, which bounds memory by the batch size.
+"""
+import codecs
+import json
+import math
+from datetime import date
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from money import cents_of
+
+MAX_RECORD_BYTES = 64 * 1024
+MAX_VALUE_BYTES = 1024 * 1024
+READ_CHUNK = 64 * 1024
+NO_DAY = -1
+_WHITESPACE = ' \t\r\n'
+
+
+class IngestError(ValueError):
+    """The body is not well-formed JSON, or a record is too large."""
+
+
+class _Scanner:
+    """Incremental JSON body scanner; see `iter_json_records`."""
+
+    def __init__(self, fields: Tuple[str, ...]):
+        self.fields = fields
+        self.values: Dict = {}
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._state = 'start'
+        self._key: Optional[str] = None
+        self._array_key: Optional[str] = None
+
+    def _skip(self, chars: str = _WHITESPACE) -> bool:
+        while self._pos < len(self._buffer) and self._buffer[self._pos] in chars:
+            self._pos += 1
+        return self._pos < len(self._buffer)
+
+    def _decode(self, final: bool, limit: int):
+        """Next complete JSON value at the cursor, or None if more input is needed."""
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except ValueError as e:
+            if final or e.pos < len(self._buffer) - 1 and not e.msg.startswith(('Unterminated', 'Expecting value')):
+                raise IngestError(f"Invalid JSON near byte {e.pos}: {e.msg}")
+            if len(self._buffer) - self._pos > limit:
+                raise IngestError(f"JSON value larger than {limit} bytes")
+            return None
+        # A number at the end of the buffer may still be growing ("12" then "34").
+        if end == len(self._buffer) and not final and not isinstance(value, (dict, list, str)):
+            return None
+        self._pos = end
+        return (value,)
+
+    def feed(self, chunk: bytes, final: bool = False) -> List[Tuple[Optional[str], object]]:
+        self._buffer = self._buffer[self._pos:] + self._utf8.decode(chunk, final)
+        self._pos = 0
+        records = []
+        while self._skip():
+            ch = self._buffer[self._pos]
+            if self._state == 'start':
+                if ch == '[':
+                    self._pos += 1
+                    self._array_key, self._state = None, 'element'
+                elif ch == '{':
+                    self._pos += 1
+                    self._state = 'key'
+                else:
+                    raise IngestError("Body must be a JSON object or array")
+            elif self._state == 'key':
+                if ch == '}':
+                    self._pos += 1
+                    self._state = 'done'
+                    continue
+                if ch == ',':
+                    self._pos += 1
+                    continue
+                decoded = self._decode(final, MAX_RECORD_BYTES)
+                if decoded is None:
+                    break
+                if not isinstance(decoded[0], str):
+                    raise IngestError("Expected an object key")
+                self._key, self._state = decoded[0], 'colon'
+            elif self._state == 'colon':
+                if ch != ':':
+                    raise IngestError("Expected ':' after an object key")
+                self._pos += 1
+                self._state = 'value'
+            elif self._state == 'value':
+                if ch == '[' and self._key in self.fields:
+                    self._pos += 1
+                    self._array_key, self._state = self._key, 'element'
+                    continue
+                decoded = self._decode(final, MAX_VALUE_BYTES)
+                if decoded is None:
+                    break
+                self.values[self._key] = decoded[0]
+                self._state = 'key'
+            elif self._state == 'element':
+                if ch == ']':
+                    self._pos += 1
+                    self._state = 'key' if self._array_key is not None else 'done'
+                    continue
+                if ch == ',':
+                    self._pos += 1
+                    continue
+                decoded = self._decode(final, MAX_RECORD_BYTES)
+                if decoded is None:
+                    break
+                records.append((self._array_key, decoded[0]))
+            else:
+                raise IngestError("Unexpected data after the JSON body")
+        if final and self._state != 'done':
+            raise IngestError("Truncated JSON body")
+        return records
+
+
+async def iter_json_records(chunks: AsyncIterable[bytes], fields: Tuple[str, ...] = ('transactions',),
+                            values: Optional[Dict] = None) -> AsyncIterator[Tuple[Optional[str], object]]:
+    """
+    Yields `(field, element)` for each element of the top-level arrays named
+    in `fields` (field is None for a bare top-level array). Other top-level
+    values are stored in `values` as they are parsed.
+    """
+    scanner = _Scanner(fields)
+    if values is not None:
+        scanner.values = values
+    async for chunk in chunks:
+        for record in scanner.feed(chunk):
+            yield record
+    for record in scanner.feed(b'', final=True):
+        yield record
+
+
+async def iter_bytes(data: bytes, size: int = READ_CHUNK) -> AsyncIterator[bytes]:
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+class TransactionColumns:
+    """Growable columnar transaction buffer with interned category and merchant strings."""
+
+    # (column, fill value for unused slots)
+    COLUMNS = (('cents', 0), ('category', 0), ('merchant', 0), ('day', NO_DAY))
+
+    def __init__(self, capacity: int = 1024, categories: Optional[Dict[str, int]] = None,
+                 merchants: Optional[Dict[str, int]] = None):
+        self.size = 0
+        self.cents = np.zeros(capacity, dtype=np.int64)
+        self.category = np.zeros(capacity, dtype=np.int32)
+        self.merchant = np.zeros(capacity, dtype=np.int32)
+        self.day = np.full(capacity, NO_DAY, dtype=np.int32)
+        self.category_codes = categories if categories is not None else {}
+        self.merchant_codes = merchants if merchants is not None else {}
+
+    def _grow(self) -> None:
+        for name, fill in self.COLUMNS:
+            column = getattr(self, name)
+            grown = np.full(len(column) * 2, fill, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def append(self, amount: float, category: str, merchant: str = '', day: Optional[date] = None) -> int:
+        if self.size == len(self.cents):
+            self._grow()
+        i = self.size
+        self.cents[i] = cents_of(amount)
+        self.category[i] = self.category_codes.setdefault(category, len(self.category_codes))
+        self.merchant[i] = self.merchant_codes.setdefault(merchant, len(self.merchant_codes))
+        self.day[i] = day.toordinal() if day is not None else NO_DAY
+        self.size += 1
+        return i
+
+    def clear(self) -> None:
+        """Drops the rows; interned strings are kept so codes stay stable."""
+        self.size = 0
+        self.day[:] = NO_DAY
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name)[:self.size] for name, _ in self.COLUMNS}
+
+    def __len__(self) -> int:
+        return self.size
+
+
+def purchase_amount(txn: Dict) -> Optional[float]:
+    """Finite positive amount of a purchase, else None (refunds, payments, bad rows)."""
+    try:
+        amount = float(txn.get('amount'))
+    except (TypeError, ValueError):
+        return None
+    return amount if math.isfinite(amount) and amount > 0 else None
+
+
+def deposit_amount(txn: Dict) -> Optional[float]:
+    """Finite negative amount (money in, as Plaid signs it), else None."""
+    try:
+        amount = float(txn.get('amount'))
+    except (TypeError, ValueError):
+        return None
+    return amount if math.isfinite(amount) and amount < 0 else None
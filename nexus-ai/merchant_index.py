@@ -0,0 +1,143 @@
+"""
+Compiled merchant category index.
+
+Built once at startup from the prebuilt `data/merchant_index.json.gz`
+(generated from `data/merchant_patterns.tsv` by `build_merchant_index.py`).
+Classification tries, in order:
+
+1. an exact hash lookup of the normalized merchant name (merchant_normalize.py),
+2. an Aho-Corasick scan for whole-word patterns (longest match wins),
+   repeated on the raw name with just punctuation folded if 1-2 missed,
+3. the Merchant Category Code, via binary search over MCC ranges.
+
+All three are independent of the number of patterns, so a name is
+classified in a few microseconds even with tens of thousands of rules.
+"""
+import bisect
+import gzip
+import json
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from merchant_normalize import normalize_merchant, normalize_text
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+DEFAULT_INDEX_PATH = os.path.join(DATA_DIR, 'merchant_index.json.gz')
+
+
+class MerchantIndex:
+    def __init__(self, categories: List[str], patterns: List[Tuple[str, int]], mcc_ranges: List[Tuple[int, int, int]]):
+        self.categories = categories
+        self.exact: Dict[str, int] = {pattern: code for pattern, code in patterns}
+        ranges = sorted(mcc_ranges)
+        self._mcc_low = [low for low, _, _ in ranges]
+        self._mcc_ranges = ranges
+        self._build_automaton(patterns)
+
+    # --- Aho-Corasick construction ---
+    def _build_automaton(self, patterns: List[Tuple[str, int]]) -> None:
+        goto: List[Dict[str, int]] = [{}]
+        # Per state: (pattern length, category code) of the best match ending here.
+        output: List[Optional[Tuple[int, int]]] = [None]
+        for pattern, code in patterns:
+            state = 0
+            for ch in f' {pattern} ':  # padded so matches fall on word boundaries
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    output.append(None)
+                state = nxt
+            candidate = (len(pattern), code)
+            if output[state] is None or candidate[0] > output[state][0]:
+                output[state] = candidate
+
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0
+                # Fold the suffix state's best output in, so scans need no chain walk.
+                inherited = output[fail[nxt]]
+                if inherited is not None and (output[nxt] is None or inherited[0] > output[nxt][0]):
+                    output[nxt] = inherited
+        self._goto, self._fail, self._output = goto, fail, output
+
+    def _scan(self, text: str) -> Optional[int]:
+        goto, fail, output = self._goto, self._fail, self._output
+        state, best = 0, None
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            hit = output[state]
+            if hit is not None and (best is None or hit[0] > best[0]):
+                best = hit
+        return None if best is None else best[1]
+
+    # --- Public API ---
+    def _lookup(self, name: str) -> Optional[int]:
+        code = self.exact.get(name)
+        if code is None and name:
+            code = self._scan(f' {name} ')
+        return code
+
+    def classify_normalized(self, name: str, mcc=None) -> Optional[str]:
+        """Classifies an already-normalized merchant name."""
+        code = self._lookup(name)
+        if code is None and mcc is not None:
+            code = self.classify_mcc_code(mcc)
+        return None if code is None else self.categories[code]
+
+    def classify(self, merchant_name: str, mcc=None) -> Optional[str]:
+        """
+        Tries the cleaned merchant key first, then the raw name with only
+        punctuation folded: patterns are stored in that form, and some
+        ("phillips 66", "booking com") contain tokens the cleaner strips.
+        """
+        merchant_name = merchant_name or ''
+        code = self._lookup(normalize_merchant(merchant_name))
+        if code is None:
+            code = self._lookup(normalize_text(merchant_name))
+        if code is None and mcc is not None:
+            code = self.classify_mcc_code(mcc)
+        return None if code is None else self.categories[code]
+
+    def classify_mcc_code(self, mcc) -> Optional[int]:
+        try:
+            mcc = int(mcc)
+        except (TypeError, ValueError):
+            return None
+        i = bisect.bisect_right(self._mcc_low, mcc) - 1
+        if i >= 0 and mcc <= self._mcc_ranges[i][1]:
+            return self._mcc_ranges[i][2]
+        return None
+
+    def __len__(self) -> int:
+        return len(self.exact)
+
+
+def load_merchant_index(path: str = DEFAULT_INDEX_PATH) -> MerchantIndex:
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        data = json.load(f)
+    return MerchantIndex(
+        data['categories'],
+        [(pattern, code) for pattern, code in data['patterns']],
+        [(low, high, code) for low, high, code in data['mcc']],
+    )
+
+
+@lru_cache(maxsize=None)
+def get_merchant_index() -> MerchantIndex:
+    """Process-wide index, loaded on first use (the app warms it at startup)."""
+    return load_merchant_index(os.getenv('MERCHANT_INDEX_PATH', DEFAULT_INDEX_PATH))
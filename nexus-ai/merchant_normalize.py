@@ -0,0 +1,96 @@
+"""
+Merchant name normalization.
+
+Raw Plaid strings carry processor prefixes, reference codes, store numbers
+and locations ("SQ *BLUE BOTTLE", "AMAZON.COM*AX2BC", "STARBUCKS 123 SEATTLE
+WA"). `normalize_merchant` reduces them to a stable key ("blue bottle",
+"amazon", "starbucks") that exact matching, caching and grouping can rely
+on. Every stage is a precompiled regex, and results are memoized in a
+bounded LRU keyed on the raw string, since the same few hundred merchants
+repeat across a user's history.
+"""
+import os
+import re
+from functools import lru_cache
+from typing import Dict
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+# Bank tokens that never start a real merchant name are always dropped.
+# Words that can ("Credit Karma", "Card Factory", "Online Trading Academy")
+# only go when they follow a prefix already dropped, or when another prefix,
+# a date or a processor code follows them.
+_BANK_WORDS = r'pos|debit|checkcard|ckcd|ach|purchase|preauthorized'
+_AMBIGUOUS_WORDS = r'credit|card|online|payment|recurring|visa|mc'
+_PROCESSOR_CODES = r'sq|tst|sp|pp|ppl|paypal|google|dd|py|bt|fs|gg|wpy|eb|ic|in|sqc|stk|pmt'
+_PREFIX_FOLLOWS = (r'(?=[\s:/-]*(?:(?:' + _BANK_WORDS + '|' + _AMBIGUOUS_WORDS + r')\b|\d{1,4}\b|authorized on\b|(?:'
+                   + _PROCESSOR_CODES + r')\s*\*))')
+_PROCESSOR_PREFIX = re.compile(
+    r'^(?:(?:(?:' + _BANK_WORDS + r')\b|(?:' + _AMBIGUOUS_WORDS + r')\b' + _PREFIX_FOLLOWS + r')[\s:/-]*'
+    r'(?:(?:' + _BANK_WORDS + '|' + _AMBIGUOUS_WORDS + r')\b[\s:/-]*)*)?'
+    r'(?:authorized on \d{1,2}/\d{1,2}\s*)?'
+    r'(?:(?:' + _PROCESSOR_CODES + r')\s*\*\s*)?'
+)
+_LEADING_NUMBER = re.compile(r'^\d+\s+')
+_DATE_TOKEN = re.compile(r'\b\d{1,2}/\d{1,2}(?:/\d{2,4})?\b')
+# "*AX2BC" is a reference code; "*EATS" is part of the name ("uber eats").
+_REFERENCE_CODE = re.compile(r'\s*\*\s*(?=[a-z]*\d)\S*.*$')
+_DOMAIN = re.compile(r'^www\.|\.(?:com|net|org|co|io|us)\b(?:/\S*)?')
+_STORE_NUMBER = re.compile(r'(?:#\s*\w*\d\w*|\b(?:store|str|no|unit)\s*\d+\b|\b[a-z]{0,2}-?\d{3,}\b|\b\d{2,}\b).*$')
+_PHONE = re.compile(r'\b\d{3}[-.\s]\d{3}[-.\s]\d{4}\b')
+_COUNTRY_SUFFIX = re.compile(r'\s+(?:usa|us)$')
+_US_STATES = (
+    'al ak az ar ca co ct de fl ga hi id il in ia ks ky la me md ma mi mn ms mo mt ne nv nh nj nm ny nc nd oh ok '
+    'or pa ri sc sd tn tx ut vt va wa wv wi wy dc'
+).split()
+_STATE_SUFFIX = re.compile(r'\s+[a-z]+\s+(?:' + '|'.join(_US_STATES) + r')$')
+# State codes that are also words in real names ("best buy co", "cafe de la").
+_WORD_STATES = frozenset('co in me or oh hi ok la de ma id al'.split())
+_ADDRESS = re.compile(r'\b\d+\s+\w+\s+(?:st|street|ave|avenue|rd|road|blvd|dr|drive|ln|hwy|pkwy|way)\b')
+
+MEMO_SIZE = int(os.getenv('MERCHANT_NORMALIZE_CACHE_SIZE', '65536'))
+
+
+def normalize_text(name: str) -> str:
+    """Lowercase, punctuation to single spaces ("McDonald's #12" -> "mcdonald s 12")."""
+    return _NON_ALNUM.sub(' ', (name or '').lower()).strip()
+
+
+def _normalize(raw: str) -> str:
+    name = raw.lower().strip()
+    name = _LEADING_NUMBER.sub('', _PROCESSOR_PREFIX.sub('', name))
+    name = _PHONE.sub(' ', _DATE_TOKEN.sub(' ', name))
+    name = _REFERENCE_CODE.sub('', name)
+    name = _DOMAIN.sub(' ', name)
+    # A store number separates the brand from the branch and location, so
+    # everything from it onward goes ("whole foods #10234 austin tx").
+    # A state code that doubles as a word is only trusted next to a store
+    # number or street address; otherwise "best buy co" would lose its "co".
+    has_location = bool(_STORE_NUMBER.search(name) or _ADDRESS.search(name))
+    stripped = _STORE_NUMBER.sub('', name)
+    name = stripped if stripped.strip() else name
+    name = normalize_text(name)
+    name = _COUNTRY_SUFFIX.sub('', name)
+    # "<brand> <city> <ST>": drop the state and one city word, keeping the brand.
+    words = name.split()
+    if len(words) > 2 and (has_location or words[-1] not in _WORD_STATES):
+        name = _STATE_SUFFIX.sub('', name)
+    return name or normalize_text(raw)
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def normalize_merchant(raw: str) -> str:
+    """Memoized normalization of a raw merchant string."""
+    return _normalize(raw or '')
+
+
+def normalization_stats() -> Dict:
+    info = normalize_merchant.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": round(info.hits / lookups, 4) if lookups else 0.0,
+    }
@@ -0,0 +1,113 @@
+"""
+Retroactive missed-rewards report.
+
+Scores every historical purchase against the whole portfolio in one call to
+the CardRank engine, then compares the reward the user actually earned (on
+the card they used) with the best reward available, aggregating the gap by
+month, category and card with NumPy group-bys. No LLM calls are involved.
+"""
+import math
+from typing import Dict, List
+
+import numpy as np
+
+from cardrank import enrich_merchant_category
+from cardrank_engine import compile_portfolio, category_indices, score_transactions
+
+
+def _merchant_of(txn: Dict) -> str:
+    return txn.get('merchantName') or txn.get('merchant') or txn.get('name') or ''
+
+
+def _amount_of(txn: Dict) -> float:
+    """Purchase amount as a float; 0 for anything non-numeric or non-finite."""
+    try:
+        amount = float(txn.get('amount'))
+    except (TypeError, ValueError):
+        return 0.0
+    return amount if math.isfinite(amount) else 0.0
+
+
+def _group_sum(codes: np.ndarray, size: int, *values: np.ndarray):
+    sums = [np.bincount(codes, weights=v, minlength=size) for v in values]
+    return sums, np.bincount(codes, minlength=size)
+
+
+def missed_rewards_report(user_cards: List[Dict], transactions: List[Dict]) -> Dict:
+    """
+    `transactions` are purchases with `date`, `amount`, a merchant name,
+    optional `category` and the `card_id` that was used. Rows with
+    non-positive or non-numeric amounts (refunds, payments, bad rows) or an
+    unknown card are skipped.
+    """
+    if not user_cards:
+        raise ValueError("No cards provided.")
+    portfolio = compile_portfolio(user_cards)
+    card_position = {str(card_id): i for i, card_id in enumerate(portfolio['ids'])}
+
+    # Column extraction; category enrichment runs once per distinct merchant,
+    # and months/categories are interned to integer codes for the group-bys.
+    category_memo = {}
+    month_codes, category_codes = {}, {}
+    amounts, used, months, categories = [], [], [], []
+    for txn in transactions:
+        amount = _amount_of(txn)
+        card_idx = card_position.get(str(txn.get('card_id')))
+        if amount <= 0 or card_idx is None:
+            continue
+        merchant = _merchant_of(txn)
+        memo_key = (merchant, txn.get('category'))
+        category = category_memo.get(memo_key)
+        if category is None:
+            category = category_memo[memo_key] = enrich_merchant_category(
+                {'merchantName': merchant, 'category': txn.get('category') or 'General'})
+        amounts.append(amount)
+        used.append(card_idx)
+        months.append(month_codes.setdefault(str(txn.get('date', ''))[:7], len(month_codes)))
+        categories.append(category_codes.setdefault(category, len(category_codes)))
+
+    if not amounts:
+        return {"transactions_analyzed": 0, "total_earned": 0.0, "total_optimal": 0.0, "total_missed": 0.0,
+                "by_month": [], "by_category": [], "by_card": []}
+
+    amounts = np.asarray(amounts, dtype=np.float64)
+    used = np.asarray(used, dtype=np.int64)
+    months = np.asarray(months, dtype=np.int64)
+    categories = np.asarray(categories, dtype=np.int64)
+    category_names = list(category_codes)
+    month_names = list(month_codes)
+    columns = category_indices(portfolio, category_names)[categories]
+    reward = score_transactions(portfolio, columns, amounts, "MAXIMIZE_CASHBACK")['reward']
+    optimal_card = reward.argmax(axis=1)
+    optimal = reward.max(axis=1)
+    earned = reward[np.arange(len(used)), used]
+    missed = optimal - earned
+
+    report = {
+        "transactions_analyzed": int(len(amounts)),
+        "total_earned": round(float(earned.sum()), 2),
+        "total_optimal": round(float(optimal.sum()), 2),
+        "total_missed": round(float(missed.sum()), 2),
+    }
+
+    (m_missed, m_earned), counts = _group_sum(months, len(month_names), missed, earned)
+    by_month = [{"month": label, "missed": round(float(m), 2), "earned": round(float(e), 2), "transactions": int(n)}
+                for label, m, e, n in zip(month_names, m_missed, m_earned, counts)]
+    report["by_month"] = sorted(by_month, key=lambda row: row["month"])
+
+    (c_missed, c_spend), counts = _group_sum(categories, len(category_names), missed, amounts)
+    # The card that would have won most often in each category
+    winners = np.bincount(categories * len(user_cards) + optimal_card,
+                          minlength=len(category_names) * len(user_cards)).reshape(len(category_names), len(user_cards))
+    by_category = [{"category": label, "missed": round(float(m), 2), "spend": round(float(s), 2), "transactions": int(n),
+                    "best_card_id": portfolio['ids'][int(winners[i].argmax())]}
+                   for i, (label, m, s, n) in enumerate(zip(category_names, c_missed, c_spend, counts))]
+    report["by_category"] = sorted(by_category, key=lambda row: -row["missed"])
+
+    card_missed = np.bincount(used, weights=missed, minlength=len(user_cards))
+    card_counts = np.bincount(used, minlength=len(user_cards))
+    by_card = [{"card_id": portfolio['ids'][i], "card_name": user_cards[i].get('name'), "missed": round(float(card_missed[i]), 2),
+                "transactions": int(card_counts[i])}
+               for i in range(len(user_cards)) if card_counts[i] > 0]
+    report["by_card"] = sorted(by_card, key=lambda row: -row["missed"])
+    return report
@@ -0,0 +1,150 @@
+"""
+Fixed-point money core.
+
+Every amount is held as int64 cents inside NumPy arrays and every APR as
+integer basis points (24.99% -> 2499), so plan math is exact: splits always
+sum to the payment and repeated computations never drift by a cent.
+Conversion back to float dollars happens only at the response boundary.
+"""
+import math
+from typing import Optional, Tuple, Union
+
+import numpy as np
+
+CENTS_PER_DOLLAR = 100
+BPS_PER_UNIT = 10_000  # 1.00 == 100% == 10,000 bps
+MIN_PAYMENT_FLOOR_CENTS = 2_500  # $25
+MIN_PAYMENT_RATE_BPS = 100  # 1% of balance
+DAYS_PER_YEAR = 365
+MONTHS_PER_YEAR = 12
+
+ArrayLike = Union[float, int, list, tuple, np.ndarray]
+
+
+# --- Conversion ---
+def _round_half_away(values: np.ndarray) -> np.ndarray:
+    # Trim binary noise first (1.005 * 100 == 100.49999999999999) so that
+    # decimal half-cents round the way a human would expect.
+    values = np.round(values, 6)
+    return np.sign(values) * np.floor(np.abs(values) + 0.5)
+
+
+def to_cents(amounts: ArrayLike) -> np.ndarray:
+    """Converts dollar amounts (scalar or sequence) to an int64 cents array."""
+    dollars = np.asarray(amounts, dtype=np.float64)
+    return _round_half_away(dollars * CENTS_PER_DOLLAR).astype(np.int64)
+
+
+def cents_of(amount: float) -> int:
+    """Scalar `to_cents` for per-row ingestion: same rounding, no array overhead."""
+    value = round(amount * CENTS_PER_DOLLAR * 1e6) / 1e6
+    return int(math.copysign(math.floor(abs(value) + 0.5), value))
+
+
+def to_bps(rates_percent: ArrayLike) -> np.ndarray:
+    """Converts APR percentages (24.99) to int64 basis points (2499)."""
+    rates = np.asarray(rates_percent, dtype=np.float64)
+    return _round_half_away(rates * 100).astype(np.int64)
+
+
+def from_cents(cents: ArrayLike) -> Union[float, list]:
+    """Converts cents back to dollars: a float for scalars, a list otherwise."""
+    arr = np.asarray(cents, dtype=np.int64)
+    if arr.ndim == 0:
+        return int(arr) / CENTS_PER_DOLLAR
+    return (arr / CENTS_PER_DOLLAR).tolist()
+
+
+def div_round(numerator: ArrayLike, denominator: int) -> np.ndarray:
+    """Integer division rounding half away from zero, exact for int64 inputs."""
+    num = np.asarray(numerator, dtype=np.int64)
+    half = denominator // 2
+    return np.where(num >= 0, (num + half) // denominator, -((-num + half) // denominator))
+
+
+# --- Primitives ---
+def minimum_payments_cents(balances: np.ndarray,
+                           floor_cents: int = MIN_PAYMENT_FLOOR_CENTS,
+                           rate_bps: int = MIN_PAYMENT_RATE_BPS) -> np.ndarray:
+    """
+    Minimum due per card: max($25, 1% of balance), or the whole balance when
+    it is at or under the floor.
+    """
+    balances = np.asarray(balances, dtype=np.int64)
+    percent_due = div_round(balances * rate_bps, BPS_PER_UNIT)
+    return np.where(balances > floor_cents, np.maximum(floor_cents, percent_due), balances)
+
+
+def accrue_interest_cents(balances: np.ndarray, apr_bps: np.ndarray,
+                          days: Optional[int] = None) -> np.ndarray:
+    """
+    Interest charged on `balances` for one period. With `days=None` the period
+    is one month (APR / 12); otherwise it is `days` of daily accrual (APR / 365).
+    Negative (credit) balances accrue nothing.
+    """
+    balances = np.maximum(np.asarray(balances, dtype=np.int64), 0)
+    apr_bps = np.asarray(apr_bps, dtype=np.int64)
+    if days is None:
+        return div_round(balances * apr_bps, MONTHS_PER_YEAR * BPS_PER_UNIT)
+    return div_round(balances * apr_bps * int(days), DAYS_PER_YEAR * BPS_PER_UNIT)
+
+
+def project_balances_cents(balances: np.ndarray, apr_bps: np.ndarray,
+                           monthly_payments: ArrayLike, months: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Multi-month accrual over any array shape (cards, pairs, pairs x amounts).
+
+    Each month interest accrues on the running balance, then the payment is
+    applied (never more than what is owed). `apr_bps` may carry a leading
+    `months` axis to model promo periods that expire mid-projection.
+
+    Returns `(balances, interest)` with shapes `(months + 1, *shape)` and
+    `(months, *shape)`.
+    """
+    current = np.asarray(balances, dtype=np.int64).copy()
+    apr_bps = np.asarray(apr_bps, dtype=np.int64)
+    payments = np.broadcast_to(np.asarray(monthly_payments, dtype=np.int64), current.shape)
+    per_month_apr = apr_bps.ndim > current.ndim
+    history = np.empty((months + 1,) + current.shape, dtype=np.int64)
+    interest = np.empty((months,) + current.shape, dtype=np.int64)
+    history[0] = current
+    for month in range(months):
+        rate = apr_bps[month] if per_month_apr else apr_bps
+        charged = accrue_interest_cents(current, rate)
+        current = current + charged
+        current = current - np.minimum(payments, np.maximum(current, 0))
+        interest[month] = charged
+        history[month + 1] = current
+    return history, interest
+
+
+def allocate_cents(total_cents: int, weights: ArrayLike) -> np.ndarray:
+    """
+    Splits `total_cents` pro rata to `weights` using largest remainders, so
+    the parts are whole cents and always sum exactly to the total.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    if weights.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    weight_sum = weights.sum()
+    if weight_sum <= 0:
+        weights = np.ones_like(weights)
+        weight_sum = weights.sum()
+    exact = weights / weight_sum * total_cents
+    parts = np.floor(exact).astype(np.int64)
+    leftover = int(total_cents - parts.sum())
+    if leftover > 0:
+        # Stable order keeps ties deterministic (earlier cards win the cent).
+        order = np.argsort(-(exact - parts), kind="stable")
+        parts[order[:leftover]] += 1
+    return parts
+
+
+def allocate_power_payment(total_cents: int, minimums: np.ndarray, target_index: int) -> np.ndarray:
+    """
+    Every card gets its minimum and the target card gets everything left over.
+    The result sums exactly to `total_cents`.
+    """
+    split = np.asarray(minimums, dtype=np.int64).copy()
+    split[target_index] = total_cents - (split.sum() - split[target_index])
+    return split
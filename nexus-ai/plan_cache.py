@@ -0,0 +1,61 @@
+"""
+Memoization of /v2/interestkiller results under a portfolio fingerprint.
+
+The fingerprint is a SHA-256 over a canonical encoding of the accounts
+(sorted by id, money in cents), the payment amount and the user context that
+shapes the plan and its explanation, plus the evaluation month: promo
+months remaining (and so balance-transfer savings) change at month
+boundaries. While balances are unchanged since the last Plaid sync, the
+fingerprint is stable within the month, so callers can resend just the
+fingerprint and skip both the algorithm and the LLM. Entries from an
+earlier month are treated as expired.
+"""
+import hashlib
+import json
+import os
+from datetime import date
+from typing import Dict, List, Optional
+
+from lru import LRUCache
+from money import to_cents
+
+plan_cache = LRUCache(maxsize=int(os.getenv("PLAN_CACHE_SIZE", "2048")))
+
+
+def evaluation_month(today: Optional[date] = None) -> str:
+    return (today or date.today()).strftime('%Y-%m')
+
+
+def portfolio_fingerprint(accounts: List[Dict], payment_amount: float, user_context: Optional[Dict],
+                          today: Optional[date] = None) -> str:
+    """Stable hex fingerprint of (accounts, payment_amount, goal context, month)."""
+    canonical_accounts = []
+    for acc in sorted(accounts, key=lambda a: str(a.get('id'))):
+        entry = dict(acc)
+        for key in ('balance', 'creditLimit'):
+            if entry.get(key) is not None:
+                entry[key] = int(to_cents(entry[key]))
+        canonical_accounts.append(entry)
+    payload = {
+        "accounts": canonical_accounts,
+        "payment_cents": int(to_cents(payment_amount)),
+        "user_context": user_context or {},
+        "month": evaluation_month(today),
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def get_cached_plan(fingerprint: str, today: Optional[date] = None) -> Optional[Dict]:
+    entry = plan_cache.get(fingerprint)
+    if entry is None:
+        return None
+    month, response = entry
+    if month != evaluation_month(today):
+        plan_cache.pop(fingerprint)
+        return None
+    return response
+
+
+def store_plan(fingerprint: str, response: Dict, today: Optional[date] = None) -> None:
+    plan_cache.put(fingerprint, (evaluation_month(today), response))
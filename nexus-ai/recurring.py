@@ -0,0 +1,218 @@
+"""
+Recurring charge and subscription detection.
+
+Purchases are grouped by normalized merchant (its interned code) and amount
+band: within a merchant, rows sorted by amount start a new band wherever
+the next amount is more than AMOUNT_TOLERANCE above the previous one, so a
+$15.49 subscription that becomes $16.99 stays one series while a $5 coffee
+and a $60 bag of beans at the same roaster do not. Each band's distinct
+charge days are sorted and the intervals between them compared with each
+cadence: a band recurs when its median interval is within the cadence's
+tolerance and enough of its intervals are. All of this is a couple of
+lexsorts and bincounts over the whole history; Python only touches the
+handful of bands that turn out to recur.
+
+A series predicts its next charge from the last one (same weekday, same
+day of the month, or same date next year) at the last amount, and is
+dropped once it is overdue by more than half a period. The day of the
+month is the series' usual one, not the last charge's: a bill on the 31st
+last charged on Apr 30 is still due on May 31.
+
+Stored users are cached (user id -> series per merchant). When new rows
+arrive, only the merchants they touch are re-detected.
+"""
+import os
+import weakref
+from collections import Counter
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from anomalies import group_median
+from lru import LRUCache
+from money import from_cents
+from spending import purchase_columns
+from utilization_timing import next_day_of_month
+
+# (cadence, period in days, tolerance in days, minimum occurrences)
+RECURRENCES = (('weekly', 7.0, 1.0, 3), ('monthly', 30.44, 5.0, 3), ('annual', 365.25, 10.0, 2))
+AMOUNT_TOLERANCE = 0.15
+MIN_REGULARITY = 0.75
+# A series is still active until it is this many periods past its last charge.
+ACTIVE_PERIODS = 1.5
+DEFAULT_HORIZON_DAYS = 30
+MONTH_END = 28
+
+
+def month_anchor(days_of_month: List[int]) -> int:
+    """
+    The scheduled day of the month behind a series of charge days, most
+    recent first: the most common day, ties going to the most recent. Days
+    that are all the 28th or later only differ through short months, so
+    the largest one is the schedule ("31" for 31, 30, 28).
+    """
+    if min(days_of_month) >= MONTH_END:
+        return max(days_of_month)
+    return Counter(days_of_month).most_common(1)[0][0]
+
+
+def public(series: List[Dict]) -> List[Dict]:
+    return [{k: v for k, v in item.items() if not k.startswith('_')} for item in series]
+
+
+def next_occurrence(cadence: str, day: date, day_of_month: int) -> date:
+    if cadence == 'weekly':
+        return day + timedelta(days=7)
+    if cadence == 'monthly':
+        return next_day_of_month(day + timedelta(days=15), day_of_month)
+    return next_day_of_month(date(day.year + 1, day.month, 1), day_of_month)
+
+
+def detect_recurring(columns: Dict[str, np.ndarray], merchant_names: List[str], category_names: List[str],
+                     merchants: Optional[np.ndarray] = None) -> Dict[int, List[Dict]]:
+    """
+    Recurring series per merchant code, from the purchases in `columns`
+    (only those of `merchants`, if given). Activity is not judged here.
+    """
+    keep = columns["cents"] > 0
+    if merchants is not None:
+        keep &= np.isin(columns["merchant"], merchants)
+    rows = np.flatnonzero(keep)
+    result: Dict[int, List[Dict]] = {int(m): [] for m in (merchants if merchants is not None else ())}
+    if not len(rows):
+        return result
+    merchant, cents, day = columns["merchant"][rows], columns["cents"][rows], columns["day"][rows]
+    category = columns["category"][rows]
+
+    # Amount bands: breaks in (merchant, amount) order.
+    order = np.lexsort((cents, merchant))
+    breaks = np.ones(len(order), dtype=bool)
+    breaks[1:] = ((merchant[order][1:] != merchant[order][:-1])
+                  | (cents[order][1:] > cents[order][:-1] * (1 + AMOUNT_TOLERANCE)))
+    band = np.empty(len(order), dtype=np.int64)
+    band[order] = np.cumsum(breaks) - 1
+    n_bands = int(band.max()) + 1
+
+    # Distinct charge days per band, in date order.
+    order = np.lexsort((day, band))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (band[order][1:] != band[order][:-1]) | (day[order][1:] != day[order][:-1])
+    order = order[first]
+    band_sorted, day_sorted = band[order], day[order].astype(np.int64)
+    occurrences = np.bincount(band_sorted, minlength=n_bands)
+    follows = band_sorted[1:] == band_sorted[:-1]
+    gaps = (day_sorted[1:] - day_sorted[:-1])[follows]
+    gap_band = band_sorted[1:][follows]
+    intervals = np.bincount(gap_band, minlength=n_bands)
+    median_gap, _ = group_median(gap_band, gaps.astype(np.float64), n_bands)
+
+    cadence = np.full(n_bands, -1)
+    regularity = np.zeros(n_bands)
+    for k, (_, period, tolerance, min_occurrences) in enumerate(RECURRENCES):
+        regular = np.bincount(gap_band, weights=np.abs(gaps - period) <= tolerance, minlength=n_bands)
+        share = np.divide(regular, intervals, out=np.zeros(n_bands), where=intervals > 0)
+        match = ((cadence < 0) & (occurrences >= min_occurrences) & (np.abs(median_gap - period) <= tolerance)
+                 & (share >= MIN_REGULARITY))
+        cadence[match] = k
+        regularity[match] = share[match]
+
+    last = np.flatnonzero(np.r_[band_sorted[1:] != band_sorted[:-1], True])
+    first = last - occurrences[band_sorted[last]] + 1
+    totals = np.bincount(band_sorted, weights=cents[order], minlength=n_bands)
+    for b in np.flatnonzero(cadence >= 0):
+        k = np.searchsorted(band_sorted[last], b)
+        row = order[last[k]]
+        name, period, _, _ = RECURRENCES[cadence[b]]
+        result.setdefault(int(merchant[row]), []).append({
+            "merchant": merchant_names[merchant[row]],
+            "category": category_names[category[row]],
+            "cadence": name,
+            "interval_days": round(float(median_gap[b]), 1),
+            "amount": from_cents(int(cents[row])),
+            "average_amount": round(from_cents(int(round(totals[b] / occurrences[b]))), 2),
+            "occurrences": int(occurrences[b]),
+            "last_date": date.fromordinal(int(day[row])).isoformat(),
+            "confidence": round(float(regularity[b] * min(1.0, intervals[b] / 4)), 2),
+            "_period": period,
+            "_anchor": month_anchor([date.fromordinal(int(d)).day for d in day_sorted[first[k]:last[k] + 1][::-1]]),
+        })
+    return result
+
+
+def active_series(series_by_merchant: Dict[int, List[Dict]], as_of: Optional[int]) -> List[Dict]:
+    """Series still running on day ordinal `as_of`, with their next predicted charge."""
+    active = []
+    for series in series_by_merchant.values():
+        for item in series:
+            last = date.fromisoformat(item["last_date"])
+            if as_of is not None and as_of - last.toordinal() > item["_period"] * ACTIVE_PERIODS:
+                continue
+            active.append(dict(item, next_date=next_occurrence(item["cadence"], last, item["_anchor"]).isoformat()))
+    active.sort(key=lambda item: (item["next_date"], item["merchant"]))
+    return active
+
+
+def latest_purchase_day(columns: Dict[str, np.ndarray]) -> Optional[int]:
+    days = columns["day"][columns["cents"] > 0]
+    return int(days.max()) if len(days) else None
+
+
+def recurring_charges(transactions: List[Dict]) -> List[Dict]:
+    buffer, _ = purchase_columns(transactions)
+    columns = buffer.columns()
+    series = detect_recurring(columns, list(buffer.merchant_codes), list(buffer.category_codes))
+    return active_series(series, latest_purchase_day(columns))
+
+
+class SeriesCache:
+    """
+    Per-user memo of `detect(columns, merchant_names, category_names,
+    merchants)` results keyed by merchant code. New rows re-run `detect`
+    for the merchants they touch only; a different history object for the
+    same user (after eviction and resync) starts over.
+    """
+
+    def __init__(self, detect, maxsize: int):
+        self.detect = detect
+        self._users = LRUCache(maxsize=maxsize)
+
+    def series(self, user_id: str, history) -> Dict[int, List[Dict]]:
+        columns = history.columns()
+        cached = self._users.get(user_id)
+        if cached is None or cached[0]() is not history:
+            cached = [weakref.ref(history), history.cursor,
+                      self.detect(columns, history.merchant_names, history.category_names)]
+            self._users.put(user_id, cached)
+        elif cached[1] < history.cursor:
+            touched = np.unique(columns["merchant"][cached[1]:])
+            cached[2].update(self.detect(columns, history.merchant_names, history.category_names, touched))
+            cached[1] = history.cursor
+        return cached[2]
+
+    def stats(self) -> Dict:
+        return self._users.stats()
+
+
+recurring_cache = SeriesCache(detect_recurring, maxsize=int(os.getenv("RECURRING_CACHE_SIZE", "5000")))
+
+
+def user_recurring(user_id: str, history) -> List[Dict]:
+    """A stored user's active series; only merchants with new rows are re-detected."""
+    return active_series(recurring_cache.series(user_id, history), history.categories.last_day)
+
+
+def upcoming_bills(series: List[Dict], start: date, days: int = DEFAULT_HORIZON_DAYS) -> List[Dict]:
+    """Predicted charges of active series in [start, start + days], in date order."""
+    end = start + timedelta(days=days)
+    bills = []
+    for item in series:
+        due, anchor = date.fromisoformat(item["next_date"]), item["_anchor"]
+        while due < start:
+            due = next_occurrence(item["cadence"], due, anchor)
+        while due <= end:
+            bills.append({"bill_name": item["merchant"], "amount": item["amount"], "due_date": due.isoformat(),
+                          "cadence": item["cadence"], "confidence": item["confidence"]})
+            due = next_occurrence(item["cadence"], due, anchor)
+    bills.sort(key=lambda bill: (bill["due_date"], bill["bill_name"]))
+    return bills
@@ -0,0 +1,196 @@
+"""
+Reward caps and rotating bonus categories.
+
+Cards may declare spend caps on bonus categories and quarterly rotating
+categories:
+
+    "reward_caps": [{"category": "groceries", "limit": 6000, "period": "year",
+                     "multiplier_after": 1.0}],
+    "rotating_categories": {"2026-Q4": ["amazon", "dining"]},
+    "rotating_multiplier": 5.0, "rotating_cap": 1500
+
+`resolve_card_rewards` folds the current quarter's rotating categories into
+each card's reward map (with their cap), so the scoring engine only ever
+sees plain multipliers. `SpendCounterStore` keeps, per user, one counter
+slot per (card, category, period kind) in int64 cents arrays together with
+the period the slot belongs to; a transaction from a newer period rolls the
+slot over, so no history is ever re-scanned. The remaining headroom it
+reports is applied to a compiled portfolio with
+cardrank_engine.apply_reward_caps.
+"""
+import os
+import threading
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from cardrank import enrich_merchant_category
+from lru import LRUCache
+from money import to_cents
+
+PERIODS = ("month", "quarter", "year")
+DEFAULT_ROTATING_MULTIPLIER = 5.0
+DEFAULT_ROTATING_CAP = 1500.0
+INITIAL_SLOTS = 8
+
+
+def period_id(day: date, period: str) -> int:
+    """Monotonic integer id of the calendar period containing `day`."""
+    if period == "month":
+        return day.year * 12 + day.month - 1
+    if period == "quarter":
+        return day.year * 4 + (day.month - 1) // 3
+    if period == "year":
+        return day.year
+    raise ValueError(f"Unknown reward cap period '{period}'. Expected one of: {', '.join(PERIODS)}.")
+
+
+def quarter_label(day: date) -> str:
+    return f"{day.year}-Q{(day.month - 1) // 3 + 1}"
+
+
+def _parse_day(value) -> Optional[date]:
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def _default_multiplier(card: Dict) -> float:
+    rewards = card.get('rewards')
+    try:
+        return float(rewards.get('default', 1.0)) if isinstance(rewards, dict) else 1.0
+    except (TypeError, ValueError):
+        return 1.0
+
+
+def resolve_card_rewards(user_cards: List[Dict], today: Optional[date] = None) -> List[Dict]:
+    """Cards with this quarter's rotating categories merged into `rewards` and `reward_caps`."""
+    today = today or date.today()
+    resolved = []
+    for card in user_cards:
+        rotating = card.get('rotating_categories')
+        active = rotating.get(quarter_label(today)) if isinstance(rotating, dict) else None
+        if not active:
+            resolved.append(card)
+            continue
+        rewards = dict(card.get('rewards') or {'default': 1.0})
+        caps = list(card.get('reward_caps') or [])
+        multiplier = card.get('rotating_multiplier') or DEFAULT_ROTATING_MULTIPLIER
+        for category in active:
+            rewards[category] = multiplier
+            caps.append({"category": category, "limit": card.get('rotating_cap') or DEFAULT_ROTATING_CAP,
+                         "period": "quarter", "multiplier_after": _default_multiplier(card)})
+        resolved.append(dict(card, rewards=rewards, reward_caps=caps))
+    return resolved
+
+
+def _card_caps(card: Dict) -> List[Dict]:
+    caps = card.get('reward_caps')
+    return [cap for cap in caps if isinstance(cap, dict) and cap.get('category')] if isinstance(caps, list) else []
+
+
+class UserSpendCounters:
+    """Counter slots for one user: spent cents and owning period per slot."""
+
+    def __init__(self):
+        self.slots: Dict[Tuple[str, str, str], int] = {}
+        self.spent = np.zeros(INITIAL_SLOTS, dtype=np.int64)
+        self.period = np.full(INITIAL_SLOTS, -1, dtype=np.int64)
+        self.seen_ids = set()
+
+    def slot(self, key: Tuple[str, str, str]) -> int:
+        index = self.slots.get(key)
+        if index is None:
+            index = self.slots[key] = len(self.slots)
+            if index >= len(self.spent):
+                self.spent = np.concatenate([self.spent, np.zeros(len(self.spent), dtype=np.int64)])
+                self.period = np.concatenate([self.period, np.full(len(self.period), -1, dtype=np.int64)])
+        return index
+
+    def add(self, key: Tuple[str, str, str], period: int, cents: int) -> None:
+        index = self.slot(key)
+        if period > self.period[index]:  # rollover into a new period
+            self.period[index] = period
+            self.spent[index] = 0
+        if period == self.period[index]:
+            self.spent[index] += cents
+
+    def spent_in(self, key: Tuple[str, str, str], period: int) -> int:
+        index = self.slots.get(key)
+        if index is None or self.period[index] != period:
+            return 0
+        return int(self.spent[index])
+
+
+class SpendCounterStore:
+    def __init__(self, maxsize: int = 10000):
+        self._users = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def _counters(self, user_id: str) -> UserSpendCounters:
+        counters = self._users.get(user_id)
+        if counters is None:
+            counters = UserSpendCounters()
+            self._users.put(user_id, counters)
+        return counters
+
+    def record(self, user_id: str, user_cards: List[Dict], transactions: List[Dict]) -> int:
+        """
+        Adds purchase events to the capped slots they count towards. Events
+        are de-duplicated by transaction id; returns how many were applied.
+        """
+        cards = {str(card.get('id')): card for card in user_cards}
+        applied = 0
+        with self._lock:
+            counters = self._counters(user_id)
+            for txn in transactions:
+                txn_id = txn.get('id') or txn.get('transaction_id')
+                if txn_id is not None and txn_id in counters.seen_ids:
+                    continue
+                card = cards.get(str(txn.get('card_id')))
+                day = _parse_day(txn.get('date'))
+                try:
+                    amount = float(txn.get('amount'))
+                except (TypeError, ValueError):
+                    continue
+                if card is None or day is None or not amount > 0:
+                    continue
+                if txn_id is not None:
+                    counters.seen_ids.add(txn_id)
+                category = enrich_merchant_category(txn)
+                for cap in _card_caps(resolve_card_rewards([card], day)[0]):
+                    if cap['category'] == category:
+                        period = cap.get('period', 'quarter')
+                        counters.add((str(card.get('id')), category, period), period_id(day, period), int(to_cents(amount)))
+                applied += 1
+        return applied
+
+    def remaining(self, user_id: str, user_cards: List[Dict],
+                  today: Optional[date] = None) -> Dict[int, Dict[str, Tuple[float, float]]]:
+        """
+        `{card_index: {category: (remaining dollars, multiplier after the cap)}}`
+        for the current periods. `user_cards` should already be resolved.
+        """
+        today = today or date.today()
+        counters = self._users.get(user_id)
+        result = {}
+        for i, card in enumerate(user_cards):
+            for cap in _card_caps(card):
+                period = cap.get('period', 'quarter')
+                spent = counters.spent_in((str(card.get('id')), cap['category'], period), period_id(today, period)) if counters else 0
+                limit = int(to_cents(cap.get('limit') or 0))
+                after = cap.get('multiplier_after')
+                result.setdefault(i, {})[cap['category']] = (
+                    max(limit - spent, 0) / 100.0,
+                    float(after) if after is not None else _default_multiplier(card))
+        return result
+
+    def stats(self) -> Dict:
+        return self._users.stats()
+
+
+spend_counters = SpendCounterStore(maxsize=int(os.getenv("SPEND_COUNTER_USERS", "10000")))
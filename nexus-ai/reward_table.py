@@ -0,0 +1,178 @@
+"""
+Per-user compiled reward lookup table for swipe-time ranking.
+
+Below the signup-bonus and projected-utilization thresholds, each card's
+CardRank score for a category is a straight line in the purchase amount
+(`slope * amount + intercept`, see cardrank_engine.reward_slopes). The
+table stores, for every goal and category column, the upper envelope of
+those lines: sorted amount breakpoints with the best and runner-up card on
+each segment. A swipe is then a dict lookup, one bisect and two guards
+(signup bonus reachable, winner pushed past the utilization limit); only
+when a guard trips does it fall back to the full vectorized scorer.
+
+Tables are cached per user and keyed by a portfolio version hash, so any
+change to the cards compiles a fresh table and drops the stale one. Reward
+caps (reward_caps.py) enter the version only when one is exhausted, since
+that changes a multiplier; partly used caps are a third, live guard.
+Tables describe domestic purchases: a swipe abroad, or in a country some
+card has a location bonus for, is always scored by the engine.
+"""
+import bisect
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from cardrank_engine import (GOAL_WEIGHTS, apply_reward_caps, compile_portfolio, category_indices,
+                             projected_over_limit, reward_slopes, score_transactions, static_scores)
+from geo_index import is_foreign
+from lru import LRUCache
+
+BALANCED_GOAL = "BALANCED"
+TABLE_GOALS = tuple(GOAL_WEIGHTS) + (BALANCED_GOAL,)
+
+# user_id -> (portfolio version, compiled table)
+reward_tables = LRUCache(maxsize=int(os.getenv("REWARD_TABLE_CACHE_SIZE", "4096")))
+
+
+def table_goal(goal: Optional[str]) -> str:
+    """Goals without dedicated weights score with the balanced weights."""
+    return goal if goal in GOAL_WEIGHTS else BALANCED_GOAL
+
+
+def portfolio_version(user_cards: List[Dict]) -> str:
+    """Short stable hash of everything on the cards that can affect scoring."""
+    encoded = json.dumps(user_cards, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:16]
+
+
+def _exhausted_caps(reward_caps: Optional[Dict]) -> Dict:
+    return {card_idx: {category: cap for category, cap in by_category.items() if cap[0] <= 0}
+            for card_idx, by_category in (reward_caps or {}).items()}
+
+
+def table_version(user_cards: List[Dict], reward_caps: Optional[Dict] = None) -> str:
+    exhausted = sorted([card_idx, category] for card_idx, by_category in _exhausted_caps(reward_caps).items()
+                       for category in by_category)
+    return portfolio_version(user_cards + [{"exhausted_caps": exhausted}] if exhausted else user_cards)
+
+
+def _envelope(slopes: np.ndarray, intercepts: np.ndarray):
+    """Breakpoints plus best and runner-up card per amount segment."""
+    n = len(slopes)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossings = (intercepts[None, :] - intercepts[:, None]) / (slopes[:, None] - slopes[None, :])
+    crossings = crossings[np.isfinite(crossings) & (crossings > 0)]
+    bounds = np.unique(crossings)
+    # One sample amount inside each segment [0, b1), [b1, b2), ..., [bk, inf)
+    edges = np.concatenate(([0.0], bounds))
+    samples = np.concatenate(((edges[:-1] + edges[1:]) / 2, [edges[-1] + 1.0]))
+    scores = samples[:, None] * slopes[None, :] + intercepts[None, :]
+    best = scores.argmax(axis=1)
+    if n > 1:
+        scores[np.arange(len(samples)), best] = -np.inf
+        runner = scores.argmax(axis=1)
+    else:
+        runner = np.full(len(samples), -1)
+    return bounds.tolist(), best.tolist(), runner.tolist()
+
+
+def compile_reward_table(user_cards: List[Dict], reward_caps: Optional[Dict] = None) -> Dict:
+    portfolio = compile_portfolio(user_cards)
+    if reward_caps:
+        portfolio = apply_reward_caps(portfolio, _exhausted_caps(reward_caps))
+    n_columns = portfolio["multipliers"].shape[1]
+    goals = {}
+    for goal in TABLE_GOALS:
+        slopes = reward_slopes(portfolio, goal)
+        intercepts = static_scores(portfolio, goal)
+        goals[goal] = {
+            "slopes": slopes,
+            "intercepts": intercepts,
+            "segments": [_envelope(slopes[:, col], intercepts) for col in range(n_columns)],
+        }
+    needed = portfolio["bonus_spend_needed"]
+    return {
+        "version": table_version(user_cards, reward_caps),
+        "portfolio": portfolio,
+        "goals": goals,
+        # Any purchase this large may unlock a signup bonus, which is not linear.
+        "bonus_threshold": float(needed[needed > 0].min()) if (needed > 0).any() else float('inf'),
+    }
+
+
+def get_reward_table(user_id: str, user_cards: List[Dict], reward_caps: Optional[Dict] = None) -> Dict:
+    """The user's compiled table, recompiled whenever the portfolio changes."""
+    version = table_version(user_cards, reward_caps)
+    cached = reward_tables.get(user_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    table = compile_reward_table(user_cards, reward_caps)
+    reward_tables.put(user_id, (version, table))
+    return table
+
+
+def lookup_best_card(table: Dict, category: str, amount: float, goal: Optional[str],
+                     reward_caps: Optional[Dict] = None) -> Optional[Dict]:
+    """
+    O(log segments) ranking from the table. Returns None when a threshold
+    guard trips and the caller must score the transaction in full.
+    """
+    portfolio = table["portfolio"]
+    if amount >= table["bonus_threshold"]:
+        return None
+    col = portfolio["category_index"].get(category, len(portfolio["category_index"]))
+    compiled = table["goals"][table_goal(goal)]
+    bounds, best, runner = compiled["segments"][col]
+    segment = bisect.bisect_right(bounds, amount)
+    best_idx, runner_idx = best[segment], runner[segment]
+    # Penalties only ever lower scores, so an unpenalized winner stays the winner.
+    if projected_over_limit(portfolio, best_idx, amount):
+        return None
+    cap = (reward_caps or {}).get(best_idx, {}).get(category)
+    if cap is not None and 0 < cap[0] < amount:  # the purchase would overrun the winner's cap
+        return None
+    slopes, intercepts = compiled["slopes"][:, col], compiled["intercepts"]
+    margin = None
+    if runner_idx >= 0:
+        margin = float((slopes[best_idx] - slopes[runner_idx]) * amount + intercepts[best_idx] - intercepts[runner_idx])
+    return {"best": best_idx, "runner_up": runner_idx, "margin": margin}
+
+
+def swipe_recommendation(user_id: str, user_cards: List[Dict], category: str, amount: float,
+                         goal: Optional[str], reward_caps: Optional[Dict] = None,
+                         country: Optional[str] = None, home_country: Optional[str] = None) -> Dict:
+    """Best card for one purchase without any LLM call."""
+    if not user_cards:
+        raise ValueError("No cards provided.")
+    table = get_reward_table(user_id, user_cards, reward_caps)
+    portfolio = table["portfolio"]
+    located = is_foreign(country, home_country) or any(country in rewards for rewards in portfolio["location_rewards"])
+    ranked = None if located else lookup_best_card(table, category, amount, goal, reward_caps)
+    source = "table"
+    if ranked is None:
+        source = "engine"
+        if reward_caps:
+            portfolio = apply_reward_caps(compile_portfolio(user_cards), reward_caps)
+        scores = score_transactions(portfolio, category_indices(portfolio, [category]), [amount], goal,
+                                    [country], home_country)['score'][0]
+        order = np.argsort(-scores, kind='stable')
+        best_idx = int(order[0])
+        runner_idx = int(order[1]) if len(order) > 1 else -1
+        ranked = {"best": best_idx, "runner_up": runner_idx,
+                  "margin": float(scores[best_idx] - scores[runner_idx]) if runner_idx >= 0 else None}
+    best_idx = ranked["best"]
+    col = int(category_indices(portfolio, [category])[0])
+    reward = float(score_transactions(portfolio, [col], [amount], goal, [country], home_country)['reward'][0, best_idx])
+    return {
+        "recommended_card": user_cards[best_idx],
+        "runner_up_card_id": portfolio["ids"][ranked["runner_up"]] if ranked["runner_up"] >= 0 else None,
+        "score_margin": None if ranked["margin"] is None else round(ranked["margin"], 4),
+        "category": category,
+        "country": country,
+        "reward_value_usd": round(float(reward), 2),
+        "portfolio_version": table["version"],
+        "source": source,
+    }
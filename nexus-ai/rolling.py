@@ -0,0 +1,119 @@
+"""
+Rolling per-key spending aggregates, updated once per transaction.
+
+`RollingWindows` keeps, for every interned key (a category or normalized
+merchant code from the user's TransactionColumns), a ring of daily buckets
+holding the purchase sum, count and sum of squares in cents. Alongside the
+ring it keeps running totals for each span: the trailing day, week and
+month ending on the latest day seen, the window before each of them, and
+the calendar month to date.
+
+Adding a purchase touches one bucket and the spans containing its day, so
+it is O(1) in the length of the history. When a purchase arrives on a later
+day, each span slides forward a day at a time: the bucket leaving it is
+subtracted and the one entering it added, one vectorized step across all
+keys (once per day, not per purchase). Reads are then a row of the totals
+array.
+
+Purchases older than the ring (RING_DAYS before the latest day) do not fall
+in any span and are ignored.
+"""
+from datetime import date
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from money import from_cents
+
+WINDOWS = (('day', 1), ('week', 7), ('month', 30))
+# Twice the longest window, so the previous month is kept as well.
+RING_DAYS = 64
+SPANS = tuple(name for name, _ in WINDOWS) + tuple(f'previous_{name}' for name, _ in WINDOWS) + ('month_to_date',)
+SUM, COUNT, SUMSQ = 0, 1, 2
+
+
+@lru_cache(maxsize=None)
+def span_layout(day_of_month: int) -> Tuple[np.ndarray, Tuple[np.ndarray, ...]]:
+    """
+    Inclusive [first, last] offsets back from the latest day for each span,
+    and for each ring offset the indices of the spans containing it. Only
+    month_to_date depends on the date, through its day of the month.
+    """
+    offsets = [(0, days - 1) for _, days in WINDOWS] + [(days, 2 * days - 1) for _, days in WINDOWS]
+    offsets.append((0, day_of_month - 1))
+    offsets = np.array(offsets, dtype=np.int64)
+    members = tuple(np.flatnonzero((offsets[:, 0] <= k) & (k <= offsets[:, 1])) for k in range(RING_DAYS))
+    return offsets, members
+
+
+class RollingWindows:
+    def __init__(self, codes: Dict[str, int], capacity: int = 16):
+        # Shared with the owning TransactionColumns, so codes line up with its columns.
+        self.codes = codes
+        # Float64 is exact for cent sums and counts below 2**53.
+        self.buckets = np.zeros((capacity, RING_DAYS, 3))
+        self.totals = np.zeros((capacity, len(SPANS), 3))
+        self.last_day: Optional[int] = None
+        # ring offset -> indices of the spans containing that day
+        self._members = None
+
+    def _ensure(self, code: int) -> None:
+        if code < len(self.buckets):
+            return
+        size = max(code + 1, 2 * len(self.buckets))
+        self.buckets = np.concatenate([self.buckets, np.zeros((size - len(self.buckets), RING_DAYS, 3))])
+        self.totals = np.concatenate([self.totals, np.zeros((size - len(self.totals), len(SPANS), 3))])
+
+    def _advance(self, day: int) -> None:
+        """Slides every span forward to end on `day`."""
+        n = min(len(self.codes), len(self.buckets))
+        if self.last_day is None or day - self.last_day >= RING_DAYS:
+            self.buckets[:] = 0.0
+            self.totals[:] = 0.0
+        else:
+            mtd = SPANS.index('month_to_date')
+            for step in range(self.last_day + 1, day + 1):
+                # The new day's slot last held a day older than every span.
+                self.buckets[:n, step % RING_DAYS] = 0.0
+                day_of_month = date.fromordinal(step).day
+                offsets, _ = span_layout(day_of_month)
+                for s, (first, last) in enumerate(offsets[:mtd]):
+                    self.totals[:n, s] -= self.buckets[:n, (step - last - 1) % RING_DAYS]
+                    if first:
+                        self.totals[:n, s] += self.buckets[:n, (step - first) % RING_DAYS]
+                if day_of_month == 1:
+                    self.totals[:n, mtd] = 0.0
+        self.last_day = day
+        self._members = span_layout(date.fromordinal(day).day)[1]
+
+    def add(self, code: int, cents: int, day: int) -> bool:
+        """Folds one purchase in; False if it is older than the ring."""
+        if self.last_day is None or day > self.last_day:
+            self._advance(day)
+        offset = self.last_day - day
+        if offset >= RING_DAYS:
+            return False
+        self._ensure(code)
+        value = (cents, 1.0, float(cents) * cents)
+        self.buckets[code, day % RING_DAYS] += value
+        self.totals[code, self._members[offset]] += value
+        return True
+
+    def window(self, span: str = 'month', stat: int = SUM) -> np.ndarray:
+        """`stat` of every key over a span, indexed by code."""
+        column = np.zeros(len(self.codes))
+        rows = min(len(self.codes), len(self.totals))
+        column[:rows] = self.totals[:rows, SPANS.index(span), stat]
+        return column
+
+    def stats(self, code: int, span: str = 'month') -> Dict:
+        """Sum, count, mean and population standard deviation (dollars) of one key over a span."""
+        if code >= len(self.totals):
+            total = count = sumsq = 0.0
+        else:
+            total, count, sumsq = self.totals[code, SPANS.index(span)]
+        mean = total / count if count else 0.0
+        variance = max(sumsq / count - mean * mean, 0.0) if count else 0.0
+        return {"sum": from_cents(total), "count": int(count), "mean": round(mean / 100.0, 2),
+                "std": round(float(np.sqrt(variance)) / 100.0, 2)}
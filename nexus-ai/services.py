@@ -61,57 +61,28 @@ def call_gemini(model: 'genai.GenerativeModel', prompt: str, max_retries: int =
 
 # --- UNIFIED AI LOGIC CORE ---
 
-def spending_insights_ai(model, transactions: list, previous_transactions: list = None) -> str:
-    """Analyzes spending patterns with enhanced contextual awareness."""
+def spending_insights_ai(model, category_totals: dict, top_increases: list) -> str:
+    """
+    Writes the one-sentence insight for spending aggregates computed locally
+    (see spending.py); the model never sees raw transactions.
+    """
     prompt = f"""
-    You are Nexus AI, a sharp and insightful financial analyst. Your task is to analyze a user's transaction data and provide clear, actionable insights.
+    You are Nexus AI, a sharp and insightful financial analyst. Write a single, non-generic, actionable insight about this user's spending.
+    For example, instead of "spend less," suggest "Your 'Takeout' spending is up 50%. Could you try cooking at home one more night a week?"
 
     **Instructions:**
-    1.  **<thinking>** In a thinking block, perform your analysis.
-        - Calculate the total spending for each category in the current period.
-        - If previous_transactions are available, compare the totals to identify the top 2 categories with the largest spending increase.
-        - Based on the data, formulate a single, non-generic, actionable insight to help the user. For example, instead of "spend less," suggest "Your 'Takeout' spending is up 50%. Could you try cooking at home one more night a week?"
-    2.  **</thinking>**
-    3.  **<answer>** In an answer block, provide ONLY a valid JSON object with the following structure. Do not add any other text.
-        ```json
-        {{
-          "category_totals": {{ "CategoryName": "TotalAmount" }},
-          "top_increases": [ {{ "category": "CategoryName", "increase_percentage": "Percentage" }} ],
-          "insight": "Your single, actionable insight here."
-        }}
-        ```
-    **</answer>**
-
-    **EXAMPLE:**
-    <thinking>
-    - Calculated total spending for each category.
-    - Compared to previous period, 'Dining Out' and 'Groceries' increased the most.
-    - Actionable insight: 'Dining Out' is up 40%. Suggest cooking at home more often.
-    </thinking>
-    <answer>
-    {{
-      "category_totals": {{"Dining Out": 320.50, "Groceries": 210.00, "Utilities": 90.00}},
-      "top_increases": [{{"category": "Dining Out", "increase_percentage": "40%"}}, {{"category": "Groceries", "increase_percentage": "20%"}}],
-      "insight": "Your 'Dining Out' spending is up 40% from last month. Try cooking at home one more night a week to save money."
-    }}
-    </answer>
+    - The totals and increases below are exact; quote them, do not recompute them.
+    - Return ONLY a valid JSON object of the form {{"insight": "Your single, actionable insight here."}}
 
     **DATA:**
-    - Current Transactions: {json.dumps(transactions)}
-    - Previous Period Transactions: {json.dumps(previous_transactions) if previous_transactions else "null"}
+    - Category totals this period: {json.dumps(category_totals)}
+    - Largest increases over the previous period: {json.dumps(top_increases)}
     """
-    logger.info("[spending_insights_ai] Prompt sent to Gemini:\n%s", prompt)
     result = call_gemini(model, prompt)
     logger.info("[spending_insights_ai] Raw Gemini response:\n%s", result)
-    # If Gemini returns empty or whitespace, return a default JSON string
     if not result or not result.strip():
         logger.error("Gemini returned empty string for spending insights. Returning default JSON.")
-        return json.dumps({
-            "error": "AI returned empty response.",
-            "category_totals": {},
-            "top_increases": [],
-            "insight": "No insight available."
-        })
+        return json.dumps({"error": "AI returned empty response.", "insight": "No insight available."})
     return result
 
 
@@ -374,4 +345,20 @@ def interestkiller_ai_re_explain(model, accounts: list, optimal_plan: dict, cust
     - User's Custom Split: {json.dumps(custom_split, indent=2)}
     - User Context: {json.dumps(user_context, indent=2)}
     """
-    return call_gemini(model, prompt) 
\ No newline at end of file
+    return call_gemini(model, prompt) 
+
+
+def categorize_merchants_ai(model, merchants: list, categories: list) -> str:
+    """Categorizes a deduplicated batch of normalized merchant names in one call."""
+    prompt = f"""
+    You are Nexus AI, a transaction classification engine. Assign each merchant below to exactly one category.
+
+    **Instructions:**
+    - Use ONLY these categories: {json.dumps(categories)}
+    - If a merchant cannot be identified with reasonable confidence, use "General".
+    - Return ONLY a valid JSON object of the form {{"categories": {{"merchant name": "category"}}}}, using the merchant names exactly as given.
+
+    **DATA:**
+    - Merchants: {json.dumps(merchants)}
+    """
+    return call_gemini(model, prompt)
@@ -0,0 +1,132 @@
+"""
+Monte Carlo comparison of card-selection policies.
+
+A simulated month is bootstrapped from the user's purchase history: the
+number of purchases is Poisson with the historical rate, and each purchase
+is resampled (amount and category together) from the history. Every policy
+is evaluated on the same simulated months, so their differences are not
+sampling noise. Each history row is scored against the portfolio once (via
+the CardRank engine); a simulation run is then plain indexing into those
+arrays, with all simulations handled as one (simulations x purchases)
+matrix.
+
+Policies: "recommended" (the CardRank winner for each purchase under the
+user's goal) and "single:<card_id>" for each card. Interest assumes the user
+pays `payoff_fraction` of each statement (user_context, default 1.0) and
+revolves the rest at the card's APR.
+"""
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from cardrank import enrich_merchant_category
+from cardrank_engine import compile_portfolio, category_indices, score_transactions
+from dates import parse_date
+
+DEFAULT_SIMULATIONS = 2000
+MAX_SIMULATIONS = 20000
+DEFAULT_DAYS = 30
+# Upper bound on simulations x purchases cells, which keeps a run well under a second.
+MAX_CELLS = 2_000_000
+PERCENTILES = (5, 50, 95)
+
+
+def _history(transactions: List[Dict]):
+    amounts, categories, days = [], [], []
+    for txn in transactions:
+        try:
+            amount = float(txn.get('amount'))
+        except (TypeError, ValueError):
+            continue
+        if not (math.isfinite(amount) and amount > 0):
+            continue
+        amounts.append(amount)
+        categories.append(enrich_merchant_category(txn))
+        day = parse_date(txn.get('date'))
+        if day is not None:
+            days.append(day)
+    return np.asarray(amounts, dtype=np.float64), categories, days
+
+
+def _summary(values: np.ndarray, digits: int = 2) -> Dict:
+    low, median, high = np.percentile(values, PERCENTILES)
+    return {"mean": round(float(values.mean()), digits), "p5": round(float(low), digits),
+            "p50": round(float(median), digits), "p95": round(float(high), digits)}
+
+
+def simulate_policies(user_cards: List[Dict], transactions: List[Dict], user_context: Optional[Dict] = None,
+                      n_simulations: int = DEFAULT_SIMULATIONS, days: int = DEFAULT_DAYS,
+                      seed: Optional[int] = None) -> Dict:
+    if not user_cards:
+        raise ValueError("No cards provided.")
+    if not 1 <= n_simulations <= MAX_SIMULATIONS:
+        raise ValueError(f"n_simulations must be between 1 and {MAX_SIMULATIONS}.")
+    if not 1 <= days <= 366:
+        raise ValueError("days must be between 1 and 366.")
+    user_context = user_context or {}
+    goal = user_context.get('primaryGoal', 'MINIMIZE_INTEREST_COST')
+    payoff_fraction = float(user_context.get('payoff_fraction', 1.0))
+    if not 0.0 <= payoff_fraction <= 1.0:
+        raise ValueError("payoff_fraction must be between 0 and 1.")
+
+    amounts, categories, history_days = _history(transactions)
+    if not len(amounts):
+        raise ValueError("No purchases in transaction history.")
+    span = (max(history_days) - min(history_days)).days + 1 if history_days else DEFAULT_DAYS
+    expected_purchases = len(amounts) / span * days
+
+    portfolio = compile_portfolio(user_cards)
+    scored = score_transactions(portfolio, category_indices(portfolio, categories), amounts, goal)
+    reward = scored['reward']  # history rows x cards
+    n_cards = len(user_cards)
+    policies = {"recommended": scored['best']}
+    for c, card_id in enumerate(portfolio['ids']):
+        policies[f"single:{card_id}"] = np.full(len(amounts), c)
+
+    requested = n_simulations
+    rng = np.random.default_rng(seed)
+    counts = rng.poisson(expected_purchases, size=n_simulations)
+    width = max(int(counts.max()), 1)
+    # Long histories cap the run; the response reports both counts.
+    if n_simulations * width > MAX_CELLS:
+        n_simulations = max(MAX_CELLS // width, 1)
+        counts = counts[:n_simulations]
+    rows = rng.integers(0, len(amounts), size=(n_simulations, width))
+    mask = np.arange(width)[None, :] < counts[:, None]
+    spent = np.where(mask, amounts[rows], 0.0)
+    sim_ids = np.broadcast_to(np.arange(n_simulations)[:, None], rows.shape)
+
+    balance, limit = portfolio['balance'], portfolio['credit_limit']
+    monthly_rate = portfolio['apr'] / 100.0 / 12.0 * (1.0 - payoff_fraction)
+    results, recommended_net = {}, None
+    for name, choice in policies.items():
+        cards = choice[rows]
+        month_reward = np.where(mask, reward[rows, cards], 0.0).sum(axis=1)
+        card_spend = np.bincount((sim_ids * n_cards + cards)[mask], weights=spent[mask],
+                                 minlength=n_simulations * n_cards).reshape(n_simulations, n_cards)
+        statement = balance[None, :] + card_spend
+        interest = (statement * monthly_rate[None, :]).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            card_utilization = np.where(limit[None, :] > 0, statement / limit[None, :], 0.0)
+        total_limit = limit.sum()
+        utilization = statement.sum(axis=1) / total_limit if total_limit > 0 else np.zeros(n_simulations)
+        net = month_reward - interest
+        if recommended_net is None:
+            recommended_net = net
+        results[name] = {
+            "rewards": _summary(month_reward),
+            "interest": _summary(interest),
+            "net_value": _summary(net),
+            "utilization": _summary(utilization, 4),
+            "max_card_utilization": _summary(card_utilization.max(axis=1), 4),
+            "beats_recommended": round(float((net > recommended_net).mean()), 4),
+        }
+    return {
+        "simulations": n_simulations,
+        "requested_simulations": requested,
+        "days": days,
+        "expected_purchases": round(expected_purchases, 2),
+        "expected_spend": round(float(spent.sum(axis=1).mean()), 2),
+        "policies": results,
+    }
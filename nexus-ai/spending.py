@@ -0,0 +1,210 @@
+"""
+Deterministic spending aggregation for /v2/spending-insights.
+
+Category totals and period-over-period increases are computed locally: the
+transactions become an int64 cents column and an integer category-code
+column (categories interned once per request), and the group-by is a single
+`np.bincount`. Both periods share one code table, so their totals line up
+as arrays. Only the one-sentence insight is left to the LLM, which receives
+these aggregates instead of the raw transactions.
+
+`SpendingAccumulator` folds rows in as they are parsed (see ingest.py), so
+a streamed request body is aggregated without ever being held in memory.
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from cardrank import enrich_merchant_category
+from categorize import merchant_of
+from dates import parse_date
+from ingest import TransactionColumns, purchase_amount
+from merchant_normalize import normalize_merchant
+from money import from_cents
+
+TOP_INCREASES = 2
+AGGREGATION_BATCH = 4096
+DEFAULT_PERIOD_DAYS = 30
+CURRENT, PREVIOUS = 'transactions', 'previous_transactions'
+PERIODS = (CURRENT, PREVIOUS)
+
+
+def transaction_category(txn: Dict) -> str:
+    """The caller's category (first level of a Plaid list), else the merchant index."""
+    category = txn.get('category')
+    if isinstance(category, list):
+        category = category[0] if category else None
+    if isinstance(category, str) and category.strip():
+        return category.strip()
+    return enrich_merchant_category(txn)
+
+
+def category_totals_cents(cents: np.ndarray, category_codes: np.ndarray, size: int) -> np.ndarray:
+    # bincount weights are float64, exact for cent sums below 2**53
+    return np.rint(np.bincount(category_codes, weights=cents, minlength=size)).astype(np.int64)
+
+
+def summarize_totals(names: List[str], current: np.ndarray, previous: Optional[np.ndarray] = None,
+                     top_n: int = TOP_INCREASES) -> Dict:
+    """`category_totals` (largest first) and the `top_n` largest percentage increases."""
+    order = np.argsort(-current, kind='stable')
+    totals = {names[i]: from_cents(current[i]) for i in order if current[i] > 0}
+    increases = []
+    if previous is not None:
+        previous = np.pad(previous, (0, len(current) - len(previous)))
+        grew = np.flatnonzero((previous > 0) & (current > previous))
+        percent = (current[grew] - previous[grew]) / previous[grew] * 100.0
+        for j in np.argsort(-percent, kind='stable')[:top_n]:
+            i = grew[j]
+            increases.append({"category": names[i], "increase_percentage": f"{percent[j]:.0f}%",
+                              "previous_total": from_cents(previous[i]), "current_total": from_cents(current[i])})
+    return {"category_totals": totals, "top_increases": increases}
+
+
+class SpendingAccumulator:
+    """
+    Running per-category totals for the current and previous period. Rows
+    are packed into a fixed-size column batch and folded into the totals
+    with one bincount whenever it fills, so memory does not grow with the
+    number of transactions.
+    """
+
+    def __init__(self, batch_size: int = AGGREGATION_BATCH):
+        self.batch_size = batch_size
+        self.categories: Dict[str, int] = {}
+        self._pending = {period: TransactionColumns(batch_size, self.categories) for period in PERIODS}
+        self._totals = {period: np.zeros(0, dtype=np.int64) for period in PERIODS}
+        self.seen = {period: 0 for period in PERIODS}
+
+    def add(self, txn: Dict, period: str = CURRENT) -> None:
+        self.seen[period] += 1
+        amount = purchase_amount(txn) if isinstance(txn, dict) else None
+        if amount is None:
+            return
+        pending = self._pending[period]
+        pending.append(amount, transaction_category(txn))
+        if len(pending) >= self.batch_size:
+            self._flush(period)
+
+    def _flush(self, period: str) -> None:
+        pending = self._pending[period]
+        columns = pending.columns()
+        totals = np.pad(self._totals[period], (0, len(self.categories) - len(self._totals[period])))
+        self._totals[period] = totals + category_totals_cents(columns["cents"], columns["category"], len(self.categories))
+        pending.clear()
+
+    def result(self, top_n: int = TOP_INCREASES) -> Dict:
+        for period in PERIODS:
+            self._flush(period)
+        current = np.pad(self._totals[CURRENT], (0, len(self.categories) - len(self._totals[CURRENT])))
+        previous = self._totals[PREVIOUS] if self.seen[PREVIOUS] else None
+        return summarize_totals(list(self.categories), current, previous, top_n)
+
+
+def spending_aggregates(transactions: List[Dict], previous_transactions: Optional[List[Dict]] = None,
+                        top_n: int = TOP_INCREASES) -> Dict:
+    accumulator = SpendingAccumulator()
+    for txn in transactions:
+        accumulator.add(txn)
+    for txn in previous_transactions or []:
+        accumulator.add(txn, PREVIOUS)
+    return accumulator.result(top_n)
+
+
+def purchase_columns(transactions: List[Dict], amount_of=purchase_amount):
+    """
+    Dated purchases of a request's transaction list as TransactionColumns
+    (merchants normalized), and each row's id (or list index). `amount_of`
+    picks and signs the rows to keep.
+    """
+    buffer = TransactionColumns(max(len(transactions), 1))
+    ids = []
+    for i, txn in enumerate(transactions):
+        if not isinstance(txn, dict):
+            continue
+        amount, day = amount_of(txn), parse_date(txn.get('date'))
+        if amount is None or day is None:
+            continue
+        buffer.append(amount, transaction_category(txn), normalize_merchant(merchant_of(txn)), day)
+        ids.append(txn.get('id') or txn.get('transaction_id') or i)
+    return buffer, ids
+
+
+def window_totals(columns: Dict[str, np.ndarray], size: int, first_day: int, last_day: int) -> np.ndarray:
+    """Per-category purchase cents for day ordinals in [first_day, last_day]."""
+    day, cents = columns["day"], columns["cents"]
+    mask = (day >= first_day) & (day <= last_day) & (cents > 0)
+    return category_totals_cents(cents[mask], columns["category"][mask], size)
+
+
+def stored_aggregates(history, period_days: int = DEFAULT_PERIOD_DAYS, top_n: int = TOP_INCREASES) -> Dict:
+    """
+    Aggregates over a stored history (transaction_store.py): the last
+    `period_days` up to its latest purchase, against the window before.
+    """
+    columns = history.columns()
+    names = list(history.category_codes)
+    purchase_days = columns["day"][columns["cents"] > 0]
+    if not len(purchase_days):
+        return summarize_totals(names, np.zeros(len(names), dtype=np.int64), None, top_n)
+    last = int(purchase_days.max())
+    current = window_totals(columns, len(names), last - period_days + 1, last)
+    previous = window_totals(columns, len(names), last - 2 * period_days + 1, last - period_days)
+    return summarize_totals(names, current, previous if previous.any() else None, top_n)
+
+
+def budget_health(user_budget: Dict, spent: Dict[str, float]) -> Dict:
+    """
+    Budget adherence: 100 when every category is on or under budget, minus
+    the share of the total budget that was overspent.
+    """
+    spent_by_key = {}
+    for category, amount in spent.items():
+        key = category.lower()
+        spent_by_key[key] = spent_by_key.get(key, 0.0) + amount
+    categories, total_budget, overspent = [], 0.0, 0.0
+    for category, limit in user_budget.items():
+        try:
+            limit = float(limit)
+        except (TypeError, ValueError):
+            continue
+        used = round(spent_by_key.get(category.lower(), 0.0), 2)
+        over = max(round(used - limit, 2), 0.0)
+        total_budget += max(limit, 0.0)
+        overspent += over
+        categories.append({"category": category, "budget": limit, "spent": used, "over": over})
+    score = 100 if total_budget <= 0 else int(round(100 * max(0.0, 1 - overspent / total_budget)))
+    over_budget = [row["category"] for row in categories if row["over"] > 0]
+    if over_budget:
+        insights = f"Over budget in {', '.join(over_budget)}."
+    else:
+        insights = f"On or under budget in all {len(categories)} categories. Keep tracking expenses."
+    return {"score": score, "insights": insights, "categories": categories, "over_budget": over_budget}
+
+
+def rolling_aggregates(history, top_n: int = TOP_INCREASES) -> Dict:
+    """`stored_aggregates` for a 30-day period, read from the history's rolling windows."""
+    current = np.rint(history.categories.window('month')).astype(np.int64)
+    previous = np.rint(history.categories.window('previous_month')).astype(np.int64)
+    return summarize_totals(list(history.category_codes), current, previous if previous.any() else None, top_n)
+
+
+def month_to_date_spend(history) -> Dict[str, float]:
+    """Purchase dollars per category in the calendar month of the latest stored purchase."""
+    totals = history.categories.window('month_to_date')
+    return {name: from_cents(totals[i]) for i, name in enumerate(history.category_codes) if totals[i] > 0}
+
+
+def purchase_velocity(columns: Dict[str, np.ndarray], days: int = DEFAULT_PERIOD_DAYS) -> float:
+    """Average daily purchase dollars over the last `days` up to the latest purchase."""
+    purchase_days = columns["day"][columns["cents"] > 0]
+    if not len(purchase_days):
+        return 0.0
+    last = int(purchase_days.max())
+    totals = window_totals(columns, int(columns["category"].max()) + 1, last - days + 1, last)
+    return round(from_cents(int(totals.sum())) / days, 2)
+
+
+def spending_velocity(history) -> float:
+    """Average daily purchase dollars over the trailing 30 days of a stored history."""
+    return round(from_cents(history.categories.window('month').sum()) / DEFAULT_PERIOD_DAYS, 2)
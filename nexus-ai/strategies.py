@@ -0,0 +1,102 @@
+"""
+Pluggable payment-strategy registry.
+
+A strategy is either a *ranking* rule (a tuple of feature columns; the top
+card gets the power payment and everyone else their minimum) or an
+*allocation* rule (a function returning a cents split). All strategies read
+the same feature table, which is built once per request, so adding a plan
+costs one sort over a handful of arrays instead of another walk over the
+account dicts.
+"""
+from datetime import date
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from dates import parse_date
+from money import to_cents, to_bps, accrue_interest_cents, allocate_cents, allocate_power_payment
+
+STRATEGIES: Dict[str, Dict] = {}
+NO_PROMO_EXPIRY = date(9999, 12, 31)
+
+
+def register_strategy(name: str, label: str, rank: Optional[Callable] = None,
+                      allocate: Optional[Callable] = None) -> None:
+    """
+    Registers a strategy under `name`.
+
+    `rank(features)` returns sort keys, most significant first; the card
+    that sorts highest becomes the power-payment target. `allocate(features,
+    discretionary_cents)` returns an int64 cents array summing to the
+    discretionary amount. Exactly one of the two must be given.
+    """
+    if (rank is None) == (allocate is None):
+        raise ValueError("A strategy needs exactly one of `rank` or `allocate`.")
+    STRATEGIES[name] = {"name": name, "label": label, "rank": rank, "allocate": allocate}
+
+
+def build_feature_table(cards: List[Dict]) -> Dict[str, np.ndarray]:
+    """
+    Precomputes every column the registered strategies rank on. Cards must
+    already carry the triage fields (`balance_cents`, `minimum_payment_cents`,
+    `utilization_percent`) set in Phase 1 of the planner.
+    """
+    n = len(cards)
+    balance = np.array([c['balance_cents'] for c in cards], dtype=np.int64)
+    apr = to_bps([c.get('apr', 0) for c in cards])
+    limit = to_cents([c.get('creditLimit', 0) for c in cards])
+    _, id_rank = np.unique(np.array([str(c['id']) for c in cards]), return_inverse=True)
+    expiry = [parse_date(c.get('promo_apr_expiry_date')) for c in cards]
+    return {
+        "balance": balance,
+        "apr": apr,
+        "limit": limit,
+        "minimum": np.array([c['minimum_payment_cents'] for c in cards], dtype=np.int64),
+        "utilization": np.array([c.get('utilization_percent', 0) for c in cards], dtype=np.float64),
+        "monthly_interest": accrue_interest_cents(balance, apr),
+        # Unparseable expiry dates count as no promo at all.
+        "has_promo": np.array([day is not None for day in expiry], dtype=np.int64),
+        "promo_expiry": np.array([day or NO_PROMO_EXPIRY for day in expiry], dtype='datetime64[D]').astype(np.int64),
+        "id_rank": id_rank.astype(np.int64),
+        # Ties on every key go to the earliest card, like Python's max().
+        "position": -np.arange(n, dtype=np.int64),
+    }
+
+
+def evaluate_strategies(features: Dict[str, np.ndarray], discretionary_cents: int,
+                        names: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """
+    Evaluates the requested (default: all) strategies over one feature table.
+    Returns `{name: {"amounts": cents array, "target": index or None}}`.
+    """
+    results = {}
+    for name in names or list(STRATEGIES):
+        strategy = STRATEGIES[name]
+        if strategy["rank"] is not None:
+            keys = tuple(strategy["rank"](features)) + (features["id_rank"], features["position"])
+            # np.lexsort treats the last key as primary, so reverse ours.
+            target = int(np.lexsort(keys[::-1])[-1])
+            amounts = allocate_power_payment(discretionary_cents, features["minimum"], target)
+        else:
+            target = None
+            amounts = strategy["allocate"](features, discretionary_cents)
+        results[name] = {"amounts": amounts, "target": target}
+    return results
+
+
+# --- Built-in strategies ---
+def _proportional(features: Dict[str, np.ndarray], discretionary_cents: int) -> np.ndarray:
+    # Minimums first, then the surplus pro rata to what is still owed.
+    minimum = features["minimum"]
+    surplus = discretionary_cents - int(minimum.sum())
+    if surplus <= 0:
+        return allocate_cents(discretionary_cents, minimum)
+    return minimum + allocate_cents(surplus, np.maximum(features["balance"] - minimum, 0))
+
+
+register_strategy("avalanche", "Avalanche Method", rank=lambda f: (f["apr"], f["balance"]))
+register_strategy("score_booster", "Credit Score Booster", rank=lambda f: (f["utilization"], f["balance"]))
+register_strategy("snowball", "Snowball Method", rank=lambda f: (-f["balance"], f["apr"]))
+register_strategy("highest_interest_dollars", "Highest Interest Dollars", rank=lambda f: (f["monthly_interest"], f["apr"]))
+register_strategy("promo_first", "Promo Expiry First", rank=lambda f: (f["has_promo"], -f["promo_expiry"], f["balance"]))
+register_strategy("proportional", "Proportional Split", allocate=_proportional)
@@ -0,0 +1,96 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from datetime import date, timedelta
+import numpy as np
+from anomalies import anomaly_report, check_transaction, group_median
+from transaction_store import TransactionStore
+
+def _history(start=date(2024, 1, 1), days=120):
+    rows = []
+    for d in range(0, days, 3):
+        day = (start + timedelta(days=d)).isoformat()
+        rows.append({"id": f"c{d}", "date": day, "amount": 4.5 + (d % 4) * 0.25, "merchantName": "BLUE BOTTLE COFFEE", "category": "Dining"})
+        rows.append({"id": f"g{d}", "date": day, "amount": round(60.0 + d * 0.13, 2), "merchantName": "SAFEWAY #1234", "category": "Groceries"})
+    return rows
+
+def _types(report, txn_id):
+    return [[r["type"] for r in a["reasons"]] for a in report["anomalies"] if a["id"] == txn_id]
+
+def test_group_median_matches_numpy():
+    rng = np.random.default_rng(3)
+    keys, values = rng.integers(0, 9, 500), rng.normal(size=500)
+    median, counts = group_median(keys, values, 10)
+    for k in range(9):
+        assert np.isclose(median[k], np.median(values[keys == k]))
+    assert counts[9] == 0 and median[9] == 0
+
+def test_flags_outliers_duplicates_and_new_merchants():
+    rows = _history() + [
+        {"id": "spike", "date": "2024-03-02", "amount": 38.0, "merchantName": "BLUE BOTTLE COFFEE", "category": "Dining"},
+        {"id": "dup", "date": "2024-01-05", "amount": 60.39, "merchantName": "SAFEWAY #1234", "category": "Groceries"},
+        {"id": "new", "date": "2024-04-10", "amount": 900.0, "merchantName": "LUXE JEWELERS", "category": "Shopping"},
+        {"id": "refund", "date": "2024-02-01", "amount": -500.0, "merchantName": "SAFEWAY #1234"},
+    ]
+    report = anomaly_report(rows)
+    assert _types(report, "spike") == [["amount_vs_merchant"]]
+    assert _types(report, "dup") == [["duplicate_charge"]]
+    assert report["anomalies"][[a["id"] for a in report["anomalies"]].index("dup")]["reasons"][0]["duplicate_of"] == "g3"
+    assert _types(report, "new") == [["new_high_value_merchant"]]
+    assert report["checked"] == len(rows) - 1
+    assert {a["id"] for a in report["anomalies"]} == {"spike", "dup", "new"}
+
+def test_habitual_repeat_charges_are_not_duplicates():
+    rows = [{"id": f"s{d}", "date": (date(2024, 1, 1) + timedelta(days=d)).isoformat(), "amount": 3.0,
+             "merchantName": "MTA SUBWAY"} for d in range(10)]
+    assert anomaly_report(rows)["anomalies"] == []
+
+def test_seasonal_baseline_needs_two_years():
+    rows = []
+    for year in (2022, 2023):
+        for d in range(0, 365, 5):
+            day = date(year, 1, 1) + timedelta(days=d)
+            amount = 400.0 if day.month == 12 else 40.0  # December gift shopping
+            rows.append({"id": f"{year}-{d}", "date": day.isoformat(), "amount": amount + d % 3, "category": "Shopping",
+                         "merchantName": f"STORE {d}"})
+    report = anomaly_report(rows)
+    assert not any(a["date"].startswith("2023-12") for a in report["anomalies"])
+    single_year = anomaly_report([r for r in rows if r["date"].startswith("2023")])
+    assert any(a["date"].startswith("2023-12") for a in single_year["anomalies"])
+
+def test_streaming_check_against_stored_baselines():
+    store = TransactionStore()
+    store.ingest("u1", _history())
+    history = store.get("u1")
+    spike = {"id": "x1", "date": "2024-05-01", "amount": 40.0, "merchantName": "BLUE BOTTLE COFFEE", "category": "Dining"}
+    result = check_transaction("u1", history, spike)
+    assert result["anomalous"] and result["reasons"][0]["type"] == "amount_vs_merchant"
+    normal = dict(spike, amount=5.0)
+    assert not check_transaction("u1", history, normal)["anomalous"]
+    last = history.row_ids[-1]
+    repeat = {"date": "2024-04-28", "amount": round(60.0 + 117 * 0.13, 2), "merchantName": "SAFEWAY #1234", "category": "Groceries"}
+    assert check_transaction("u1", history, repeat)["reasons"] == [{"type": "duplicate_charge", "duplicate_of": last}]
+
+def test_cached_baselines_are_not_reused_after_a_resync():
+    day = date(2024, 1, 1)
+    coffee = [{"id": f"c{d}", "date": (day + timedelta(days=d)).isoformat(), "amount": 5.25,
+               "merchantName": "COFFEE CART", "category": "Dining"} for d in range(8)]
+    furniture = [{"id": f"f{d}", "date": (day + timedelta(days=d)).isoformat(), "amount": 450.0 + d * 10,
+                  "merchantName": "FURNITURE BARN", "category": "Home"} for d in range(8)]
+    store = TransactionStore(maxsize=1)
+    store.ingest("u1", coffee + furniture)
+    check_transaction("u1", store.get("u1"), dict(coffee[0], id="x"))  # caches baselines
+    store.ingest("u2", coffee)  # evicts u1
+    store.ingest("u1", furniture + coffee)  # resync interns the merchants in the other order
+    charge = dict(furniture[0], id="y", date="2024-01-20", amount=480.0)
+    assert not check_transaction("u1", store.get("u1"), charge)["anomalous"]
+
+def test_streaming_check_counts_habits_like_the_report():
+    rows = [{"id": f"s{d}", "date": (date(2024, 1, 1) + timedelta(days=d)).isoformat(), "amount": 3.0,
+             "merchantName": "MTA SUBWAY", "category": "Transit"} for d in range(3)]
+    fourth = dict(rows[-1], id="s3")
+    store = TransactionStore()
+    store.ingest("u1", rows)
+    # Stored, this would be the fourth identical charge: a habit in anomaly_report too.
+    assert not check_transaction("u1", store.get("u1"), fourth)["anomalous"]
+    assert anomaly_report(rows + [fourth])["anomalies"] == []
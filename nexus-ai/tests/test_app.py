@@ -2,6 +2,7 @@ import pytest
 from fastapi.testclient import TestClient
 import sys
 import os
+import json
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from app import app
 
@@ -73,4 +74,289 @@ def test_nextsmartmove_v2():
     data = response.json()
     assert "move" in data
     assert "title" in data["move"]
-    assert "description" in data["move"] 
\ No newline at end of file
+    assert "description" in data["move"] 
+
+
+def test_interestkiller_timing_v2():
+    payload = {
+        "accounts": [
+            {"id": "card1", "name": "Card One", "balance": 2500.0, "apr": 24.99, "creditLimit": 5000.0, "statement_close_day": 10},
+            {"id": "card2", "name": "Card Two", "balance": 900.0, "apr": 17.99, "creditLimit": 1000.0, "statement_close_day": 28, "due_date": "2026-10-25"}
+        ],
+        "paycheck_schedule": {"next_date": "2026-10-24", "cadence": "biweekly", "amount": 400.0},
+        "starting_cash": 300.0,
+        "start_date": "2026-10-19"
+    }
+    response = client.post("/v2/interestkiller/timing", json=payload)
+    assert response.status_code == 200
+    data = response.json()
+    assert all(card["minimum_met"] for card in data["cards"])
+    assert data["reported_utilization_percent"] < data["current_utilization_percent"]
+    # Nothing is scheduled after a card's statement has already cut for paydown.
+    closes = {card["card_id"]: card["statement_close_date"] for card in data["cards"]}
+    for item in data["schedule"]:
+        if item["purpose"] == "Utilization Paydown":
+            assert item["date"] < closes[item["card_id"]]
+    payload["paycheck_schedule"]["cadence"] = "annual"
+    assert client.post("/v2/interestkiller/timing", json=payload).status_code == 400
+
+def test_interestkiller_v2_memoizes_by_fingerprint(monkeypatch):
+    import app as app_module
+    calls = []
+    def fake_ai(model, plan_data, user_context):
+        calls.append(plan_data)
+        return json.dumps({
+            "nexus_recommendation": "Avalanche Method",
+            "minimize_interest_explanation": "x", "minimize_interest_projection": "x",
+            "maximize_score_explanation": "x", "maximize_score_projection": "x"
+        })
+    monkeypatch.setattr(app_module, "interestkiller_ai_hybrid", fake_ai)
+    app.state.gemini_model = None
+    payload = {
+        "accounts": [
+            {"id": "fp1", "name": "Card One", "balance": 1000.0, "apr": 24.99, "creditLimit": 5000.0},
+            {"id": "fp2", "name": "Card Two", "balance": 500.0, "apr": 17.99, "creditLimit": 3000.0}
+        ],
+        "payment_amount": 300.0,
+        "user_context": {"primary_goal": "MINIMIZE_INTEREST_COST"}
+    }
+    first = client.post("/v2/interestkiller", json=payload)
+    assert first.status_code == 200
+    fingerprint = first.json()["fingerprint"]
+    again = client.post("/v2/interestkiller", json={"fingerprint": fingerprint})
+    assert again.status_code == 200
+    assert again.json() == first.json()
+    assert len(calls) == 1
+    unknown = client.post("/v2/interestkiller", json={"fingerprint": "does-not-exist"})
+    assert unknown.status_code == 409
+    for partial in ({}, {"accounts": [], "payment_amount": 10}):
+        malformed = client.post("/v2/interestkiller", json=partial)
+        assert malformed.status_code == 422
+        assert "user_context" in malformed.json()["error"]["detail"]
+    assert client.get("/v2/cache/stats").json()["interestkiller_plans"]["hits"] >= 1
+
+def test_cardrank_missed_rewards_v2():
+    payload = {
+        "user_cards": [
+            {"id": "dining", "name": "Dining Card", "rewards": {"dining": 4.0, "default": 1.0}, "point_value_cents": 1.0, "balance": 0, "creditLimit": 5000},
+            {"id": "flat", "name": "Flat 2%", "rewards": {"default": 2.0}, "point_value_cents": 1.0, "balance": 0, "creditLimit": 5000}
+        ],
+        "transactions": [
+            {"date": "2025-06-03", "amount": 100.0, "merchantName": "Cafe", "category": "dining", "card_id": "flat"},
+            {"date": "2025-06-09", "amount": 50.0, "merchantName": "Target", "category": "shopping", "card_id": "dining"},
+            {"date": "2025-07-01", "amount": 80.0, "merchantName": "Cafe", "category": "dining", "card_id": "dining"},
+            {"date": "2025-07-02", "amount": -20.0, "merchantName": "Refund", "category": "dining", "card_id": "flat"},
+            {"date": "2025-07-03", "amount": "n/a", "merchantName": "Cafe", "category": "dining", "card_id": "flat"},
+            {"date": "2025-07-04", "amount": None, "merchantName": "Cafe", "category": "dining", "card_id": "flat"}
+        ]
+    }
+    response = client.post("/v2/cardrank/missed-rewards", json=payload)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["transactions_analyzed"] == 3
+    # $2 missed on dining via the flat card, $0.50 on shopping via the dining card
+    assert data["total_missed"] == 2.5
+    assert data["by_month"][0] == {"month": "2025-06", "missed": 2.5, "earned": 2.5, "transactions": 2}
+    assert data["by_category"][0]["category"] == "dining"
+
+def test_categorize_v2_streams_ndjson(monkeypatch):
+    import app as app_module
+    batches = []
+    def fake_ai(model, merchants, categories):
+        batches.append(list(merchants))
+        return json.dumps({"categories": {m: "shopping" for m in merchants}})
+    monkeypatch.setattr(app_module, "categorize_merchants_ai", fake_ai)
+    app.state.gemini_model = object()
+    lines = [
+        {"id": "t1", "amount": 7.50, "merchantName": "STARBUCKS 123"},
+        {"id": "t2", "amount": 19.99, "merchantName": "ZZQX TRADERS #4"},
+        {"id": "t3", "amount": 5.00, "merchantName": "ZZQX TRADERS #9"},
+        {"id": "t4", "amount": 3.00, "merchantName": "Corner Kiosk", "category": ["Food and Drink"]},
+    ]
+    body = "\n".join(json.dumps(line) for line in lines) + "\nnot json\n"
+    # Reading the request body while streaming once deadlocked; fail instead of hanging.
+    import threading
+    responses = []
+    worker = threading.Thread(target=lambda: responses.append(
+        client.post("/v2/categorize", content=body, headers={"content-type": "application/x-ndjson"})), daemon=True)
+    worker.start()
+    worker.join(timeout=10)
+    app.state.gemini_model = None
+    assert responses, "NDJSON request did not complete"
+    response = responses[0]
+    assert response.status_code == 200
+    results = {r.get("id"): r for r in map(json.loads, response.text.strip().split("\n"))}
+    assert results["t1"]["category"] == "dining" and results["t1"]["source"] == "index"
+    assert results["t2"]["category"] == results["t3"]["category"] == "shopping"
+    assert batches == [["zzqx traders", "corner kiosk"]]
+    assert results[None]["error"].startswith("Invalid JSON")
+    # JSON body works too, and the AI answer is now cached
+    again = client.post("/v2/categorize", json={"transactions": lines[1:2]})
+    assert json.loads(again.text)["source"] == "ai"
+    assert len(batches) == 1
+
+def test_cardrank_swipe_v2():
+    payload = {
+        "user_id": "swipe-user",
+        "user_cards": [
+            {"id": "dining", "name": "Dining Card", "rewards": {"dining": 4.0, "default": 1.0}, "point_value_cents": 1.0, "balance": 0, "creditLimit": 5000},
+            {"id": "flat", "name": "Flat 2%", "rewards": {"default": 2.0}, "point_value_cents": 1.0, "balance": 0, "creditLimit": 5000}
+        ],
+        "transaction_context": {"merchantName": "STARBUCKS 123", "amount": 25.0},
+        "user_context": {"primaryGoal": "MAXIMIZE_CASHBACK"}
+    }
+    data = client.post("/v2/cardrank/swipe", json=payload).json()
+    assert data["recommended_card"]["id"] == "dining"
+    assert data["runner_up_card_id"] == "flat"
+    assert data["source"] == "table"
+    assert data["reward_value_usd"] == 1.0
+    payload["transaction_context"]["amount"] = 4900.0  # would push the dining card past 90% utilization
+    assert client.post("/v2/cardrank/swipe", json=payload).json()["source"] == "engine"
+
+def test_cardrank_swipe_v2_abroad_avoids_foreign_fees():
+    payload = {
+        "user_id": "swipe-abroad",
+        "user_cards": [
+            {"id": "fee", "name": "Fee Card", "rewards": {"default": 2.0}, "point_value_cents": 1.0, "balance": 0,
+             "creditLimit": 5000, "foreign_transaction_fee_percent": 3},
+            {"id": "nofx", "name": "No FX", "rewards": {"default": 1.0}, "point_value_cents": 1.0, "balance": 0, "creditLimit": 5000}
+        ],
+        "transaction_context": {"merchantName": "Boulangerie", "amount": 50.0, "location": "Paris, France"},
+        "user_context": {"primaryGoal": "MAXIMIZE_CASHBACK"}
+    }
+    data = client.post("/v2/cardrank/swipe", json=payload).json()
+    assert data["recommended_card"]["id"] == "nofx"
+    assert data["country"] == "FR"
+    assert data["source"] == "engine"
+    payload["transaction_context"]["location"] = "Austin, TX"
+    assert client.post("/v2/cardrank/swipe", json=payload).json()["recommended_card"]["id"] == "fee"
+
+def test_cardrank_summary_ranking_and_lazy_why_not():
+    cards = [
+        {"id": f"card{i}", "name": f"Card {i}", "rewards": {"dining": float(i), "default": 1.0}, "point_value_cents": 1.0,
+         "balance": 0, "creditLimit": 5000, "apr": 20.0, "utilization": 0.0}
+        for i in range(1, 6)
+    ]
+    payload = {"user_cards": cards, "transaction_context": {"merchantName": "Cafe", "category": "dining", "amount": 10.0},
+               "user_context": {"primaryGoal": "MAXIMIZE_CASHBACK"}, "top_k": 2, "detail_level": "summary"}
+    data = client.post("/v2/cardrank", json=payload).json()
+    assert "why_not" not in data
+    assert [r["card_id"] for r in data["ranking"]] == ["card5", "card4"]
+    assert data["ranking"][1]["margin"] > 0
+    detail = client.post("/v2/cardrank/why-not", json={"ranking_id": data["ranking_id"], "card_id": "card1"}).json()
+    assert detail["details"][0] == "Category match: dining x1.0"
+    assert detail["reason"].startswith("Not chosen because")
+    assert client.post("/v2/cardrank/why-not", json={"ranking_id": "nope", "card_id": "card1"}).status_code == 404
+    payload["detail_level"] = "verbose"
+    assert client.post("/v2/cardrank", json=payload).status_code == 400
+
+def test_spending_insights_v2_aggregates_locally(monkeypatch):
+    import app as app_module
+    seen = {}
+    def fake_insight(model, category_totals, top_increases):
+        seen["args"] = (category_totals, top_increases)
+        return '{"insight": "Dining is up 50%."}'
+    monkeypatch.setattr(app_module, "spending_insights_ai", fake_insight)
+    payload = {"transactions": [{"amount": 30.0, "category": "Dining"}, {"amount": 10.0, "category": "Gas"}],
+               "previous_transactions": [{"amount": 20.0, "category": "Dining"}]}
+    data = client.post("/v2/spending-insights", json=payload).json()
+    assert data["category_totals"] == {"Dining": 30.0, "Gas": 10.0}
+    assert data["top_increases"][0]["increase_percentage"] == "50%"
+    assert data["insight"] == "Dining is up 50%."
+    assert seen["args"] == (data["category_totals"], data["top_increases"])
+    monkeypatch.setattr(app_module, "spending_insights_ai", lambda *args: "not json")
+    data = client.post("/v2/spending-insights", json=payload).json()
+    assert data["category_totals"]["Dining"] == 30.0
+    assert data["insight"] == "No insight available."
+
+def test_spending_insights_v2_streams_ndjson(monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, "spending_insights_ai", lambda *args: '{"insight": "ok"}')
+    body = "".join(json.dumps({"amount": 2.5, "category": "Dining"}) + "\n" for _ in range(1000))
+    response = client.post("/v2/spending-insights", content=body, headers={"content-type": "application/x-ndjson"})
+    assert response.json()["category_totals"] == {"Dining": 2500.0}
+    bad = client.post("/v2/spending-insights", content=b'{"transactions": [{"amount": 1}', headers={"content-type": "application/json"})
+    assert bad.status_code == 400
+
+def test_transaction_store_cursor_sync(monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, "spending_insights_ai", lambda *args: '{"insight": "ok"}')
+    rows = [{"id": f"s{i}", "date": f"2025-03-{i + 1:02d}", "amount": 10.0, "category": "Dining"} for i in range(20)]
+    body = "".join(json.dumps(row) + "\n" for row in rows)
+    synced = client.post("/v2/transactions/ingest?user_id=store-test", content=body,
+                         headers={"content-type": "application/x-ndjson"}).json()
+    assert synced == {"user_id": "store-test", "cursor": 20, "added": 20, "duplicates": 0, "invalid": 0}
+    new = [{"id": "s20", "date": "2025-03-21", "amount": 50.0, "category": "Gas"}]
+    data = client.post("/v2/spending-insights?user_id=store-test&cursor=20", json={"transactions": new}).json()
+    assert data["category_totals"] == {"Dining": 200.0, "Gas": 50.0}
+    assert data["cursor"] == 21
+    stale = client.post("/v2/spending-insights?user_id=store-test&cursor=99", json=[])
+    assert stale.status_code == 409
+    health = client.post("/v2/budget-health", json={"user_budget": {"Dining": 100}, "user_id": "store-test", "cursor": 21}).json()
+    assert health["result"]["score"] == 0 and health["result"]["over_budget"] == ["Dining"]
+    assert client.post("/v2/budget-health", json={"user_budget": {}, "user_id": "nobody"}).status_code == 409
+
+def test_transaction_events_update_rolling_windows():
+    first = {"id": "e1", "date": "2025-04-02", "amount": 12.0, "category": "Dining", "merchantName": "SQ *BLUE BOTTLE COFFEE"}
+    data = client.post("/v2/transactions/events", json={"user_id": "events-test", "transactions": [first]}).json()
+    assert data["cursor"] == 1 and data["added"] == 1
+    second = dict(first, id="e2", date="2025-04-03", amount=8.0)
+    data = client.post("/v2/transactions/events", json={"user_id": "events-test", "transactions": [second, first]}).json()
+    assert data["duplicates"] == 1
+    dining = data["aggregates"]["categories"]["Dining"]
+    assert dining["day"]["sum"] == 8.0
+    assert dining["week"] == {"sum": 20.0, "count": 2, "mean": 10.0, "std": 2.0}
+    assert list(data["aggregates"]["merchants"]) == ["blue bottle coffee"]
+
+def test_anomalies_v2():
+    rows = [{"id": f"a{d}", "date": f"2025-05-{d + 1:02d}", "amount": 5.0 + d % 3 * 0.5, "merchantName": "BLUE BOTTLE COFFEE"}
+            for d in range(20)]
+    spike = {"id": "spike", "date": "2025-05-25", "amount": 60.0, "merchantName": "BLUE BOTTLE COFFEE"}
+    data = client.post("/v2/anomalies", json={"transactions": rows + [spike]}).json()
+    assert [a["id"] for a in data["anomalies"]] == ["spike"]
+    client.post("/v2/transactions/ingest?user_id=anomaly-test", json={"transactions": rows})
+    checked = client.post("/v2/anomalies/check", json={"user_id": "anomaly-test", "transaction": spike}).json()
+    assert checked["anomalous"] and checked["cursor"] == 21
+    assert client.post("/v2/anomalies/check", json={"user_id": "nobody", "transaction": spike}).status_code == 409
+    assert client.post("/v2/anomalies/check", json={"user_id": "anomaly-test", "transaction": {"amount": 5}}).status_code == 400
+
+def test_cash_flow_derives_upcoming_bills(monkeypatch):
+    import app as app_module
+    from datetime import date, timedelta
+    seen = {}
+    def fake_cash_flow(model, accounts, upcoming_bills, velocity):
+        seen["bills"], seen["velocity"] = upcoming_bills, velocity
+        return '{"predicted_balance": 100.0, "uncovered_bills": [], "suggestion": "ok"}'
+    monkeypatch.setattr(app_module, "cash_flow_prediction_ai", fake_cash_flow)
+    today = date.today()
+    rows = [{"date": (today - timedelta(days=7 * w)).isoformat(), "amount": 25.0, "merchantName": "MEAL KIT CO"}
+            for w in range(1, 6)]
+    recurring = client.post("/v2/recurring", json={"transactions": rows, "horizon_days": 14}).json()
+    assert recurring["recurring"][0]["cadence"] == "weekly"
+    assert [bill["due_date"] for bill in recurring["upcoming_bills"]] == [today.isoformat(), (today + timedelta(days=7)).isoformat(), (today + timedelta(days=14)).isoformat()]
+    data = client.post("/v2/cash-flow-prediction", json={"accounts": [], "transactions": rows}).json()["result"]
+    assert data["predicted_balance"] == 100.0
+    assert seen["bills"] == data["upcoming_bills"] and len(data["upcoming_bills"]) == 5
+    assert seen["velocity"] == round(125.0 / 30, 2)
+    explicit = [{"bill_name": "Rent", "amount": 1000.0}]
+    data = client.post("/v2/cash-flow-prediction", json={"accounts": [], "upcoming_bills": explicit}).json()["result"]
+    assert seen["bills"] == explicit and data["recent_spending_velocity"] == 0.0
+
+def test_income_v2_feeds_payment_timing():
+    from datetime import date, timedelta
+    today = date.today()
+    rows = [{"id": f"pay{i}", "date": (today - timedelta(weeks=2 * i + 1)).isoformat(), "amount": -1000.0,
+             "name": "ACME CORP PAYROLL"} for i in range(8)]
+    data = client.post("/v2/income", json={"transactions": rows, "horizon_days": 14}).json()
+    assert data["income_streams"][0]["cadence"] == "biweekly"
+    assert [p["date"] for p in data["next_paydays"]] == [(today + timedelta(weeks=1)).isoformat()]
+    client.post("/v2/transactions/ingest?user_id=income-test", json=rows)
+    payload = {
+        "accounts": [{"id": "card1", "name": "Card One", "balance": 2500.0, "apr": 24.99, "creditLimit": 5000.0,
+                      "statement_close_day": ((today + timedelta(days=20)).day)}],
+        "user_id": "income-test", "income_share": 0.5,
+    }
+    timing = client.post("/v2/interestkiller/timing", json=payload).json()
+    assert sum(item["amount"] for item in timing["schedule"]) > 0
+    payload["user_id"] = "nobody"
+    assert client.post("/v2/interestkiller/timing", json=payload).status_code == 409
@@ -0,0 +1,51 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from datetime import date
+from balance_transfer import evaluate_balance_transfers
+
+TODAY = date(2026, 10, 1)
+
+def test_moves_high_apr_debt_onto_promo_card():
+    accounts = [
+        {"id": "high", "name": "High APR", "balance": 4000.0, "apr": 27.99, "creditLimit": 5000.0},
+        {"id": "promo", "name": "Promo", "balance": 0.0, "apr": 22.99, "creditLimit": 3000.0,
+         "promo_apr": 0.0, "promo_apr_expiry_date": "2027-10-01", "balance_transfer_fee_percent": 3.0},
+    ]
+    transfers = evaluate_balance_transfers(accounts, today=TODAY)
+    assert len(transfers) == 1
+    best = transfers[0]
+    assert (best["from_card_id"], best["to_card_id"]) == ("high", "promo")
+    # Transfer plus the 3% fee must fit in the destination's headroom.
+    assert best["amount"] + best["transfer_fee"] <= 3000.0
+    assert best["net_savings"] > 0
+
+def test_no_promo_card_means_no_transfers():
+    accounts = [
+        {"id": "a", "name": "A", "balance": 1000.0, "apr": 24.99, "creditLimit": 5000.0},
+        {"id": "b", "name": "B", "balance": 0.0, "apr": 9.99, "creditLimit": 5000.0},
+    ]
+    assert evaluate_balance_transfers(accounts, today=TODAY) == []
+
+def test_source_promo_and_fee_floor_are_respected():
+    promo_dest = {"id": "promo", "name": "Promo", "balance": 0.0, "apr": 22.99, "creditLimit": 3000.0,
+                  "promo_apr": 0.0, "promo_apr_expiry_date": "2027-10-01"}
+    # The source is itself at 0% for 11 more months: moving it only costs a fee.
+    already_promo = {"id": "src", "name": "Src", "balance": 3000.0, "apr": 27.99, "creditLimit": 5000.0,
+                     "promo_apr": 0.0, "promo_apr_expiry_date": "2027-09-01"}
+    assert evaluate_balance_transfers([already_promo, dict(promo_dest, creditLimit=10000.0)], today=TODAY) == []
+    # With $100 of headroom the $5 minimum fee must fit too.
+    high = {"id": "high", "name": "High", "balance": 4000.0, "apr": 29.99, "creditLimit": 5000.0}
+    small = dict(promo_dest, balance=2900.0)
+    for transfer in evaluate_balance_transfers([high, small], today=TODAY):
+        assert transfer["amount"] + transfer["transfer_fee"] <= 100.0
+
+def test_unparseable_promo_date_means_no_promo():
+    accounts = [
+        {"id": "high", "name": "High APR", "balance": 4000.0, "apr": 27.99, "creditLimit": 5000.0},
+        {"id": "promo", "name": "Promo", "balance": 0.0, "apr": 22.99, "creditLimit": 3000.0,
+         "promo_apr": 0.0, "promo_apr_expiry_date": "sometime next year"},
+    ]
+    assert evaluate_balance_transfers(accounts, today=TODAY) == []
+    accounts[1]["promo_apr_expiry_date"] = "10/01/2027"
+    assert evaluate_balance_transfers(accounts, today=TODAY)[0]["promo_months"] == 12
@@ -0,0 +1,40 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from datetime import date
+from bonus_routing import BonusPlanner, plan_bonus_routing
+
+TODAY = date(2026, 10, 1)
+CARDS = [
+    {"id": "dining", "name": "Dining 4x", "rewards": {"dining": 4.0, "default": 1.0}, "point_value_cents": 1.0},
+    {"id": "flat", "name": "Flat 2%", "rewards": {"default": 2.0}, "point_value_cents": 1.0},
+    {"id": "new", "name": "New Card", "rewards": {"default": 1.0}, "point_value_cents": 1.0,
+     "signup_bonus_progress": {"spend_needed": 1500, "bonus_value": 200, "deadline": "2026-11-30"}},
+]
+
+def test_routes_enough_spend_to_capture_the_bonus():
+    # $40/day dining, $60/day groceries over 12 weeks
+    plan = plan_bonus_routing(CARDS, {"dining": 40.0, "groceries": 60.0}, TODAY, horizon_weeks=12)
+    assert [b["card_id"] for b in plan["captured_bonuses"]] == ["new"]
+    routed_to_new = sum(r["amount"] for r in plan["routing"] if r["card_id"] == "new")
+    assert abs(routed_to_new - 1500) < 0.01
+    # Cheapest spend to divert is groceries (2% -> 1%), never dining (4%).
+    assert all(r["category"] == "groceries" for r in plan["routing"] if r["card_id"] == "new")
+    assert plan["total_value"] > plan["baseline_value"]
+    assert abs(plan["total_value"] - (plan["baseline_value"] + 200 - 15)) < 0.01
+
+def test_unreachable_bonus_is_skipped_and_plans_are_cached():
+    planner = BonusPlanner()
+    history = [{"id": f"t{i}", "date": f"2026-09-{i + 1:02d}", "amount": 5.0, "category": "groceries"} for i in range(30)]
+    plan = planner.plan("u", CARDS, history, horizon_weeks=8, today=TODAY)
+    assert plan["captured_bonuses"] == []
+    assert planner.plan("u", CARDS, history, horizon_weeks=8, today=TODAY) is plan  # same ids: no change
+    assert planner.plans.hits == 1
+
+def test_short_history_is_spread_over_the_minimum_span():
+    planner = BonusPlanner()
+    history = planner.record("u", [{"id": "t1", "date": "2026-09-30", "amount": 700.0, "category": "travel"}])
+    # One $700 purchase is not a $700/day habit.
+    assert history.daily_rates() == {"travel": 50.0}
+    planner.record("u", [{"id": "t1", "date": "2026-09-30", "amount": 700.0, "category": "travel"}])
+    assert history.totals_cents == {"travel": 70000}
@@ -0,0 +1,38 @@
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from build_card_catalog import build
+from card_catalog import catalog_key, enrich_card, get_card_catalog, load_card_catalog
+
+def test_exact_and_fuzzy_name_matches():
+    catalog = get_card_catalog()
+    assert catalog_key("Amex Gold Card®") == "american express gold"
+    assert catalog.match("Chase Sapphire Preferred® Card")["id"] == "chase-sapphire-preferred"
+    assert catalog.match("Sapphire Prefered", issuer="Chase")["id"] == "chase-sapphire-preferred"
+    assert catalog.match("Blue Cash Preferred® Card from American Express")["id"] == "amex-blue-cash-preferred"
+    assert catalog.match("Capital One Venture Rewards Credit Card")["id"] == "capital-one-venture"
+    assert catalog.match("Venture X")["id"] == "capital-one-venture-x"
+    assert catalog.match("Random Store Card") is None
+
+def test_enrich_fills_only_missing_fields():
+    card = {"id": "c1", "name": "Chase Sapphire Preferred", "annual_fee": 0}
+    enriched = enrich_card(card)
+    assert enriched["rewards"]["dining"] == 3.0
+    assert enriched["point_value_cents"] == 1.25
+    assert enriched["annual_fee"] == 0  # the card's own value wins
+    assert enriched["catalog_product_id"] == "chase-sapphire-preferred"
+    enriched["rewards"]["dining"] = 99.0
+    assert get_card_catalog().match("Chase Sapphire Preferred")["rewards"]["dining"] == 3.0
+    assert "rewards" not in card
+    assert enrich_card({"id": "c2", "name": "Unknown Bank Card"}) == {"id": "c2", "name": "Unknown Bank Card"}
+
+def test_rebuild_rejects_ambiguous_names(tmp_path):
+    source = tmp_path / "products.tsv"
+    row = "{0}\tAcme\tRewards Plus\t\t0\t1.0\t0\tdefault=2\n"
+    source.write_text(row.format("acme-a"), encoding="utf-8")
+    build(str(source), str(tmp_path / "catalog.json.gz"))
+    assert load_card_catalog(str(tmp_path / "catalog.json.gz")).match("Acme Rewards Plus")["id"] == "acme-a"
+    source.write_text(row.format("acme-a") + row.format("acme-b"), encoding="utf-8")
+    with pytest.raises(ValueError, match="acme-a"):
+        build(str(source), str(tmp_path / "catalog.json.gz"))
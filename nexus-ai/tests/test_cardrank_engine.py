@@ -0,0 +1,44 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+from cardrank_engine import compile_portfolio, category_indices, score_transactions, explain_card
+
+CARDS = [
+    {"id": "dining", "name": "Dining Card", "balance": 100.0, "creditLimit": 5000.0, "apr": 20.0,
+     "rewards": {"dining": 4.0, "default": 1.0}, "point_value_cents": 1.0},
+    {"id": "flat", "name": "Flat 2%", "balance": 100.0, "creditLimit": 5000.0, "apr": 20.0,
+     "rewards": {"default": 2.0}, "point_value_cents": 1.0},
+]
+
+def test_scores_many_transactions_in_one_matrix():
+    portfolio = compile_portfolio(CARDS)
+    categories = ["dining", "groceries", "dining", "unknown"]
+    scored = score_transactions(portfolio, category_indices(portfolio, categories), np.array([50.0, 50.0, 10.0, 20.0]), "MAXIMIZE_CASHBACK")
+    assert scored["score"].shape == (4, 2)
+    assert scored["best"].tolist() == [0, 1, 0, 1]
+    assert np.allclose(scored["reward"][0], [2.0, 1.0])
+
+def test_projected_utilization_penalty_and_winner_explanation():
+    portfolio = compile_portfolio(CARDS)
+    scored = score_transactions(portfolio, category_indices(portfolio, ["dining"]), np.array([4800.0]), "MAXIMIZE_CASHBACK")
+    details = explain_card(portfolio, 0, "dining", 4800.0, "MAXIMIZE_CASHBACK")
+    assert details[0] == "Category match: dining x4.0"
+    assert "Projected utilization >90% penalty" in details
+    assert scored["best"][0] == 0
+
+def test_foreign_fee_and_location_bonus():
+    cards = [
+        {"id": "fee", "name": "Fee Card", "balance": 0.0, "creditLimit": 5000.0, "rewards": {"default": 2.0},
+         "point_value_cents": 1.0, "foreign_transaction_fee_percent": 3},
+        {"id": "travel", "name": "No FX", "balance": 0.0, "creditLimit": 5000.0, "rewards": {"default": 1.0},
+         "point_value_cents": 1.0, "location_rewards": {"JP": 3.0}},
+    ]
+    portfolio = compile_portfolio(cards)
+    cols = category_indices(portfolio, ["shopping"] * 3)
+    scored = score_transactions(portfolio, cols, np.array([100.0] * 3), "MAXIMIZE_CASHBACK", [None, "FR", "JP"])
+    assert scored["best"].tolist() == [0, 1, 1]
+    assert np.allclose(scored["reward"][1], [-1.0, 1.0])
+    assert np.allclose(scored["reward"][2], [-1.0, 3.0])
+    assert "Foreign transaction fee: -$3.00 (3%)" in explain_card(portfolio, 0, "shopping", 100.0, "MAXIMIZE_CASHBACK", "FR")
+    assert "Location bonus: JP x3.0" in explain_card(portfolio, 1, "shopping", 100.0, "MAXIMIZE_CASHBACK", "JP")
@@ -0,0 +1,19 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from datetime import date, datetime
+from dates import parse_date
+from balance_transfer import parse_promo_expiry
+
+def test_parse_date_accepts_common_formats():
+    assert parse_date("2026-09-01") == date(2026, 9, 1)
+    assert parse_date("2026-09-01T12:30:00Z") == date(2026, 9, 1)
+    assert parse_date("09/01/2026") == date(2026, 9, 1)
+    assert parse_date("09/01/26") == date(2026, 9, 1)
+    assert parse_date(datetime(2026, 9, 1, 8)) == date(2026, 9, 1)
+
+def test_parse_date_returns_none_for_garbage():
+    assert parse_date("soon") is None
+    assert parse_date("") is None
+    assert parse_date(None) is None
+    assert parse_promo_expiry is parse_date
@@ -0,0 +1,47 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from build_geo_index import build
+from geo_index import get_geo_index, is_foreign, load_geo_index, resolve_country
+
+def test_resolves_common_location_strings():
+    assert resolve_country("Paris, France") == "FR"
+    assert resolve_country("Austin, TX") == "US"
+    assert resolve_country("TORONTO ON") == "CA"
+    assert resolve_country("Zürich") == "CH"
+    assert resolve_country("Sydney NSW") == "AU"
+    assert resolve_country("SAN FRANCISC") == "US"  # truncated by the processor
+    assert resolve_country({"city": "Lyon", "region": None, "country": None}) == "FR"
+    assert resolve_country({"country": "CA"}) == "CA"
+    assert resolve_country("") is None
+    assert resolve_country("Nowhere Special") is None
+
+def test_two_letter_suffix_prefers_state_unless_the_city_says_otherwise():
+    assert resolve_country("Berlin, DE") == "DE"
+    assert resolve_country("Dover, DE") == "US"
+    assert resolve_country("Paris TX") == "US"
+    assert resolve_country("London") == "GB"
+    assert resolve_country("London, ON") == "CA"
+
+def test_prefix_lookup_and_rebuild(tmp_path):
+    assert [p.name for p in get_geo_index().prefix("san fr")] == ["san francisco"]
+    source = tmp_path / "places.tsv"
+    source.write_text("# test\nSpringfield\tcity\tUS\t0\nMünchen\tcity\tDE\t0\n", encoding="utf-8")
+    assert build(str(source), str(tmp_path / "geo.bin")) == 2
+    index = load_geo_index(str(tmp_path / "geo.bin"))
+    assert index.resolve("Munchen") == "DE"
+    assert index.resolve("Springfield IL") == "US"  # falls back to the leading city
+
+def test_unknown_location_is_domestic():
+    assert not is_foreign(None)
+    assert is_foreign("FR")
+    assert not is_foreign("FR", home_country="fr")
+
+def test_bare_region_is_a_subdivision_not_a_country():
+    assert resolve_country({"region": "CA", "country": None}) == "US"
+    assert resolve_country({"region": "PA"}) == "US"
+    assert resolve_country({"state": "DE"}) == "US"
+    assert resolve_country({"city": "San Francisco", "region": "CA", "country": None}) == "US"
+    assert resolve_country({"city": "London", "region": "ON"}) == "CA"
+    assert resolve_country({"region": "ON"}) == "CA"
+    assert resolve_country({"region": "Nowhere"}) is None
@@ -0,0 +1,52 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import calendar
+from datetime import date, timedelta
+from income import expected_paydays, income_streams, public, user_income
+from transaction_store import TransactionStore
+
+def _friday_before(day):
+    return day - timedelta(days=max(day.weekday() - 4, 0))
+
+def _deposits():
+    rows = [{"date": (date(2025, 1, 3) + timedelta(weeks=2 * i)).isoformat(), "amount": -2150.0 - i % 3,
+             "name": "ACME CORP PAYROLL PPD"} for i in range(20)]
+    for m in range(1, 10):
+        for day in (15, calendar.monthrange(2025, m)[1]):
+            rows.append({"date": _friday_before(date(2025, m, day)).isoformat(), "amount": -1500.0,
+                         "name": "STATE UNIVERSITY DIR DEP"})
+        rows.append({"date": _friday_before(date(2025, m, 1)).isoformat(), "amount": -400.0, "name": "RENTAL INCOME LLC"})
+    # Irregular or small credits are not income streams.
+    rows += [{"date": f"2025-0{m}-0{m}", "amount": -30.0, "name": "AMAZON REFUND"} for m in range(1, 8)]
+    rows += [{"date": d, "amount": -250.0, "name": "VENMO CASHOUT"} for d in ("2025-02-03", "2025-02-20", "2025-06-11", "2025-06-15")]
+    # A job that ended in the spring.
+    rows += [{"date": (date(2025, 1, 6) + timedelta(weeks=i)).isoformat(), "amount": -300.0, "name": "GIG APP"} for i in range(12)]
+    rows.append({"date": "2025-09-30", "amount": 12.0, "name": "COFFEE"})
+    return rows
+
+def test_detects_pay_cadences():
+    streams = {s["payer"]: s for s in public(income_streams(_deposits()))}
+    assert {name: s["cadence"] for name, s in streams.items()} == {
+        "acme corp payroll ppd": "biweekly", "state university dir dep": "semimonthly", "rental income llc": "monthly"}
+    assert streams["acme corp payroll ppd"]["next_date"] == "2025-10-10"
+    assert streams["acme corp payroll ppd"]["amount"] == 2151.0
+    assert streams["state university dir dep"]["next_date"] == "2025-10-15"
+    assert streams["rental income llc"]["confidence"] == 1.0
+
+def test_expected_paydays_follow_month_end_and_weekends():
+    paydays = expected_paydays(income_streams(_deposits()), date(2025, 10, 1), 45)
+    university = [p["date"] for p in paydays if p["payer"] == "state university dir dep"]
+    assert university == ["2025-10-15", "2025-10-31", "2025-11-14"]  # Nov 15 is a Saturday
+    rental = [p["date"] for p in paydays if p["payer"] == "rental income llc"]
+    assert rental == ["2025-10-01", "2025-10-31"]  # Nov 1 is a Saturday
+
+def test_incremental_refresh_matches_full_detection():
+    rows = sorted((dict(row, id=f"d{i}") for i, row in enumerate(_deposits())), key=lambda row: row["date"])
+    store = TransactionStore()
+    store.ingest("u1", rows[:40])
+    user_income("u1", store.get("u1"))
+    for start in range(40, len(rows), 25):
+        store.ingest("u1", rows[start:start + 25])
+        incremental = user_income("u1", store.get("u1"))
+    assert incremental == income_streams(rows)
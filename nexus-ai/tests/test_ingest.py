@@ -0,0 +1,46 @@
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import asyncio
+import json
+from datetime import date
+from ingest import IngestError, TransactionColumns, iter_bytes, iter_json_records
+from spending import SpendingAccumulator, spending_aggregates
+
+def _records(body: bytes, size: int, fields=("transactions", "previous_transactions")):
+    values = {}
+    async def collect():
+        return [record async for record in iter_json_records(iter_bytes(body, size), fields, values)]
+    return asyncio.run(collect()), values
+
+def test_records_survive_any_chunk_boundary():
+    body = json.dumps({"user_id": "u1", "transactions": [{"amount": 12.5, "name": 'Café "x" [1]'}, {"amount": 1234}],
+                       "meta": {"nested": [1, 2]}, "previous_transactions": [], "limit": 10}, ensure_ascii=False).encode()
+    for size in (1, 2, 3, 7, len(body)):
+        records, values = _records(body, size)
+        assert records == [("transactions", {"amount": 12.5, "name": 'Café "x" [1]'}), ("transactions", {"amount": 1234})]
+        assert values == {"user_id": "u1", "meta": {"nested": [1, 2]}, "limit": 10}
+    assert _records(b'[{"a": 1}, {"a": 2}]', 4)[0] == [(None, {"a": 1}), (None, {"a": 2})]
+
+def test_malformed_or_truncated_bodies_raise():
+    for body in (b'{"transactions": [{"a": 1}', b'{"transactions": [{"a": x}]}', b'"text"', b'{"a": 1} extra'):
+        with pytest.raises(IngestError):
+            _records(body, 3)
+
+def test_columns_grow_and_intern_strings():
+    columns = TransactionColumns(capacity=2)
+    for i in range(5):
+        columns.append(1.005 * (i + 1), "dining" if i % 2 else "gas", "m", date(2026, 1, i + 1) if i else None)
+    data = columns.columns()
+    assert data["cents"].tolist() == [101, 201, 302, 402, 503]
+    assert data["category"].tolist() == [0, 1, 0, 1, 0]
+    assert data["day"][0] == -1 and data["day"][1] == date(2026, 1, 2).toordinal()
+    assert columns.category_codes == {"gas": 0, "dining": 1}
+
+def test_small_batches_aggregate_like_one_pass():
+    txns = [{"amount": (i % 7) + 0.01, "category": f"c{i % 5}"} for i in range(1000)]
+    accumulator = SpendingAccumulator(batch_size=16)
+    for txn in txns:
+        accumulator.add(txn)
+    assert accumulator.result() == spending_aggregates(txns)
@@ -0,0 +1,38 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from merchant_index import MerchantIndex, get_merchant_index
+from cardrank import enrich_merchant_category
+
+def test_longest_whole_word_match_wins():
+    index = MerchantIndex(["travel", "health", "transit", "dining"],
+                          [("delta", 0), ("delta dental", 1), ("uber", 2), ("uber eats", 3)], [])
+    assert index.classify("DELTA DENTAL OF CA") == "health"
+    assert index.classify("Delta Air 0062") == "travel"
+    assert index.classify("UBER *EATS") == "dining"
+    assert index.classify("Uberrific Cafe") is None  # not a whole word
+
+def test_mcc_fallback_and_bundled_index():
+    index = get_merchant_index()
+    assert len(index) > 500
+    assert index.classify("Unknown Merchant", mcc=5812) == "dining"
+    assert index.classify("Unknown Merchant", mcc="9999") is None
+    assert enrich_merchant_category({"merchantName": "WHOLE FOODS MARKET #10234"}) == "groceries"
+    assert enrich_merchant_category({"merchantName": "Mystery LLC", "category": "travel"}) == "travel"
+    assert enrich_merchant_category({"merchantName": "Mystery LLC"}) == "General"
+
+def test_every_bundled_pattern_classifies_to_its_own_category():
+    from merchant_index import DATA_DIR
+    index = get_merchant_index()
+    wrong = []
+    with open(os.path.join(DATA_DIR, 'merchant_patterns.tsv'), encoding='utf-8') as f:
+        for line in f:
+            if not line.strip() or line.startswith('#') or line.startswith('mcc:'):
+                continue
+            pattern, category = line.rstrip('\n').split('\t')
+            if index.classify(pattern) != category:
+                wrong.append((pattern, category, index.classify(pattern)))
+    assert wrong == []
+    assert index.classify("Booking.com") == "travel"
+    assert index.classify("PHILLIPS 66 #4421") == "gas"
+    assert index.classify("BEST BUY CO") == "shopping"
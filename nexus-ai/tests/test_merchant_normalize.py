@@ -0,0 +1,36 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from merchant_normalize import normalize_merchant, normalization_stats
+
+def test_normalize_strips_noise():
+    assert normalize_merchant("AMAZON.COM*AX2BC") == "amazon"
+    assert normalize_merchant("STARBUCKS 123") == "starbucks"
+    assert normalize_merchant("SQ *BLUE BOTTLE") == "blue bottle"
+    assert normalize_merchant("CHECKCARD 0721 COSTCO WHSE #1234") == "costco whse"
+    assert normalize_merchant("GOOGLE *YouTube Premium") == "youtube premium"
+    assert normalize_merchant("") == ""
+
+def test_normalize_is_memoized():
+    before = normalization_stats()
+    for _ in range(3):
+        normalize_merchant("TARGET T-1234 MINNEAPOLIS MN")
+    after = normalization_stats()
+    assert after["hits"] - before["hits"] >= 2
+    assert after["size"] <= after["maxsize"]
+
+def test_real_names_survive_normalization():
+    assert normalize_merchant("BEST BUY CO") == "best buy co"
+    assert normalize_merchant("AMERICAN EXPRESS CO") == "american express co"
+    assert normalize_merchant("Credit Karma") == "credit karma"
+    assert normalize_merchant("Card Factory") == "card factory"
+    assert normalize_merchant("Online Trading Academy") == "online trading academy"
+    assert normalize_merchant("RECURRING PAYMENT NETFLIX.COM") == "netflix"
+
+def test_city_and_state_suffix_is_dropped_without_store_number():
+    assert normalize_merchant("STARBUCKS SEATTLE WA") == "starbucks"
+    assert normalize_merchant("STARBUCKS #1234 SEATTLE WA") == "starbucks"
+    assert normalize_merchant("WHOLE FOODS MARKET AUSTIN TX") == "whole foods market"
+    assert normalize_merchant("STARBUCKS DENVER CO #442") == "starbucks"
+    # Too short to hold a brand, a city and a state.
+    assert normalize_merchant("CHIPOTLE TX") == "chipotle tx"
@@ -0,0 +1,41 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+from money import cents_of, to_cents, from_cents, minimum_payments_cents, accrue_interest_cents, project_balances_cents, allocate_cents
+from app import precompute_payment_plans_sophisticated
+
+def test_to_cents_rounds_half_cents_up():
+    assert to_cents([1.005, 0.285, 19.99, -2.675]).tolist() == [101, 29, 1999, -268]
+    assert from_cents(1999) == 19.99
+
+def test_scalar_cents_match_array_rounding():
+    values = [1.005, 2.675, 0.125, -0.125, 19.999, 1234.565, 0.0]
+    assert [cents_of(v) for v in values] == to_cents(values).tolist()
+
+def test_minimum_payments_and_interest():
+    balances = to_cents([10.0, 1000.0, 5000.0])
+    assert minimum_payments_cents(balances).tolist() == [1000, 2500, 5000]
+    # $1,000 at 24.99% for one month is $20.825 -> $20.83
+    assert accrue_interest_cents(to_cents(1000.0), 2499).item() == 2083
+
+def test_project_balances_pays_down_to_zero():
+    history, interest = project_balances_cents(to_cents([100.0]), np.array([0]), to_cents(60.0), 3)
+    assert history[:, 0].tolist() == [10000, 4000, 0, 0]
+    assert interest.sum() == 0
+
+def test_allocate_cents_is_exact():
+    parts = allocate_cents(10000, [1, 1, 1])
+    assert parts.sum() == 10000
+    assert parts.tolist() == [3334, 3333, 3333]
+
+def test_plan_splits_sum_exactly_to_payment():
+    accounts = [
+        {"id": "a", "name": "A", "balance": 1234.57, "apr": 24.99, "creditLimit": 5000.0},
+        {"id": "b", "name": "B", "balance": 987.65, "apr": 17.99, "creditLimit": 3000.0},
+        {"id": "c", "name": "C", "balance": 3333.33, "apr": 21.49, "creditLimit": 9000.0},
+    ]
+    plans = precompute_payment_plans_sophisticated(accounts, 333.33)
+    for key in ("avalanche_plan", "score_booster_plan"):
+        total = to_cents([item["amount"] for item in plans[key]["split"]]).sum()
+        assert total == 33333
@@ -0,0 +1,16 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from datetime import date
+from plan_cache import portfolio_fingerprint, get_cached_plan, store_plan
+
+ACCOUNTS = [{"id": "a", "name": "A", "balance": 100.0, "apr": 20.0, "creditLimit": 1000.0}]
+
+def test_cached_plans_expire_at_month_boundary():
+    october, november = date(2026, 10, 31), date(2026, 11, 1)
+    fingerprint = portfolio_fingerprint(ACCOUNTS, 50.0, {"primary_goal": "x"}, today=october)
+    assert fingerprint != portfolio_fingerprint(ACCOUNTS, 50.0, {"primary_goal": "x"}, today=november)
+    store_plan(fingerprint, {"plan": 1}, today=october)
+    assert get_cached_plan(fingerprint, today=october) == {"plan": 1}
+    assert get_cached_plan(fingerprint, today=november) is None
+    assert get_cached_plan(fingerprint, today=october) is None
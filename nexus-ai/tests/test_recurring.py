@@ -0,0 +1,68 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from datetime import date, timedelta
+import numpy as np
+from recurring import recurring_charges, upcoming_bills, user_recurring
+from transaction_store import TransactionStore
+
+def _history():
+    rng = np.random.default_rng(5)
+    rows = []
+    for m in range(12):
+        jitter = int(rng.integers(-2, 3))
+        rows.append({"date": (date(2024, m + 1, 10) + timedelta(days=jitter)).isoformat(),
+                     "amount": 15.49 if m < 8 else 16.99, "merchantName": "NETFLIX.COM"})
+        rows.append({"date": date(2024, m + 1, 1).isoformat(), "amount": 1800.0, "merchantName": "RENT PORTAL"})
+    for w in range(52):
+        rows.append({"date": (date(2024, 1, 6) + timedelta(weeks=w)).isoformat(), "amount": 12.0 + w % 3,
+                     "merchantName": "YOGA STUDIO"})
+    for i in range(300):
+        rows.append({"date": (date(2024, 1, 1) + timedelta(days=int(rng.integers(0, 360)))).isoformat(),
+                     "amount": float(rng.uniform(3, 90)), "merchantName": f"SHOP {i % 40}"})
+    rows.append({"date": "2023-12-20", "amount": 99.0, "merchantName": "COSTCO MEMBERSHIP"})
+    rows.append({"date": "2024-12-18", "amount": 99.0, "merchantName": "COSTCO MEMBERSHIP"})
+    # Cancelled in the spring.
+    rows += [{"date": date(2024, m, 5).isoformat(), "amount": 9.99, "merchantName": "HULU"} for m in (1, 2, 3, 4)]
+    return rows
+
+def test_detects_cadences_and_predicts_next_charge():
+    series = {item["merchant"]: item for item in recurring_charges(_history())}
+    assert set(series) == {"netflix", "rent portal", "yoga studio", "costco membership"}
+    assert series["rent portal"]["cadence"] == "monthly" and series["rent portal"]["next_date"] == "2025-01-01"
+    assert series["netflix"]["amount"] == 16.99 and series["netflix"]["occurrences"] == 12
+    assert series["yoga studio"]["cadence"] == "weekly"
+    assert series["costco membership"]["cadence"] == "annual"
+    assert series["costco membership"]["next_date"] == "2025-12-18"
+    bills = upcoming_bills(list(series.values()), date(2025, 1, 1), 14)
+    assert [bill["bill_name"] for bill in bills if bill["bill_name"] != "yoga studio"] == ["rent portal", "netflix"]
+    assert all("2025-01-01" <= bill["due_date"] <= "2025-01-15" for bill in bills)
+
+def test_monthly_anchor_clamps_to_month_end():
+    rows = [{"date": d, "amount": 50.0, "merchantName": "GYM"} for d in ("2024-10-31", "2024-12-01", "2024-12-31")]
+    (gym,) = recurring_charges(rows)
+    assert gym["next_date"] == "2025-01-31"
+    due = [bill["due_date"] for bill in upcoming_bills([gym], date(2025, 2, 1), 60)]
+    assert due == ["2025-02-28", "2025-03-31"]
+
+def test_incremental_refresh_matches_full_detection():
+    rows = [dict(row, id=f"r{i}") for i, row in enumerate(_history())]
+    rows.sort(key=lambda row: row["date"])
+    store = TransactionStore()
+    store.ingest("u1", rows[:200])
+    user_recurring("u1", store.get("u1"))
+    for start in range(200, len(rows), 90):
+        store.ingest("u1", rows[start:start + 90])
+        incremental = user_recurring("u1", store.get("u1"))
+    assert incremental == recurring_charges(rows)
+
+def test_anchor_comes_from_the_series_not_the_last_charge():
+    days = ("2024-12-31", "2025-01-31", "2025-03-03", "2025-03-31", "2025-04-30")
+    rows = [{"date": d, "amount": 80.0, "merchantName": "STORAGE UNIT"} for d in days]
+    (storage,) = recurring_charges(rows)
+    assert storage["next_date"] == "2025-05-31"
+    assert [bill["due_date"] for bill in upcoming_bills([storage], date(2025, 6, 1), 30)] == ["2025-06-30"]
+    leap = [{"date": d, "amount": 120.0, "merchantName": "DOMAIN RENEWAL"} for d in ("2024-02-29", "2025-02-28")]
+    (domain,) = recurring_charges(leap)
+    assert domain["next_date"] == "2026-02-28"
+    assert [bill["due_date"] for bill in upcoming_bills([domain], date(2028, 2, 1), 30)] == ["2028-02-29"]
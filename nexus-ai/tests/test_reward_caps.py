@@ -0,0 +1,40 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from datetime import date
+import numpy as np
+from cardrank_engine import apply_reward_caps, compile_portfolio, category_indices, score_transactions
+from reward_caps import SpendCounterStore, resolve_card_rewards
+
+TODAY = date(2026, 10, 19)
+CARDS = [
+    {"id": "rotating", "name": "Rotating 5%", "rewards": {"default": 1.0}, "point_value_cents": 1.0,
+     "rotating_categories": {"2026-Q4": ["groceries"], "2027-Q1": ["gas"]}, "rotating_cap": 1500},
+    {"id": "flat", "name": "Flat 2%", "rewards": {"default": 2.0}, "point_value_cents": 1.0},
+]
+
+def _purchase(txn_id, day, amount, card_id="rotating"):
+    return {"id": txn_id, "date": day, "amount": amount, "category": "groceries", "merchantName": "Mystery Grocer", "card_id": card_id}
+
+def test_rotating_cap_is_consumed_and_rolls_over():
+    store = SpendCounterStore()
+    cards = resolve_card_rewards(CARDS, TODAY)
+    assert cards[0]["rewards"]["groceries"] == 5.0
+    assert store.record("u", CARDS, [_purchase("t1", "2026-10-02", 1000.0), _purchase("t1", "2026-10-02", 1000.0),
+                                     _purchase("t0", "2026-09-30", 400.0), _purchase("t2", "2026-10-05", 300.0, "flat")]) == 3
+    assert store.remaining("u", cards, TODAY) == {0: {"groceries": (500.0, 1.0)}}
+    store.record("u", CARDS, [_purchase("t3", "2026-11-01", 700.0)])
+    assert store.remaining("u", cards, TODAY)[0]["groceries"] == (0.0, 1.0)
+    # Next quarter: new category, fresh counter
+    next_quarter = resolve_card_rewards(CARDS, date(2027, 1, 10))
+    assert store.remaining("u", next_quarter, date(2027, 1, 10)) == {0: {"gas": (1500.0, 1.0)}}
+
+def test_engine_blends_rewards_across_the_cap():
+    cards = resolve_card_rewards(CARDS, TODAY)
+    portfolio = apply_reward_caps(compile_portfolio(cards), {0: {"groceries": (100.0, 1.0)}})
+    scored = score_transactions(portfolio, category_indices(portfolio, ["groceries", "groceries"]),
+                                np.array([50.0, 300.0]), "MAXIMIZE_CASHBACK")
+    # $100 at 5% + $200 at 1% = $7, beating the flat card's $6 only just
+    assert np.allclose(scored["reward"][:, 0], [2.5, 7.0])
+    exhausted = apply_reward_caps(compile_portfolio(cards), {0: {"groceries": (0.0, 1.0)}})
+    assert score_transactions(exhausted, category_indices(exhausted, ["groceries"]), [50.0], "MAXIMIZE_CASHBACK")["best"][0] == 1
@@ -0,0 +1,45 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import random
+from cardrank_engine import compile_portfolio, category_indices, score_transactions
+from reward_table import compile_reward_table, get_reward_table, lookup_best_card, reward_tables
+
+GOALS = ["MAXIMIZE_CASHBACK", "PAY_DOWN_DEBT", "EARN_TRAVEL_POINTS", "MINIMIZE_INTEREST_COST"]
+CATEGORIES = ["dining", "groceries", "travel", "gas", "unknown"]
+
+def _random_cards(rng):
+    cards = []
+    for c in range(rng.randint(1, 6)):
+        rewards = {"default": rng.choice([1.0, 1.5, 2.0])}
+        for category in rng.sample(CATEGORIES[:4], 2):
+            rewards[category] = rng.choice([1.0, 2.0, 3.0, 5.0])
+        cards.append({"id": f"c{c}", "rewards": rewards, "point_value_cents": rng.choice([1.0, 1.25, 1.5]),
+                      "annual_fee": rng.choice([0, 95]), "apr": rng.uniform(15, 30), "utilization": rng.random(),
+                      "balance": rng.uniform(0, 3000), "creditLimit": rng.choice([1000.0, 5000.0, 10000.0]),
+                      "categories": rng.sample(["travel", "dining"], rng.randint(0, 1))})
+    return cards
+
+def test_table_lookup_matches_full_scoring():
+    rng = random.Random(7)
+    for _ in range(200):
+        cards = _random_cards(rng)
+        table = compile_reward_table(cards)
+        portfolio = compile_portfolio(cards)
+        for _ in range(20):
+            category, amount, goal = rng.choice(CATEGORIES), rng.uniform(0, 3000), rng.choice(GOALS)
+            ranked = lookup_best_card(table, category, amount, goal)
+            if ranked is None:
+                continue
+            scores = score_transactions(portfolio, category_indices(portfolio, [category]), [amount], goal)["score"][0]
+            # Equal up to float noise on exact ties
+            assert scores[ranked["best"]] >= scores.max() - 1e-9
+
+def test_table_is_recompiled_when_the_portfolio_changes():
+    cards = _random_cards(random.Random(3))
+    first = get_reward_table("user-1", cards)
+    assert get_reward_table("user-1", [dict(c) for c in cards]) is first
+    cards[0] = dict(cards[0], balance=cards[0]["balance"] + 1)
+    second = get_reward_table("user-1", cards)
+    assert second is not first and second["version"] != first["version"]
+    assert reward_tables.get("user-1")[0] == second["version"]
@@ -0,0 +1,57 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from datetime import date, timedelta
+import numpy as np
+from rolling import RING_DAYS, RollingWindows
+from spending import month_to_date_spend, rolling_aggregates, stored_aggregates
+from transaction_store import TransactionStore
+
+def test_windows_match_a_full_scan_for_out_of_order_events():
+    rng = np.random.default_rng(7)
+    start = date(2024, 1, 1)
+    categories = ["Dining", "Gas", "Groceries", "Travel"]
+    rows = [{"id": f"r{i}", "date": (start + timedelta(days=int(d))).isoformat(),
+             "amount": round(float(a), 2), "category": categories[int(c)]}
+            for i, (d, a, c) in enumerate(zip(rng.integers(0, 200, 3000), rng.uniform(-20, 300, 3000),
+                                             rng.integers(0, 4, 3000)))]
+    store = TransactionStore()
+    for row in rows:  # one event at a time, dates out of order
+        store.ingest("u1", [row])
+    history = store.get("u1")
+    columns = history.columns()
+    last = int(columns["day"][columns["cents"] > 0].max())
+    assert rolling_aggregates(history) == stored_aggregates(history, 30)
+    assert month_to_date_spend(history) == stored_aggregates(history, date.fromordinal(last).day)["category_totals"]
+    week = (columns["day"] > last - 7) & (columns["cents"] > 0) & (columns["category"] == history.category_codes["Gas"])
+    gas = history.categories.stats(history.category_codes["Gas"], "week")
+    assert gas["count"] == int(week.sum())
+    assert gas["sum"] == int(columns["cents"][week].sum()) / 100
+    assert abs(gas["std"] - np.std(columns["cents"][week] / 100)) < 0.01
+
+def test_ring_expires_old_days_and_ignores_too_old_events():
+    windows = RollingWindows({"Dining": 0})
+    day = date(2025, 3, 15).toordinal()
+    assert windows.add(0, 1000, day)
+    assert windows.add(0, 500, day + 1)
+    assert windows.stats(0, "day") == {"sum": 5.0, "count": 1, "mean": 5.0, "std": 0.0}
+    assert windows.stats(0, "week")["sum"] == 15.0
+    assert windows.stats(0, "month_to_date")["count"] == 2
+    assert windows.add(0, 700, day + 40)
+    assert windows.stats(0, "month")["sum"] == 7.0
+    assert windows.stats(0, "previous_month")["sum"] == 15.0
+    assert not windows.add(0, 100, day + 40 - RING_DAYS)
+    assert windows.stats(1, "month")["count"] == 0
+
+def test_windows_slide_across_month_boundaries():
+    rng = np.random.default_rng(11)
+    start = date(2024, 1, 20)
+    store = TransactionStore()
+    for i, d in enumerate(np.sort(rng.integers(0, 150, 1500))):
+        store.ingest("u1", [{"id": f"c{i}", "date": (start + timedelta(days=int(d))).isoformat(),
+                             "amount": float(rng.integers(100, 9000)) / 100, "category": ["Dining", "Gas"][i % 2]}])
+        if i % 97 == 0:
+            history = store.get("u1")
+            last = int(history.columns()["day"].max())
+            assert rolling_aggregates(history) == stored_aggregates(history, 30)
+            assert month_to_date_spend(history) == stored_aggregates(history, date.fromordinal(last).day)["category_totals"]
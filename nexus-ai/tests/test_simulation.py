@@ -0,0 +1,44 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import random
+from simulation import MAX_CELLS, simulate_policies
+
+CARDS = [
+    {"id": "dining", "name": "Dining", "rewards": {"dining": 4.0, "default": 1.0}, "point_value_cents": 1.0,
+     "apr": 25.0, "balance": 500.0, "creditLimit": 5000.0},
+    {"id": "flat", "name": "Flat", "rewards": {"default": 2.0}, "point_value_cents": 1.0,
+     "apr": 18.0, "balance": 0.0, "creditLimit": 8000.0},
+]
+
+def _history(n, seed=1):
+    rng = random.Random(seed)
+    return [{"date": f"2026-0{rng.randint(1, 6)}-{rng.randint(10, 28)}", "amount": round(rng.uniform(5, 150), 2),
+             "category": rng.choice(["dining", "groceries", "shopping"])} for _ in range(n)]
+
+def test_recommended_policy_dominates_single_cards_on_rewards():
+    result = simulate_policies(CARDS, _history(300), {"primaryGoal": "MAXIMIZE_CASHBACK"}, n_simulations=500, seed=3)
+    policies = result["policies"]
+    assert set(policies) == {"recommended", "single:dining", "single:flat"}
+    for name in ("single:dining", "single:flat"):
+        assert policies["recommended"]["rewards"]["mean"] > policies[name]["rewards"]["mean"]
+        assert policies[name]["beats_recommended"] == 0.0
+    assert policies["recommended"]["interest"]["mean"] == 0.0  # pays in full by default
+    stats = policies["single:flat"]["utilization"]
+    assert stats["p5"] <= stats["p50"] <= stats["p95"]
+
+def test_same_seed_same_result_and_revolving_interest():
+    context = {"primaryGoal": "MAXIMIZE_CASHBACK", "payoff_fraction": 0.0}
+    first = simulate_policies(CARDS, _history(100), context, n_simulations=200, seed=9)
+    assert first == simulate_policies(CARDS, _history(100), context, n_simulations=200, seed=9)
+    policies = first["policies"]
+    # Everything on the 25% APR card revolves at a higher rate than on the 18% card.
+    assert policies["single:dining"]["interest"]["mean"] > policies["single:flat"]["interest"]["mean"]
+
+def test_large_runs_are_capped_and_report_the_effective_count():
+    result = simulate_policies(CARDS, _history(5000), {}, n_simulations=20000, seed=1)
+    assert result["requested_simulations"] == 20000
+    assert 0 < result["simulations"] < 20000
+    assert result["simulations"] * result["expected_purchases"] <= MAX_CELLS
+    small = simulate_policies(CARDS, _history(100), {}, n_simulations=200, seed=1)
+    assert small["simulations"] == small["requested_simulations"] == 200
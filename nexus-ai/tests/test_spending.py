@@ -0,0 +1,25 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from spending import spending_aggregates
+
+def test_exact_category_totals_and_top_increases():
+    current = [{"amount": 0.1, "category": "Dining"}] * 30 + [
+        {"amount": 120.0, "category": ["Groceries", "Supermarkets"]},
+        {"amount": 50.0, "category": "Travel"},
+        {"amount": -20.0, "category": "Dining"},  # refund
+        {"amount": "n/a", "category": "Dining"},
+        {"amount": 15.0, "merchantName": "WHOLE FOODS MARKET #10234"},
+    ]
+    previous = [{"amount": 1.0, "category": "Dining"}, {"amount": 100.0, "category": "Groceries"},
+                {"amount": 80.0, "category": "Travel"}]
+    result = spending_aggregates(current, previous)
+    assert result["category_totals"] == {"Groceries": 120.0, "Travel": 50.0, "groceries": 15.0, "Dining": 3.0}
+    assert [row["category"] for row in result["top_increases"]] == ["Dining", "Groceries"]
+    assert result["top_increases"][0]["increase_percentage"] == "200%"
+    assert result["top_increases"][1] == {"category": "Groceries", "increase_percentage": "20%",
+                                          "previous_total": 100.0, "current_total": 120.0}
+
+def test_no_history():
+    assert spending_aggregates([]) == {"category_totals": {}, "top_increases": []}
+    assert spending_aggregates([{"amount": 5, "category": "Gas"}])["top_increases"] == []
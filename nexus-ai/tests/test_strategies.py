@@ -0,0 +1,48 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from strategies import STRATEGIES, register_strategy
+from app import precompute_payment_plans_sophisticated
+
+ACCOUNTS = [
+    {"id": "a", "name": "Big High APR", "balance": 4000.0, "apr": 27.99, "creditLimit": 5000.0},
+    {"id": "b", "name": "Small", "balance": 600.0, "apr": 18.99, "creditLimit": 1000.0},
+    {"id": "c", "name": "Mid", "balance": 2500.0, "apr": 22.99, "creditLimit": 10000.0},
+]
+
+def _power_card(split):
+    return next(item["card_id"] for item in split if item["type"] == "Power Payment")
+
+def test_all_registered_strategies_are_planned():
+    plans = precompute_payment_plans_sophisticated([dict(a) for a in ACCOUNTS], 500.0)
+    assert _power_card(plans["avalanche_plan"]["split"]) == "a"
+    assert _power_card(plans["score_booster_plan"]["split"]) == "a"
+    alternatives = plans["alternative_plans"]
+    assert set(alternatives) == set(STRATEGIES) - {"avalanche", "score_booster"}
+    assert _power_card(alternatives["snowball"]["split"]) == "b"
+    proportional = alternatives["proportional"]["split"]
+    assert round(sum(item["amount"] for item in proportional), 2) == 500.0
+
+def test_registered_strategy_joins_the_shared_pass():
+    register_strategy("lowest_limit", "Lowest Limit", rank=lambda f: (-f["limit"],))
+    try:
+        plans = precompute_payment_plans_sophisticated([dict(a) for a in ACCOUNTS], 500.0)
+        assert _power_card(plans["alternative_plans"]["lowest_limit"]["split"]) == "b"
+    finally:
+        STRATEGIES.pop("lowest_limit")
+
+def test_promo_dates_in_any_format_do_not_break_planning():
+    accounts = [dict(a) for a in ACCOUNTS]
+    accounts[1]["promo_apr_expiry_date"] = "09/01/2027"
+    accounts[2]["promo_apr_expiry_date"] = "2027-03-01T00:00:00Z"
+    accounts[0]["promo_apr_expiry_date"] = "soon"
+    plans = precompute_payment_plans_sophisticated(accounts, 500.0)
+    # "soon" is not a promo, so the earliest real expiry wins.
+    assert _power_card(plans["alternative_plans"]["promo_first"]["split"]) == "c"
+
+def test_unparseable_promo_date_is_not_a_promo():
+    accounts = [dict(a) for a in ACCOUNTS]
+    accounts[1]["promo_apr_expiry_date"] = "soon"
+    plans = precompute_payment_plans_sophisticated(accounts, 500.0)
+    # No card has a real promo, so promo_first falls back to the largest balance.
+    assert _power_card(plans["alternative_plans"]["promo_first"]["split"]) == "a"
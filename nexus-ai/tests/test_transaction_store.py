@@ -0,0 +1,70 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from datetime import date, timedelta
+import pytest
+from spending import budget_health, month_to_date_spend, stored_aggregates
+from transaction_store import StaleCursor, TransactionStore
+
+def _txn(i, day, amount, category="Dining", merchant="SQ *BLUE BOTTLE COFFEE"):
+    return {"id": f"t{i}", "date": day.isoformat(), "amount": amount, "category": category, "merchantName": merchant}
+
+def test_ingest_dedupes_by_id_and_advances_cursor():
+    store = TransactionStore(maxsize=10)
+    day = date(2025, 3, 1)
+    first = store.ingest("u1", [_txn(1, day, 5.0), _txn(2, day, 7.25), {"id": "t3", "amount": 1.0}, "junk"])
+    assert first == {"cursor": 2, "added": 2, "duplicates": 0, "invalid": 2}
+    again = store.ingest("u1", [_txn(2, day, 7.25), _txn(4, day, -30.0)])
+    assert again == {"cursor": 3, "added": 1, "duplicates": 1, "invalid": 0}
+    history = store.get("u1", cursor=3)
+    columns = history.columns()
+    assert columns["cents"].tolist() == [500, 725, -3000]
+    assert columns["day"].tolist() == [day.toordinal()] * 3
+    assert len(history.merchant_codes) == 1  # merchant interned once
+
+def test_append_returns_the_rows_it_added_to_that_history():
+    store = TransactionStore(maxsize=1)
+    day = date(2025, 3, 1)
+    store.ingest("u1", [_txn(1, day, 5.0)])
+    history, applied = store.append("u1", [_txn(1, day, 5.0), _txn(2, day, 6.0), _txn(3, day, 7.0)])
+    assert applied["rows"] == [1, 2] and applied["cursor"] == 3
+    assert history is store.get("u1")
+    # After an eviction the rows index the new history, not the old one.
+    store.ingest("u2", [_txn(1, day, 5.0)])
+    history, applied = store.append("u1", [_txn(9, day, 9.0)])
+    assert applied["rows"] == [0] and history.cents[0] == 900
+
+def test_stale_cursor_and_eviction():
+    store = TransactionStore(maxsize=1)
+    store.ingest("u1", [_txn(1, date(2025, 3, 1), 5.0)])
+    with pytest.raises(StaleCursor):
+        store.get("u1", cursor=2)
+    store.ingest("u2", [_txn(1, date(2025, 3, 1), 5.0)])
+    with pytest.raises(StaleCursor):
+        store.get("u1")
+    assert store.stats()["size"] == 1
+
+def test_columns_grow_past_initial_capacity():
+    store = TransactionStore()
+    start = date(2024, 1, 1)
+    store.ingest("u1", [_txn(i, start + timedelta(days=i % 365), 1.0 + i % 7) for i in range(1000)])
+    history = store.get("u1")
+    assert history.cursor == 1000
+    assert (history.columns()["day"] >= start.toordinal()).all()
+
+def test_stored_aggregates_use_trailing_windows():
+    store = TransactionStore()
+    end = date(2025, 3, 31)
+    rows = [_txn(1, end, 30.0), _txn(2, end - timedelta(days=29), 30.0, "Gas"),
+            _txn(3, end - timedelta(days=30), 40.0), _txn(4, end - timedelta(days=90), 999.0)]
+    store.ingest("u1", rows)
+    result = stored_aggregates(store.get("u1"), period_days=30)
+    assert result["category_totals"] == {"Dining": 30.0, "Gas": 30.0}
+    assert result["top_increases"] == []  # Dining fell from 40 to 30
+    assert month_to_date_spend(store.get("u1")) == {"Dining": 70.0, "Gas": 30.0}
+
+def test_budget_health_scores_overspend():
+    result = budget_health({"Dining": 100, "Gas": 100}, {"dining": 150.0, "Gas": 20.0})
+    assert result["score"] == 75
+    assert result["over_budget"] == ["Dining"]
+    assert budget_health({"Gas": 50}, {})["score"] == 100
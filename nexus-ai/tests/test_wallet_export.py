@@ -0,0 +1,33 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import bisect
+from wallet_export import wallet_export
+
+CARDS = [
+    {"id": "dining", "name": "Dining Card", "rewards": {"dining": 4.0, "default": 1.0}, "point_value_cents": 1.0,
+     "balance": 0.0, "creditLimit": 5000.0},
+    {"id": "flat", "name": "Flat 2%", "rewards": {"default": 2.0}, "point_value_cents": 1.0,
+     "balance": 1000.0, "creditLimit": 5000.0},
+]
+
+def _pick(export, goal, category, amount):
+    breaks, best, _ = export["goals"][goal].get(category, export["goals"][goal]["*"])
+    return export["cards"][best[bisect.bisect_right(breaks, amount)]]["id"]
+
+def test_export_is_evaluable_offline():
+    export = wallet_export("wallet-user", CARDS)
+    assert _pick(export, "MAXIMIZE_CASHBACK", "dining", 20.0) == "dining"
+    assert _pick(export, "MAXIMIZE_CASHBACK", "groceries", 20.0) == "flat"
+    assert export["guards"]["max_amount"] == [4500.0, 3500.0]
+
+def test_unchanged_and_delta_responses():
+    first = wallet_export("wallet-user-2", CARDS)
+    assert wallet_export("wallet-user-2", CARDS, first["version"]) == {"version": first["version"], "unchanged": True}
+    changed = [CARDS[0], dict(CARDS[1], balance=2000.0)]
+    update = wallet_export("wallet-user-2", changed, first["version"])
+    assert update["base_version"] == first["version"]
+    assert update["delta"]["guards"]["max_amount"] == [4500.0, 2500.0]
+    assert "cards" not in update["delta"]
+    # A version the service never issued gets the full export
+    assert "goals" in wallet_export("wallet-user-2", changed, "unknown")
@@ -0,0 +1,146 @@
+"""
+Optional per-user transaction store.
+
+Clients sync a user's transactions once (`/v2/transactions/ingest`) and
+afterwards send only new rows plus the `cursor` the last sync returned,
+instead of the whole history on every insights, budget or cash-flow call.
+
+Each user's history is a `UserTransactions` buffer (ingest.TransactionColumns
+plus an account column): int32 day ordinals, signed int64 cents (positive =
+money out, as Plaid reports it), and int32 codes for category, normalized
+merchant and account, with each string interned once. It is append-only
+and de-duplicated by transaction id; the cursor is simply the row count.
+Users are held in an LRU, so memory is bounded by STORE_MAX_USERS; a
+client whose cursor is ahead of what the service holds (after an eviction
+or a restart) gets StaleCursor and resends the full history.
+
+Every stored purchase is also folded into rolling per-category and
+per-merchant windows (rolling.py), so window totals are read without
+scanning the history.
+"""
+import math
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from categorize import merchant_of
+from dates import parse_date
+from ingest import TransactionColumns
+from lru import LRUCache
+from merchant_normalize import normalize_merchant
+from rolling import RollingWindows
+from spending import transaction_category
+
+
+class StaleCursor(LookupError):
+    """The client's cursor is ahead of the stored history; it must resync."""
+
+
+class UserTransactions(TransactionColumns):
+    COLUMNS = TransactionColumns.COLUMNS + (('account', 0),)
+
+    def __init__(self, capacity: int = 256):
+        super().__init__(capacity)
+        self.account = np.zeros(capacity, dtype=np.int32)
+        self.account_codes: Dict[str, int] = {}
+        self.ids: Dict[str, int] = {}
+        self.row_ids: List[Optional[str]] = []
+        # code -> string, the inverse of category_codes / merchant_codes
+        self.category_names: List[str] = []
+        self.merchant_names: List[str] = []
+        self.categories = RollingWindows(self.category_codes)
+        self.merchants = RollingWindows(self.merchant_codes)
+        self.epoch = 0  # bumped on every change, for caches derived from the rows
+
+    def add(self, txn: Dict) -> Optional[int]:
+        """Appends one transaction; returns its row, or None if invalid or already stored."""
+        txn_id = txn.get('id') or txn.get('transaction_id')
+        if txn_id is not None and str(txn_id) in self.ids:
+            return None
+        day = parse_date(txn.get('date'))
+        try:
+            amount = float(txn.get('amount'))
+        except (TypeError, ValueError):
+            return None
+        if day is None or not math.isfinite(amount) or amount == 0:
+            return None
+        category, merchant = transaction_category(txn), normalize_merchant(merchant_of(txn))
+        row = self.append(amount, category, merchant, day)
+        if len(self.category_names) < len(self.category_codes):
+            self.category_names.append(category)
+        if len(self.merchant_names) < len(self.merchant_codes):
+            self.merchant_names.append(merchant)
+        self.account[row] = self.account_codes.setdefault(str(txn.get('account_id') or ''), len(self.account_codes))
+        if txn_id is not None:
+            self.ids[str(txn_id)] = row
+        self.row_ids.append(None if txn_id is None else str(txn_id))
+        cents, day = int(self.cents[row]), int(self.day[row])
+        if cents > 0:
+            self.categories.add(int(self.category[row]), cents, day)
+            self.merchants.add(int(self.merchant[row]), cents, day)
+        self.epoch += 1
+        return row
+
+    @property
+    def cursor(self) -> int:
+        return self.size
+
+
+class TransactionStore:
+    def __init__(self, maxsize: int = 5000):
+        self._users = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def ingest(self, user_id: str, transactions: Iterable[Dict]) -> Dict:
+        """Adds new rows for a user; returns the new cursor and what was applied."""
+        _, applied = self.append(user_id, transactions)
+        del applied["rows"]
+        return applied
+
+    def append(self, user_id: str, transactions: Iterable[Dict]) -> Tuple[UserTransactions, Dict]:
+        """
+        `ingest`, also returning the history appended to; the result's
+        "rows" are the indices of the added rows. Both are taken under the
+        lock, so concurrent appends or an eviction cannot shift them.
+        """
+        duplicates = invalid = 0
+        rows = []
+        with self._lock:
+            history = self._users.get(user_id)
+            if history is None:
+                history = UserTransactions()
+                self._users.put(user_id, history)
+            for txn in transactions:
+                if not isinstance(txn, dict):
+                    invalid += 1
+                    continue
+                txn_id = txn.get('id') or txn.get('transaction_id')
+                if txn_id is not None and str(txn_id) in history.ids:
+                    duplicates += 1
+                else:
+                    row = history.add(txn)
+                    if row is None:
+                        invalid += 1
+                    else:
+                        rows.append(row)
+            cursor = history.cursor
+        return history, {"cursor": cursor, "added": len(rows), "duplicates": duplicates, "invalid": invalid,
+                         "rows": rows}
+
+    def get(self, user_id: str, cursor: Optional[int] = None) -> UserTransactions:
+        """
+        The user's history. A `cursor` the service has not reached (or a
+        user it no longer holds) raises StaleCursor.
+        """
+        history = self._users.get(user_id)
+        if history is None or (cursor is not None and cursor > history.cursor):
+            raise StaleCursor(f"No stored history for user '{user_id}' at cursor {cursor}; resend the full history.")
+        return history
+
+    def stats(self) -> Dict:
+        return self._users.stats()
+
+
+transaction_store = TransactionStore(maxsize=int(os.getenv("STORE_MAX_USERS", "5000")))
@@ -0,0 +1,235 @@
+"""
+Statement-close-aware payment timing.
+
+Bureaus see the balance on the statement close date, not the balance on the
+due date. Given each card's close and due dates and the user's paycheck
+calendar, this module schedules *when* and *how much* to pay each card so the
+reported utilization is as low as possible while every minimum still lands
+before its due date.
+
+The simulation is event driven: it only visits paycheck days, and the work
+at each one is a vectorized water-fill over the cards, so a full cycle costs
+O(paychecks * cards log cards) and can run for every user nightly.
+"""
+import calendar
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from money import to_cents, from_cents, minimum_payments_cents
+
+DEFAULT_GRACE_PERIOD_DAYS = 25
+POSTING_LAG_DAYS = 2  # payments need ~2 days to post before the statement cuts
+CADENCE_DAYS = {"weekly": 7, "biweekly": 14}
+CADENCES = ("weekly", "biweekly", "semimonthly", "monthly")
+
+
+# --- Calendar helpers ---
+def _parse_date(value) -> Optional[date]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _add_months(day: date, months: int, day_of_month: Optional[int] = None) -> date:
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    wanted = day_of_month or day.day
+    return date(year, month, min(wanted, calendar.monthrange(year, month)[1]))
+
+
+def next_day_of_month(start: date, day_of_month: int) -> date:
+    """First date on or after `start` falling on `day_of_month` (clamped to month end)."""
+    candidate = _add_months(start, 0, day_of_month)
+    if candidate < start:
+        candidate = _add_months(start, 1, day_of_month)
+    return candidate
+
+
+def expand_paycheck_schedule(schedule: Dict, start: date, end: date) -> List[Dict]:
+    """
+    Expands `{"next_date", "cadence", "amount"}` into concrete paychecks in
+    [start, end]. Cadence is weekly, biweekly, semimonthly (1st and 15th) or
+    monthly; anything else raises ValueError.
+    """
+    cadence = schedule.get("cadence", "biweekly")
+    if cadence not in CADENCES:
+        raise ValueError(f"Unknown paycheck cadence '{cadence}'. Expected one of: {', '.join(CADENCES)}.")
+    amount = schedule.get("amount", 0)
+    current = _parse_date(schedule.get("next_date")) or start
+    paychecks = []
+    if cadence == "semimonthly":
+        anchor = date(current.year, current.month, 1)
+        while anchor <= end:
+            for day in (anchor, anchor.replace(day=15)):
+                if current <= day <= end and day >= start:
+                    paychecks.append({"date": day, "amount": amount})
+            anchor = _add_months(anchor, 1, 1)
+        return paychecks
+    step = CADENCE_DAYS.get(cadence)
+    months = 0
+    pay_day = current
+    while pay_day <= end:
+        if pay_day >= start:
+            paychecks.append({"date": pay_day, "amount": amount})
+        if step:
+            pay_day = pay_day + timedelta(days=step)
+        else:
+            months += 1
+            pay_day = _add_months(current, months)
+    return paychecks
+
+
+# --- Core allocation ---
+def water_fill(balances: np.ndarray, limits: np.ndarray, budget: int) -> np.ndarray:
+    """
+    Pays `budget` cents across cards so the highest utilizations come down to
+    a common level first. Returns whole-cent payments summing to at most
+    `budget` (less only when every balance is cleared).
+    """
+    balances = np.maximum(balances, 0)
+    if budget <= 0 or balances.sum() == 0:
+        return np.zeros_like(balances)
+    if budget >= balances.sum():
+        return balances.copy()
+    limits = np.maximum(limits, 1).astype(np.float64)
+    levels = balances / limits
+    order = np.argsort(-levels, kind="stable")
+    sorted_levels = levels[order]
+    sorted_limits = limits[order]
+    # Cost to bring the top k cards down to the (k+1)-th card's level.
+    prefix_limits = np.cumsum(sorted_limits)
+    prefix_balances = np.cumsum(balances[order])
+    next_levels = np.append(sorted_levels[1:], 0.0)
+    costs = prefix_balances - next_levels * prefix_limits
+    k = int(np.searchsorted(costs, budget))
+    level = (prefix_balances[k] - budget) / prefix_limits[k]
+    payments = np.maximum(balances - np.floor(level * limits), 0).astype(np.int64)
+    payments = np.minimum(payments, balances)
+    # Trim rounding overshoot from the lowest-priority paid cards.
+    overshoot = int(payments.sum() - budget)
+    for idx in order[::-1]:
+        if overshoot <= 0:
+            break
+        take = min(overshoot, int(payments[idx]))
+        payments[idx] -= take
+        overshoot -= take
+    return payments
+
+
+def optimize_payment_timing(cards: List[Dict], paychecks: List[Dict], start_date=None,
+                            starting_cash: float = 0.0,
+                            posting_lag_days: int = POSTING_LAG_DAYS) -> Dict:
+    """
+    Builds a dated payment schedule for one statement cycle.
+
+    `cards` need `id`, `name`, `balance`, `creditLimit` and either a
+    `statement_close_day` (day of month) or `statement_close_date`; `due_date`
+    falls back to close + 25 days. `paychecks` are `{"date", "amount"}`
+    amounts earmarked for card payments; `starting_cash` is available today.
+    """
+    start = _parse_date(start_date) or date.today()
+    n = len(cards)
+    balances = to_cents([c.get("balance", 0) for c in cards])
+    limits = to_cents([c.get("creditLimit", 0) for c in cards])
+    minimums = minimum_payments_cents(balances)
+
+    close_dates, due_dates = [], []
+    for card in cards:
+        close = _parse_date(card.get("statement_close_date"))
+        if close is None:
+            close = next_day_of_month(start, int(card.get("statement_close_day") or start.day))
+        due = _parse_date(card.get("due_date")) or close + timedelta(days=DEFAULT_GRACE_PERIOD_DAYS)
+        while due < start:
+            due = _add_months(due, 1)
+        close_dates.append(close)
+        due_dates.append(due)
+    close_days = np.array([(d - start).days for d in close_dates], dtype=np.int64)
+    due_days = np.array([(d - start).days for d in due_dates], dtype=np.int64)
+
+    # Cash events: today's cash plus each paycheck, merged per day.
+    events: Dict[int, int] = {}
+    if starting_cash:
+        events[0] = int(to_cents(starting_cash))
+    for paycheck in paychecks:
+        offset = (_parse_date(paycheck["date"]) - start).days
+        if offset >= 0:
+            events[offset] = events.get(offset, 0) + int(to_cents(paycheck.get("amount", 0)))
+    event_days = np.array(sorted(events), dtype=np.int64)
+    event_cash = np.array([events[d] for d in event_days], dtype=np.int64)
+
+    remaining = balances.copy()
+    outstanding_min = minimums.copy()
+    paid = np.zeros(n, dtype=np.int64)
+    reported = balances.copy()
+    schedule = []
+    pool = 0
+    for i, day in enumerate(event_days):
+        pool += int(event_cash[i])
+        next_cash_day = event_days[i + 1] if i + 1 < len(event_days) else None
+        pay_date = start + timedelta(days=int(day))
+
+        # 1. Minimums that cannot wait for the next paycheck, earliest due first.
+        must_pay = (outstanding_min > 0) & ((next_cash_day is None) | (due_days - posting_lag_days < (next_cash_day or 0)))
+        for idx in np.flatnonzero(must_pay)[np.argsort(due_days[must_pay], kind="stable")]:
+            amount = int(min(pool, outstanding_min[idx], remaining[idx]))
+            if amount <= 0:
+                continue
+            pool -= amount
+            remaining[idx] -= amount
+            outstanding_min[idx] -= amount
+            paid[idx] += amount
+            schedule.append({"date": pay_date.isoformat(), "card_id": cards[idx]["id"], "card_name": cards[idx].get("name"),
+                             "amount": from_cents(amount), "purpose": "Minimum Payment"})
+
+        # 2. Hold back what later minimums will need beyond the cash still to come.
+        future_cash = np.cumsum(event_cash[i + 1:])
+        reserve = 0
+        if outstanding_min.any():
+            for j, cash_day in enumerate(event_days[i + 1:]):
+                due_before = outstanding_min[due_days - posting_lag_days < cash_day].sum()
+                reserve = max(reserve, int(due_before - (future_cash[j - 1] if j > 0 else 0)))
+            reserve = max(reserve, int(outstanding_min.sum() - (future_cash[-1] if len(future_cash) else 0)))
+        spendable = max(pool - max(reserve, 0), 0)
+
+        # 3. Water-fill the rest into cards whose statement has not cut yet.
+        eligible = close_days - posting_lag_days >= day
+        if spendable > 0 and eligible.any():
+            payments = np.zeros(n, dtype=np.int64)
+            payments[eligible] = water_fill(remaining[eligible], limits[eligible], spendable)
+            for idx in np.flatnonzero(payments):
+                amount = int(payments[idx])
+                pool -= amount
+                remaining[idx] -= amount
+                outstanding_min[idx] = max(outstanding_min[idx] - amount, 0)
+                paid[idx] += amount
+                schedule.append({"date": pay_date.isoformat(), "card_id": cards[idx]["id"], "card_name": cards[idx].get("name"),
+                                 "amount": from_cents(amount), "purpose": "Utilization Paydown"})
+
+        # Balances snapshot at close include everything posted before it.
+        posted_before_close = close_days - posting_lag_days >= day
+        reported = np.where(posted_before_close, remaining, reported)
+
+    total_limit = int(limits.sum())
+    per_card = []
+    for idx, card in enumerate(cards):
+        per_card.append({
+            "card_id": card["id"],
+            "card_name": card.get("name"),
+            "statement_close_date": close_dates[idx].isoformat(),
+            "due_date": due_dates[idx].isoformat(),
+            "reported_balance": from_cents(reported[idx]),
+            "reported_utilization_percent": round(float(reported[idx]) / limits[idx] * 100, 2) if limits[idx] > 0 else 0,
+            "total_paid": from_cents(paid[idx]),
+            "minimum_met": bool(outstanding_min[idx] <= 0),
+        })
+    return {
+        "schedule": schedule,
+        "cards": per_card,
+        "current_utilization_percent": round(float(balances.sum()) / total_limit * 100, 2) if total_limit > 0 else 0,
+        "reported_utilization_percent": round(float(reported.sum()) / total_limit * 100, 2) if total_limit > 0 else 0,
+        "unallocated_cash": from_cents(pool),
+    }
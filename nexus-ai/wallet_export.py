@@ -0,0 +1,98 @@
+"""
+Offline wallet export for the mobile app.
+
+Serializes a user's compiled reward table (reward_table.py) into a compact,
+versioned JSON document the app can evaluate at the register with no
+network call:
+
+    {"version": "...", "cards": [{"id", "name"}], "categories": [...],
+     "guards": {"max_amount": [...], "bonus_threshold": ...},
+     "goals": {goal: {category: [breaks, best, runner_up]}}}
+
+To pick a card: look up `goals[goal][category]` (unknown categories use
+"*"), bisect `breaks` with the amount and take `best` at that position
+(indices into `cards`). If the amount exceeds `guards.max_amount[best]`,
+or reaches `bonus_threshold`, the table is not authoritative and the app
+should ask the service (or at least prefer `runner_up`).
+
+Clients send back the `version` they hold; when only the rankings or
+guards moved the response carries just the changed entries.
+"""
+import math
+import os
+from typing import Dict, List, Optional
+
+from cardrank_engine import PROJECTED_UTILIZATION_LIMIT
+from lru import LRUCache
+from reward_table import TABLE_GOALS, get_reward_table, table_version
+
+DEFAULT_CATEGORY_KEY = '*'
+
+# (user_id, version) -> export, kept so older versions can be diffed against
+wallet_exports = LRUCache(maxsize=int(os.getenv("WALLET_EXPORT_CACHE_SIZE", "8192")))
+
+
+def _round_amount(value: float) -> Optional[float]:
+    return round(value, 2) if math.isfinite(value) else None
+
+
+def build_wallet_export(user_id: str, user_cards: List[Dict], reward_caps: Optional[Dict] = None) -> Dict:
+    table = get_reward_table(user_id, user_cards, reward_caps)
+    portfolio = table["portfolio"]
+    categories = list(portfolio["category_index"]) + [DEFAULT_CATEGORY_KEY]
+    headroom = PROJECTED_UTILIZATION_LIMIT * portfolio["credit_limit"] - portfolio["balance"]
+    goals = {}
+    for goal in TABLE_GOALS:
+        segments = table["goals"][goal]["segments"]
+        goals[goal] = {category: [[round(b, 2) for b in bounds], list(best), list(runner)]
+                       for category, (bounds, best, runner) in zip(categories, segments)}
+    return {
+        "version": table["version"],
+        "cards": [{"id": card.get('id'), "name": card.get('name')} for card in user_cards],
+        "categories": categories,
+        "guards": {
+            "max_amount": [max(math.floor(h * 100) / 100, 0.0) for h in headroom.tolist()],
+            "bonus_threshold": _round_amount(table["bonus_threshold"]),
+        },
+        "goals": goals,
+    }
+
+
+def _delta(old: Dict, new: Dict) -> Optional[Dict]:
+    """Changed guards and goal entries, or None if card/category indices moved."""
+    if old["cards"] != new["cards"] or old["categories"] != new["categories"]:
+        return None
+    delta = {}
+    if old["guards"] != new["guards"]:
+        delta["guards"] = new["guards"]
+    goals = {}
+    for goal, entries in new["goals"].items():
+        changed = {category: entry for category, entry in entries.items() if old["goals"][goal].get(category) != entry}
+        if changed:
+            goals[goal] = changed
+    if goals:
+        delta["goals"] = goals
+    return delta
+
+
+def wallet_export(user_id: str, user_cards: List[Dict], since_version: Optional[str] = None,
+                  reward_caps: Optional[Dict] = None) -> Dict:
+    """
+    The full export, `{"version", "unchanged": true}` when the client is
+    current, or `{"version", "base_version", "delta"}` when it holds an
+    older version the service still remembers.
+    """
+    if not user_cards:
+        raise ValueError("No cards provided.")
+    export = wallet_exports.get((user_id, table_version(user_cards, reward_caps)))
+    if export is None:
+        export = build_wallet_export(user_id, user_cards, reward_caps)
+        wallet_exports.put((user_id, export["version"]), export)
+    if since_version == export["version"]:
+        return {"version": export["version"], "unchanged": True}
+    if since_version:
+        previous = wallet_exports.get((user_id, since_version))
+        delta = _delta(previous, export) if previous is not None else None
+        if delta is not None:
+            return {"version": export["version"], "base_version": since_version, "delta": delta}
+    return export